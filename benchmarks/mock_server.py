@@ -0,0 +1,396 @@
+import os
+import re
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# --- Configuration ---
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Each seed file becomes one subject/book/chapter in the fake database. The biology cards come from
+# the first chapter of books/class11_biology, so they carry that chapter's real title.
+SEED_FILES = [
+    (os.path.join(ROOT_DIR, 'accuracy_evaluations.json'), '11', 'Biology', 'Biology', 'The Living World'),
+    (os.path.join(ROOT_DIR, 'ARTSaccuracy_evaluations.json'), '8', 'Arts', 'Kriti', 'Arts Chapter 1'),
+]
+SEED_NAMESPACE = uuid.UUID('6f1c1d8e-8a55-4e8e-9a43-6d0f7a3c2b10')
+
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token) used for fake usage stats."""
+    return max(1, len(text) // 4)
+
+
+def _seed_id(*parts):
+    return str(uuid.uuid5(SEED_NAMESPACE, '/'.join(str(p) for p in parts)))
+
+
+def load_seed_tables(scale=1):
+    """Builds the five Supabase tables from the evaluation JSON files in the repo.
+
+    `scale` replicates every card that many times so larger books can be simulated.
+    """
+    tables = {name: [] for name in ["subjects", "book_title", "chapters", "topics", "cards"]}
+    for path, class_name, subject_name, book_title, chapter_name in SEED_FILES:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            evaluations = json.load(f)
+
+        subject_id = _seed_id('subject', class_name, subject_name)
+        book_id = _seed_id('book', subject_id)
+        chapter_id = _seed_id('chapter', book_id, 1)
+        tables["subjects"].append({"id": subject_id, "class_name": class_name, "subject_name": subject_name,
+                                   "icon": "icon", "color": "green", "description": f"{subject_name} for Class {class_name}"})
+        tables["book_title"].append({"id": book_id, "subject_id": subject_id, "title": book_title})
+        tables["chapters"].append({"id": chapter_id, "book_id": book_id, "name": chapter_name, "order_index": 1})
+
+        topic_ids = {}
+        for item in evaluations:
+            topic_name = item.get('topic_name') or 'Uncategorized'
+            if topic_name not in topic_ids:
+                topic_ids[topic_name] = _seed_id('topic', chapter_id, topic_name)
+                tables["topics"].append({"id": topic_ids[topic_name], "chapter_id": chapter_id,
+                                         "name": topic_name, "order_index": len(topic_ids)})
+            for copy in range(scale):
+                tables["cards"].append({
+                    "id": item['card_id'] if copy == 0 else _seed_id('card', item['card_id'], copy),
+                    "topic_id": topic_ids[topic_name],
+                    "front": item.get('question'),
+                    "back": item.get('answer'),
+                    "card_type": "basic",
+                    "order_index": len(tables["cards"]) + 1,
+                })
+    return tables
+
+
+# --- Fake judge/generator responses ---
+
+def _card_scores(card_id):
+    """Deterministic pseudo-scores so repeated runs produce identical results."""
+    rng = random.Random(card_id)
+    return rng.choice([4, 4, 4, 3, 2]), rng.choice([100, 95, 90, 80, 60])
+
+
+def _generated_sql(prompt):
+    match = re.search(r'generates (\d+) meaningful flashcards', prompt)
+    per_topic = int(match.group(1)) if match else 5
+    chapter = re.search(r'for the chapter \*\*"(.+?)"\*\*', prompt)
+    chapter_name = (chapter.group(1) if chapter else 'Chapter').replace("'", "''")
+    blocks = []
+    for t in range(1, 4):
+        rows = ",\n".join(f"  ('Question {t}.{c}?', 'Answer {t}.{c}.', 'basic', {c})" for c in range(1, per_topic + 1))
+        blocks.append(f"""
+SELECT id INTO _topic_id FROM topics WHERE chapter_id = _chapter_id and name = 'Topic {t}';
+IF _topic_id IS NULL THEN
+INSERT INTO topics (id, chapter_id, name, order_index)
+VALUES (gen_random_uuid(), _chapter_id, 'Topic {t}', _order_index)
+RETURNING id INTO _topic_id;
+_order_index := _order_index + 1;
+END IF;
+
+INSERT INTO cards (id, topic_id, front, back, card_type, order_index)
+SELECT gen_random_uuid(), _topic_id, front, back, card_type, order_index from (
+VALUES
+{rows}
+) as cards_data(front, back, card_type, order_index);
+""")
+    return f"""DO $$
+DECLARE
+  _subject_id uuid;
+  _book_id uuid;
+  _chapter_id uuid;
+  _topic_id uuid;
+  _order_index int;
+BEGIN
+  SELECT id INTO _chapter_id FROM chapters WHERE name = '{chapter_name}';
+_order_index := 1;
+{''.join(blocks)}
+RAISE NOTICE 'Cards inserted successfully.';
+
+EXCEPTION WHEN OTHERS THEN
+  RAISE NOTICE 'An error occurred: %', SQLERRM;
+END $$;
+""", 3 * per_topic
+
+
+def _prompt_cards(chunk):
+    """The card list that opens `chunk`: [(key, compact index or None)], keyed by card id or, in compact prompts, question."""
+    try:
+        cards, _ = json.JSONDecoder().raw_decode(chunk[chunk.index('['):])
+    except ValueError:
+        return []
+    keys = []
+    for card in cards if isinstance(cards, list) else []:
+        if isinstance(card, dict) and 'i' in card:
+            keys.append((card.get('q') or str(card['i']), card['i']))
+        elif isinstance(card, dict) and (card.get('card_id') or card.get('id')):
+            keys.append((card.get('card_id') or card.get('id'), None))
+    return list(dict.fromkeys(keys))
+
+
+def fake_completion(prompt):
+    """Returns (response_text, cards_judged) for a prompt sent by one of the pipeline scripts.
+
+    Compact judge prompts (numbered cards, see src/evaluation/compact_schema.py) get compact rows with a
+    note only for low scores; verbose prompts get one full object per card.
+    """
+    if 'SQL flashcard generator' in prompt:
+        return _generated_sql(prompt)
+    if 'accuracy evaluator' in prompt:
+        cards = _prompt_cards(prompt.split('Flashcard Chunk to Evaluate:', 1)[-1])
+        results = []
+        for key, index in cards:
+            accuracy, confidence = _card_scores(key)
+            if index is not None:
+                results.append([index, accuracy, confidence] + (["Mock rationale: not stated in the text."] if accuracy <= 2 else []))
+            else:
+                results.append({"card_id": key, "accuracy_score": accuracy, "confidence_score": confidence,
+                                "rationale": "Mock rationale based on the reference text."})
+        return json.dumps(results), len(cards)
+    if 'correctness and relevance' in prompt:
+        cards = _prompt_cards(prompt.split('Flashcard Chunk:', 1)[-1])
+        results = []
+        for key, index in cards:
+            accuracy, _ = _card_scores(key)
+            if index is not None:
+                results.append([index, accuracy + 1, accuracy] + (["Mock note."] if accuracy <= 2 else []))
+            else:
+                results.append({"card_id": key,
+                                "correctness": {"score": accuracy + 1, "notes": "Mock note."},
+                                "relevance": {"score": accuracy, "notes": "Mock note."}})
+        return json.dumps(results), len(cards)
+    if 'Topics and Their Flashcard Questions:' in prompt:
+        topics = _prompt_cards(prompt.split('Topics and Their Flashcard Questions:', 1)[-1])
+        return json.dumps([{"i": index, "score": 4, "notes": "Mock evaluation."} for _, index in topics]), 0
+    if '"score"' in prompt:
+        return json.dumps({"score": 4, "notes": "Mock evaluation."}), 0
+    return "Mock summary: key concepts, definitions and facts of the chapter.", 0
+
+
+# --- Server ---
+
+class MockState:
+    """Holds the seeded tables, the fault-injection settings and per-call statistics."""
+
+    def __init__(self, tables, latency=0.0, jitter=0.0, error_rate=0.0, rpm=0, seed=None, token_latency=0.0):
+        self.tables = tables
+        self.latency = latency
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.windows = {}
+        self.calls = []
+
+    def admit(self, api):
+        """Applies rate limiting and error injection. Returns an HTTP status to fail with, or None."""
+        with self.lock:
+            if self.rpm:
+                window = self.windows.setdefault(api, deque())
+                now = time.monotonic()
+                while window and now - window[0] > 60:
+                    window.popleft()
+                if len(window) >= self.rpm:
+                    return 429
+                window.append(now)
+            if self.error_rate and self.random.random() < self.error_rate:
+                return 500
+        return None
+
+    def sleep(self):
+        if self.latency or self.jitter:
+            with self.lock:
+                delay = max(0.0, self.random.gauss(self.latency, self.jitter))
+            time.sleep(delay)
+
+    def sleep_for_output(self, completion_tokens):
+        """Models generation time, which grows with the length of the response."""
+        if self.token_latency:
+            time.sleep(completion_tokens * self.token_latency)
+
+    def record(self, **call):
+        with self.lock:
+            self.calls.append(call)
+
+    def reset(self):
+        with self.lock:
+            self.calls = []
+            self.windows = {}
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.calls)
+
+
+def _matches(row, filters):
+    for column, expression in filters:
+        op, _, value = expression.partition('.')
+        cell = row.get(column)
+        if op == 'eq' and str(cell) != value:
+            return False
+        if op == 'in' and str(cell) not in value.strip('()').split(','):
+            return False
+    return True
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw) if raw else {}
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/__stats':
+            return self._send_json(200, self.state.snapshot())
+        if url.path.startswith('/rest/v1/'):
+            return self._handle_postgrest(url)
+        self._send_json(404, {"error": f"Unknown path {url.path}"})
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/__reset':
+            self.state.reset()
+            return self._send_json(200, {"ok": True})
+        if url.path.endswith('/chat/completions'):
+            return self._handle_llm('xai', self._read_json())
+        if ':generateContent' in url.path:
+            return self._handle_llm('gemini', self._read_json())
+        if url.path.startswith('/rest/v1/rpc/'):
+            payload = self._read_json()
+            self.state.sleep()
+            self.state.record(api='supabase_rpc', latency=0.0, status=200, rows=0, bytes=len(payload.get('sql', '')))
+            return self._send_json(200, None)
+        self._send_json(404, {"error": f"Unknown path {url.path}"})
+
+    def _handle_postgrest(self, url):
+        started = time.perf_counter()
+        table = url.path[len('/rest/v1/'):]
+        if table not in self.state.tables:
+            return self._send_json(404, {"message": f"relation {table} does not exist"})
+        params = parse_qs(url.query)
+        filters = [(k, v[0]) for k, v in params.items() if k not in ('select', 'offset', 'limit', 'order')]
+        rows = [r for r in self.state.tables[table] if _matches(r, filters)]
+        offset = int(params.get('offset', ['0'])[0])
+        limit = int(params['limit'][0]) if 'limit' in params else None
+        if 'Range' in self.headers:
+            start, _, end = self.headers['Range'].partition('-')
+            offset, limit = int(start), int(end) - int(start) + 1
+        page = rows[offset:offset + limit] if limit is not None else rows[offset:]
+        self.state.sleep()
+        self.state.record(api='supabase', latency=time.perf_counter() - started, status=200, rows=len(page))
+        end_index = offset + len(page) - 1
+        content_range = f"{offset}-{end_index}/{len(rows)}" if page else f"*/{len(rows)}"
+        self._send_json(200, page, {'Content-Range': content_range})
+
+    def _handle_llm(self, api, payload):
+        started = time.perf_counter()
+        if api == 'xai':
+            prompt = "\n".join(m.get('content') or '' for m in payload.get('messages', []))
+            model = payload.get('model')
+        else:
+            prompt = "\n".join(p.get('text', '') for c in payload.get('contents', []) for p in c.get('parts', []))
+            model = self.path.split('/models/')[-1].split(':')[0]
+
+        status = self.state.admit(api)
+        self.state.sleep()
+        if status:
+            self.state.record(api=api, model=model, latency=time.perf_counter() - started, status=status,
+                              prompt_tokens=0, completion_tokens=0, cards=0)
+            message = "Rate limit exceeded" if status == 429 else "Injected server error"
+            return self._send_json(status, {"error": {"message": message, "code": status}},
+                                   {'Retry-After': '1'} if status == 429 else None)
+
+        text, cards = fake_completion(prompt)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        self.state.sleep_for_output(completion_tokens)
+        self.state.record(api=api, model=model, latency=time.perf_counter() - started, status=200,
+                          prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, cards=cards)
+        if api == 'xai':
+            return self._send_json(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+        return self._send_json(200, {
+            "candidates": [{"index": 0, "finishReason": "STOP",
+                            "content": {"role": "model", "parts": [{"text": text}]}}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens,
+                              "totalTokenCount": prompt_tokens + completion_tokens},
+        })
+
+
+def start_server(state, host='127.0.0.1', port=0):
+    """Starts the mock server on a background thread and returns it (use `server.server_address`)."""
+    handler = type('BoundMockHandler', (MockHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def add_mock_arguments(parser):
+    parser.add_argument('--latency', type=float, default=0.0, help="Mean LLM/DB latency in seconds.")
+    parser.add_argument('--token-latency', type=float, default=0.0,
+                        help="Extra LLM latency per completion token in seconds, e.g. 0.01 for 100 tokens/s.")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Standard deviation of the latency in seconds.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of LLM calls that fail with HTTP 500.")
+    parser.add_argument('--rpm', type=int, default=0, help="Requests per minute per LLM API before HTTP 429 (0 = unlimited).")
+    parser.add_argument('--scale', type=int, default=1, help="Replicate every seeded card this many times.")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for latency and error injection.")
+
+
+def main():
+    """Runs the mock xAI/Gemini/Supabase server in the foreground."""
+    parser = argparse.ArgumentParser(description="Local fake xAI, Gemini and Supabase endpoints.")
+    parser.add_argument('--port', type=int, default=8765)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    state = MockState(load_seed_tables(args.scale), args.latency, args.jitter, args.error_rate, args.rpm, args.seed,
+                      args.token_latency)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), type('BoundMockHandler', (MockHandler,), {'state': state}))
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"Mock server listening on {base_url} ({len(state.tables['cards'])} seeded cards)")
+    print(f"  SUPABASE_URL={base_url}")
+    print(f"  XAI_BASE_URL={base_url}/v1")
+    print(f"  GEMINI_BASE_URL={base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+from mock_server import MockState, ROOT_DIR, add_mock_arguments, load_seed_tables, start_server
+
+sys.path.append(os.path.join(ROOT_DIR, 'src'))
+from common.metrics import estimate_cost
+
+# --- Configuration ---
+# Each target runs the real script unchanged; only its endpoints and output paths are redirected.
+TARGETS = {
+    'evaluate_accuracy': {
+        'script': 'src/evaluation/evaluate_accuracy.py',
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+    },
+    'evaluate_accuracy_single_judge': {
+        'script': 'src/evaluation/evaluate_accuracy.py',
+        'args': ['--no-cascade'],
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+    },
+    'evaluate_accuracy_sample': {
+        'script': 'src/evaluation/evaluate_accuracy.py',
+        'args': ['--sample'],
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+    },
+    'evaluate_accuracy_stream': {
+        'script': 'src/evaluation/evaluate_accuracy.py',
+        'args': ['--stream'],
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+    },
+    'plan_accuracy': {
+        'script': 'src/evaluation/plan.py',
+        'args': ['accuracy', '--chunk-size', '10', '20', '40', '--workers', '1', '4'],
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+    },
+    'distributed_eval': {
+        'script': 'src/evaluation/distributed_eval.py',
+        'args': ['run', '--workers', '4'],
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+    },
+    # Judges generation's SQL output straight from disk; generation runs first (unmeasured) to produce it.
+    'offline_eval': {
+        'script': 'src/evaluation/offline_eval.py',
+        'requires': ['generation'],
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+    },
+    # There are no class 8 Arts PDFs in the repo, so the seeded arts chapter is pinned to a biology PDF.
+    'grok_eval': {
+        'script': 'src/evaluation/grok_eval.py',
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+        'chapter_overrides': {'Arts Chapter 1': 'kebo101.pdf'},
+    },
+    'run_evaluation': {
+        'script': 'src/evaluation/run_evaluation.py',
+        'env': {'PDF_DIRECTORY': os.path.join(ROOT_DIR, 'books', 'class11_biology')},
+        'chapter_overrides': {'Arts Chapter 1': 'kebo101.pdf'},
+    },
+    'generation': {
+        'script': 'src/generation/main.py',
+        # Answers to the interactive prompts: class, subject, book title, language, cards per topic.
+        'stdin': "11\nbiology\nBiology\nEnglish\n5\n",
+        'book_dir': os.path.join(ROOT_DIR, 'books', 'class11_biology'),
+    },
+}
+# Syntactically valid placeholder credentials; the mock server never checks them.
+FAKE_KEY = "mock.eyJyb2xlIjoiYmVuY2htYXJrIn0.signature"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(target, wall_time, calls, returncode):
+    """Turns the mock server's call log into throughput and latency figures."""
+    llm_calls = [c for c in calls if c['api'] in ('xai', 'gemini')]
+    ok_calls = [c for c in llm_calls if c['status'] == 200]
+    latencies = [c['latency'] for c in ok_calls]
+    # Cards judged by the busiest model: a cascade re-judges some cards with a second model, and compact
+    # judge responses do not name the cards they score.
+    cards_by_model = {}
+    for c in ok_calls:
+        cards_by_model[c.get('model')] = cards_by_model.get(c.get('model'), 0) + c.get('cards', 0)
+    cards = max(cards_by_model.values(), default=0)
+    tokens = sum(c.get('prompt_tokens', 0) + c.get('completion_tokens', 0) for c in ok_calls)
+    cost = sum(estimate_cost(c.get('model'), c.get('prompt_tokens', 0), c.get('completion_tokens', 0)) for c in ok_calls)
+    return {
+        "target": target,
+        "returncode": returncode,
+        "wall_time_s": round(wall_time, 3),
+        "llm_calls": len(llm_calls),
+        "failed_calls": len(llm_calls) - len(ok_calls),
+        "db_requests": sum(1 for c in calls if c['api'].startswith('supabase')),
+        "cards": cards,
+        "cards_per_s": round(cards / wall_time, 3) if wall_time else 0.0,
+        "calls_per_s": round(len(llm_calls) / wall_time, 3) if wall_time else 0.0,
+        "latency_p50_s": round(percentile(latencies, 50), 4),
+        "latency_p99_s": round(percentile(latencies, 99), 4),
+        "prompt_tokens": sum(c.get('prompt_tokens', 0) for c in ok_calls),
+        "completion_tokens": sum(c.get('completion_tokens', 0) for c in ok_calls),
+        "tokens_per_card": round(tokens / cards, 1) if cards else 0.0,
+        "cost_usd": round(cost, 4),
+        "cards_per_usd": round(cards / cost, 1) if cost else 0.0,
+    }
+
+
+def run_target(target, base_url, work_dir, log_file):
+    """Runs one pipeline script against the mock server and returns (wall_time, returncode, peak_rss_mb)."""
+    spec = TARGETS[target]
+    script_path = os.path.join(ROOT_DIR, spec['script'])
+    env = dict(os.environ)
+    env.update({
+        'SUPABASE_URL': base_url,
+        'SUPABASE_KEY': FAKE_KEY,
+        'XAI_API_KEY': FAKE_KEY,
+        'XAI_BASE_URL': f"{base_url}/v1",
+        'GEMINI_API_KEY': FAKE_KEY,
+        'GEMINI_BASE_URL': base_url,
+        'EVALUATIONS_FILE': os.path.join(work_dir, f"{target}_evaluations.json"),
+        'OUTPUT_DIR': os.path.join(work_dir, 'output'),
+        'REPORT_DIR': os.path.join(work_dir, 'report'),
+        'EVENTS_FILE': os.path.join(work_dir, 'evaluation_events.jsonl'),
+        'STORE_DB': os.path.join(work_dir, 'store.db'),
+        'SAMPLE_EVALUATIONS_FILE': os.path.join(work_dir, 'sample_evaluations.json'),
+        'SAMPLE_REPORT_FILE': os.path.join(work_dir, 'sample_report.json'),
+        'CHAPTER_MANIFEST': os.path.join(work_dir, f"{target}_chapter_manifest.json"),
+        'QUEUE_DB': os.path.join(work_dir, 'task_queue.db'),
+        'OFFLINE_REPORT_FILE': os.path.join(work_dir, 'offline_quality_report.json'),
+        'OFFLINE_EVALUATIONS_FILE': os.path.join(work_dir, 'offline_evaluations.json'),
+    })
+    env.update(spec.get('env', {}))
+    # Start from the book's committed manifest so PDF titles are not re-read on every run.
+    manifest = {}
+    book_manifest = os.path.join(spec.get('book_dir') or env.get('PDF_DIRECTORY', ''), 'chapter_manifest.json')
+    if os.path.exists(book_manifest):
+        with open(book_manifest, 'r', encoding='utf-8') as f:
+            manifest = {"pdfs": json.load(f).get("pdfs", {})}
+    manifest["overrides"] = spec.get('chapter_overrides', {})
+    with open(env['CHAPTER_MANIFEST'], 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, script_path, *spec.get('args', [])],
+        cwd=os.path.dirname(script_path),
+        env=env,
+        stdin=subprocess.PIPE,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    process.stdin.write(spec.get('stdin', ''))
+    process.stdin.close()
+    peak_rss_mb = None
+    if hasattr(os, 'wait4'):
+        # wait4 reports the script's own peak memory (ru_maxrss is in KiB on Linux).
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        peak_rss_mb = round(usage.ru_maxrss / 1024, 1)
+    else:
+        process.wait()
+    return time.perf_counter() - started, process.returncode, peak_rss_mb
+
+
+def print_report(results, baseline=None):
+    baseline = {r['target']: r for r in (baseline or [])}
+    columns = ["wall_time_s", "cards", "cards_per_s", "llm_calls", "calls_per_s",
+               "latency_p50_s", "latency_p99_s", "completion_tokens", "tokens_per_card", "cost_usd", "cards_per_usd", "failed_calls", "peak_rss_mb"]
+    for result in results:
+        print(f"\n=== {result['target']} (exit code {result['returncode']}) ===")
+        previous = baseline.get(result['target'])
+        for column in columns:
+            line = f"  {column:<16} {str(result.get(column)):>12}"
+            if previous and previous.get(column) and result.get(column) is not None:
+                change = (result[column] - previous[column]) / previous[column] * 100
+                line += f"   ({change:+.1f}% vs baseline)"
+            print(line)
+
+
+def main():
+    """Runs the throughput benchmark for the selected pipeline scripts."""
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark against a local mock of xAI, Gemini and Supabase.")
+    parser.add_argument('targets', nargs='*', default=['evaluate_accuracy'], choices=sorted(TARGETS) + ['all'],
+                        help="Scripts to benchmark (default: evaluate_accuracy).")
+    add_mock_arguments(parser)
+    parser.add_argument('--json', dest='json_path', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare against a previous --json results file.")
+    parser.add_argument('--log', help="Write the scripts' output to this file instead of discarding it.")
+    args = parser.parse_args()
+
+    targets = sorted(TARGETS) if 'all' in args.targets else args.targets
+    state = MockState(load_seed_tables(args.scale), args.latency, args.jitter, args.error_rate, args.rpm, args.seed,
+                      args.token_latency)
+    server = start_server(state)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    print(f"Mock server on {base_url} with {len(state.tables['cards'])} seeded cards.")
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir, open(args.log or os.devnull, 'w', encoding='utf-8') as log_file:
+        completed = set()
+        for target in targets:
+            for required in TARGETS[target].get('requires', []):
+                if required not in completed:
+                    print(f"Running {required} to prepare {target}...")
+                    run_target(required, base_url, work_dir, log_file)
+                    completed.add(required)
+            print(f"Running {target}...")
+            state.reset()
+            wall_time, returncode, peak_rss_mb = run_target(target, base_url, work_dir, log_file)
+            calls = json.loads(urllib.request.urlopen(f"{base_url}/__stats").read())
+            results.append({**summarize(target, wall_time, calls, returncode), "peak_rss_mb": peak_rss_mb})
+            completed.add(target)
+    server.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        print(f"\nResults saved to {args.json_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import time
+import statistics
+import subprocess
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+CLI = os.path.join(ROOT_DIR, 'src', 'cli.py')
+
+# --- Configuration ---
+RUNS = 5 # Each command is timed this many times; the median is reported
+HEAVY_MODULES = ('openai', 'supabase', 'pdfplumber', 'google.genai', 'google.generativeai')
+# name: (working directory relative to ROOT_DIR, python arguments)
+COMMANDS = {
+    'cli-help': ('.', [CLI, '--help']),
+    'status': ('.', [CLI, 'status']),
+    'results': ('.', [CLI, 'results', 'runs']),
+    'report-help': ('.', [CLI, 'report', '--help']),
+    'validate-help': ('.', [CLI, 'validate', '--help']),
+    'evaluate-help': ('.', [CLI, 'evaluate', '--help']),
+    'import-evaluate_accuracy': ('src/evaluation', ['-c', 'import evaluate_accuracy']),
+    'import-grok_eval': ('src/evaluation', ['-c', 'import grok_eval']),
+    'import-run_evaluation': ('src/evaluation', ['-c', 'import run_evaluation']),
+    'import-distributed_eval': ('src/evaluation', ['-c', 'import distributed_eval']),
+    'import-generation_main': ('src/generation', ['-c', 'import main']),
+}
+
+
+def loaded_heavy_modules(stderr):
+    """Heavy SDKs that appear in `-X importtime` output (lines end with the module name)."""
+    names = {line.rsplit('|', 1)[-1].strip() for line in stderr.splitlines() if line.startswith('import time:')}
+    return [module for module in HEAVY_MODULES if module in names]
+
+
+def time_command(name, runs, env):
+    directory, args = COMMANDS[name]
+    times, heavy = [], []
+    for _ in range(runs):
+        # Timed from outside so interpreter start-up and every import count.
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=os.path.join(ROOT_DIR, directory),
+                                env=env, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        heavy = loaded_heavy_modules(result.stderr)
+    # The exit code is recorded, not checked: `status` exits 1 when the queue is empty.
+    return {"command": name, "median_s": round(statistics.median(times), 3), "min_s": round(min(times), 3),
+            "heavy_modules": heavy, "exit_code": result.returncode}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the start-up time of the pipeline commands and module imports.")
+    parser.add_argument('commands', nargs='*', help=f"Commands to time (default: all of {', '.join(COMMANDS)}).")
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--json', dest='json_path', help="Write the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare against a previous --json results file.")
+    args = parser.parse_args()
+    unknown = [name for name in args.commands if name not in COMMANDS]
+    if unknown:
+        parser.error(f"unknown command(s): {', '.join(unknown)}")
+    commands = args.commands or list(COMMANDS)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = {r['command']: r for r in json.load(f)}
+
+    # No credentials and throwaway databases, so nothing can reach a real service or touch real data.
+    with tempfile.TemporaryDirectory(prefix='startup_benchmark_') as work_dir:
+        env = {'PATH': os.environ.get('PATH', ''), 'HOME': work_dir,
+               'QUEUE_DB': os.path.join(work_dir, 'task_queue.db'),
+               'STORE_DB': os.path.join(work_dir, 'store.db')}
+
+        results = []
+        print(f"{'command':<26}{'median':>9}{'min':>9}   SDKs loaded")
+        for name in commands:
+            result = time_command(name, args.runs, env)
+            results.append(result)
+            line = f"{name:<26}{result['median_s']:>8.3f}s{result['min_s']:>8.3f}s   {', '.join(result['heavy_modules']) or '-'}"
+            previous = baseline.get(name)
+            if previous and previous['median_s']:
+                line += f"   ({(result['median_s'] - previous['median_s']) / previous['median_s'] * 100:+.1f}% vs baseline)"
+            print(line)
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+
+if __name__ == "__main__":
+    main()
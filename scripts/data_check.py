@@ -1,23 +1,18 @@
 import os
-from supabase import create_client, Client
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from common import clients
+
 # --- Configuration ---
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-
-# --- Initialize Client ---
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-except Exception as e:
-    print(f"Error initializing Supabase client: {e}")
-    exit()
+# The Supabase client is created on first use (see common/clients.py).
 
 def get_data(table_name, **kwargs):
     """Fetches data from a Supabase table with optional filters."""
     try:
-        query = supabase.table(table_name).select("*")
+        query = clients.supabase().table(table_name).select("*")
         for key, value in kwargs.items():
             query = query.eq(key, value)
         response = query.execute()
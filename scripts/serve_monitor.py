@@ -0,0 +1,87 @@
+import os
+import time
+import argparse
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# --- Configuration ---
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+EVENTS_FILE = os.path.join(ROOT_DIR, 'evaluation_events.jsonl')
+POLL_INTERVAL = 0.5 # Seconds between checks for new events
+HEARTBEAT_INTERVAL = 15 # Seconds between keep-alive comments on an idle stream
+
+
+class MonitorHandler(SimpleHTTPRequestHandler):
+    """Serves the dashboards and streams the evaluator's progress feed as Server-Sent Events."""
+
+    events_file = EVENTS_FILE
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/events':
+            return self.stream_events()
+        return super().do_GET()
+
+    def stream_events(self):
+        # The event id is the byte offset after the event, so a reconnecting browser
+        # (which sends Last-Event-ID) resumes exactly where it left off.
+        try:
+            offset = int(self.headers.get('Last-Event-ID') or 0)
+        except ValueError:
+            offset = 0
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'keep-alive')
+        self.end_headers()
+
+        last_write = time.monotonic()
+        try:
+            while True:
+                size = os.path.getsize(self.events_file) if os.path.exists(self.events_file) else 0
+                if size < offset:
+                    # The evaluator started a new run and reset the feed.
+                    offset = 0
+                    self.wfile.write(b"event: reset\ndata: {}\n\n")
+                if size > offset:
+                    with open(self.events_file, 'rb') as f:
+                        f.seek(offset)
+                        chunk = f.read(size - offset)
+                    # Only forward complete lines; a partially written event is picked up next time.
+                    complete = chunk[:chunk.rfind(b"\n") + 1]
+                    for line in complete.splitlines(keepends=True):
+                        offset += len(line)
+                        if line.strip():
+                            self.wfile.write(b"id: %d\ndata: %s\n\n" % (offset, line.strip()))
+                    self.wfile.flush()
+                    last_write = time.monotonic()
+                elif time.monotonic() - last_write > HEARTBEAT_INTERVAL:
+                    self.wfile.write(b": keep-alive\n\n")
+                    self.wfile.flush()
+                    last_write = time.monotonic()
+                time.sleep(POLL_INTERVAL)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+def main():
+    """Serves monitor.html and the live /events stream."""
+    parser = argparse.ArgumentParser(description="Serve the evaluation dashboards with a live progress feed.")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--events-file', default=EVENTS_FILE, help="Progress feed written by the evaluators.")
+    args = parser.parse_args()
+
+    handler = type('BoundMonitorHandler', (MonitorHandler,), {'events_file': os.path.abspath(args.events_file)})
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), partial(handler, directory=ROOT_DIR))
+    server.daemon_threads = True
+    print(f"Serving dashboards on http://127.0.0.1:{args.port}/monitor.html (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,36 @@
 import os
-from supabase import create_client, Client
+import sys
+import json
+import hashlib
+import argparse
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from common import clients, metrics
+from generation import validate_sql
+
+# Written by src/evaluation/offline_eval.py; files it rejected are not loaded.
+OFFLINE_REPORT_FILE = os.getenv("OFFLINE_REPORT_FILE", "../offline_quality_report.json")
+
+def load_quality_report(path=OFFLINE_REPORT_FILE):
+    """Returns {filename: report entry} from the offline quality report, or {} if there is none."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError):
+        return {}
+
 def main():
     """
     Connects to Supabase and executes all SQL files in the output directory.
     """
+    parser = argparse.ArgumentParser(description="Load the generated SQL files into Supabase.")
+    parser.add_argument("--include-rejected", action="store_true",
+                        help="Also load files that offline_eval.py rejected.")
+    parser.add_argument("--jobs", type=int, help="Processes used to validate the files (default: one per CPU).")
+    args = parser.parse_args()
     load_dotenv()
+    metrics.start_run("load")
 
     supabase_url = os.getenv("SUPABASE_URL")
     supabase_key = os.getenv("SUPABASE_KEY")
@@ -16,7 +40,7 @@ def main():
         return
 
     print("Connecting to Supabase...")
-    supabase: Client = create_client(supabase_url, supabase_key)
+    supabase = clients.supabase()
     print("Successfully connected to Supabase.")
 
     output_dir = "../output"
@@ -30,13 +54,38 @@ def main():
         return
 
     print(f"Found {len(sql_files)} SQL files to execute.")
+    # Validate every file locally first, in parallel, so broken scripts never cost a DB round trip.
+    with metrics.span("sql_validate"):
+        validations = {os.path.basename(r["path"]): r for r in validate_sql.validate_files(
+            [os.path.join(output_dir, f) for f in sorted(sql_files)], jobs=args.jobs)}
+    quality = load_quality_report()
+    if not quality:
+        print(f"No offline quality report at {OFFLINE_REPORT_FILE}; loading every file unchecked.")
 
     for filename in sorted(sql_files):
         file_path = os.path.join(output_dir, filename)
+        entry = quality.get(filename)
+        if entry:
+            with open(file_path, "rb") as f:
+                unchanged = hashlib.sha256(f.read()).hexdigest() == entry.get("sha256")
+            if not unchanged:
+                print(f"\nNote: {filename} changed since the offline evaluation; its verdict no longer applies.")
+            elif entry.get("status") == "rejected" and not args.include_rejected:
+                metrics.incr("files_rejected")
+                print(f"\nSkipping {filename}: rejected by the offline evaluation ({'; '.join(entry.get('reasons', []))}).")
+                continue
+        elif quality:
+            print(f"\nNote: {filename} was not checked by the offline evaluation.")
+        validation = validations[filename]
+        if validation["errors"]:
+            metrics.incr("files_invalid")
+            print(f"\nSkipping {filename}: invalid SQL ({'; '.join(validation['errors'])}).")
+            continue
+        for repair in validation["repairs"]:
+            print(f"\nRepairing {filename} before loading: {repair}")
         print(f"\nExecuting {filename}...")
         try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                sql_content = f.read()
+            sql_content = validation["sql"]
             
             # Supabase Python library doesn't have a direct way to execute raw SQL 
             # that isn't a function. We need to create an RPC function.
@@ -46,11 +95,16 @@ def main():
             #   EXECUTE sql;
             # END;
             # $ LANGUAGE plpgsql;
-            supabase.rpc('execute_sql', {'sql': sql_content}).execute()
+            with metrics.span("sql_execute", chapter=filename):
+                supabase.rpc('execute_sql', {'sql': sql_content}).execute()
+            metrics.incr("files_loaded")
             print(f"Successfully executed {filename}.")
 
         except Exception as e:
+            metrics.incr("files_failed")
             print(f"An error occurred while executing {filename}: {e}")
 
+    metrics.print_summary()
+
 if __name__ == "__main__":
     main()
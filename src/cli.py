@@ -0,0 +1,74 @@
+"""Single entry point for the pipeline scripts.
+
+    python src/cli.py <command> [options]      # e.g. python src/cli.py validate --write
+    python src/cli.py --help                   # lists the commands
+
+Each command runs the existing script unchanged, from its own directory (the scripts resolve
+their default paths relative to it). Nothing is imported until a command is chosen, and the
+scripts create API clients only when they make a call, so quick commands such as `status`,
+`report`, `results` and `validate` start without loading any SDK.
+"""
+import os
+import sys
+import runpy
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(SRC_DIR, '..', 'scripts')
+
+# command: (script, arguments inserted before the user's, description)
+COMMANDS = {
+    'plan': ('evaluation/plan.py', [], "Dry-run the calls, tokens, cost and time of a job"),
+    'generate': ('generation/main.py', [], "Generate flashcard SQL for a book's chapter PDFs"),
+    'validate': ('generation/validate_sql.py', [], "Validate and repair generated SQL scripts"),
+    'offline': ('evaluation/offline_eval.py', [], "Judge generated SQL before loading it"),
+    'load': (os.path.join(SCRIPTS_DIR, 'supabase-run.py'), [], "Load the generated SQL into Supabase"),
+    'evaluate': ('evaluation/evaluate_accuracy.py', [], "Judge card accuracy against the chapter text"),
+    'grok-eval': ('evaluation/grok_eval.py', [], "Chapter, topic and card evaluation with Grok"),
+    'gemini-eval': ('evaluation/run_evaluation.py', [], "Chapter, topic and card evaluation with Gemini"),
+    'distributed': ('evaluation/distributed_eval.py', [], "Coordinator/worker accuracy evaluation"),
+    'status': ('evaluation/distributed_eval.py', ['status'], "Task counts of a distributed run"),
+    'results': ('evaluation/results_store.py', [], "Query stored evaluation results"),
+    'analytics': ('evaluation/analytics.py', [], "Score distributions and drift across evaluation runs"),
+    'report': ('evaluation/build_report.py', [], "Build the sharded evaluation report"),
+    'golden-index': ('evaluation/golden_index.py', [], "Rebuild the golden example index"),
+    'monitor': (os.path.join(SCRIPTS_DIR, 'serve_monitor.py'), [], "Serve the dashboards with live progress"),
+    'data-check': (os.path.join(SCRIPTS_DIR, 'data_check.py'), [], "Diagnose data integrity issues"),
+}
+
+
+def usage():
+    lines = ["usage: cli.py <command> [options]", "", "commands:"]
+    lines += [f"  {name:<14}{description}" for name, (_, _, description) in COMMANDS.items()]
+    lines += ["", "Run 'cli.py <command> --help' for a command's options."]
+    return "\n".join(lines)
+
+
+def _absolute(arg):
+    # The script runs from its own directory, so paths given relative to the caller's are resolved first.
+    return os.path.abspath(arg) if not arg.startswith('-') and os.path.exists(arg) else arg
+
+
+def run(command, args):
+    script, fixed_args, _ = COMMANDS[command]
+    path = os.path.normpath(os.path.join(SRC_DIR, script))
+    args = [_absolute(arg) for arg in args]
+    directory = os.path.dirname(path)
+    os.chdir(directory)
+    sys.path.insert(0, directory)
+    sys.argv = [path, *fixed_args, *args]
+    runpy.run_path(path, run_name='__main__')
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print(usage())
+        return 0
+    command = sys.argv[1]
+    if command not in COMMANDS:
+        print(f"Unknown command '{command}'.\n\n{usage()}")
+        return 2
+    run(command, sys.argv[2:])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
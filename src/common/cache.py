@@ -0,0 +1,42 @@
+"""Small content-addressed JSON cache shared by the pipeline scripts.
+
+Values are stored in the `entries` table of the project store (see common/store.py) under
+(namespace, key), where the key is a hash of everything the value depends on (see `make_key`),
+so a changed input simply misses the cache.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+
+from . import store
+
+
+def make_key(*parts):
+    """Stable hash of any JSON-serializable parts."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def file_fingerprint(path):
+    """Cheap identity of a file's current contents (path, size and modification time)."""
+    stat = os.stat(path)
+    return [os.path.abspath(path), stat.st_size, stat.st_mtime_ns]
+
+
+def get(namespace, key, default=None):
+    """Returns the cached value, or `default` on a miss or an unreadable entry."""
+    try:
+        value = store.get_entry(namespace, key)
+    except (sqlite3.Error, OSError, ValueError):
+        return default
+    return default if value is None else value
+
+
+def put(namespace, key, value):
+    """Stores a value in one transaction, so concurrent readers never see a partial entry."""
+    try:
+        store.put_entry(namespace, key, value)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Warning: could not write cache entry {namespace}/{key}: {e}")
+    return value
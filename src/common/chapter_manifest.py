@@ -0,0 +1,155 @@
+"""Persisted chapter -> PDF mapping for a book directory.
+
+Pairing the n-th chapter with the n-th sorted PDF breaks as soon as a chapter's PDF is missing
+(books/class11_biology has no kebo103/104/108), silently evaluating cards against another
+chapter's text. Instead, each PDF's title is read from its opening pages once, stored in
+`chapter_manifest.json` next to the PDFs, and database chapters are matched to PDFs by name.
+
+Wrong or missing matches can be fixed by hand in the manifest's "overrides" section, which maps a
+database chapter name to a PDF file name and always wins over name matching. The manifest only
+changes when a PDF does; the matches a run makes are kept in the cache, so runs leave it untouched.
+"""
+import os
+import re
+import json
+import difflib
+import hashlib
+import tempfile
+
+from . import cache, pdf_text
+
+# --- Configuration ---
+MANIFEST_FILENAME = 'chapter_manifest.json'
+MATCH_THRESHOLD = 0.75 # Minimum name similarity (0-1) for a chapter to be paired with a PDF
+NUMBER_BONUS = 0.1 # Added when the PDF's 'CHAPTER n' label equals the chapter's order_index
+
+
+def manifest_path(pdf_directory):
+    return os.getenv("CHAPTER_MANIFEST") or os.path.join(pdf_directory, MANIFEST_FILENAME)
+
+
+def normalize_name(name):
+    """Lowercase words only, without 'Chapter 3:'-style prefixes, so 'Chapter 2: The Cell' ~ 'THE CELL'."""
+    name = re.sub(r'^\s*(chapter|unit|lesson)\s*\d+\s*[:.\-]?\s*', '', name or '', flags=re.IGNORECASE)
+    return " ".join(re.findall(r'[a-z0-9]+', name.lower()))
+
+
+def name_similarity(a, b):
+    return difflib.SequenceMatcher(None, normalize_name(a), normalize_name(b)).ratio()
+
+
+def _file_hash(path):
+    """SHA-256 of a PDF, read from the cache while its size and mtime are unchanged."""
+    # Content hashes (unlike mtimes) survive a fresh checkout, so a committed manifest stays valid.
+    key = cache.make_key(cache.file_fingerprint(path))
+    file_hash = cache.get('file_sha256', key)
+    if file_hash is None:
+        with open(path, 'rb') as f:
+            file_hash = cache.put('file_sha256', key, hashlib.sha256(f.read()).hexdigest())
+    return file_hash
+
+
+def _save(manifest, path):
+    """Replaces the manifest atomically; concurrent writers each use their own temporary file."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_manifest(pdf_directory):
+    """Loads the manifest, reading titles only for PDFs that are new or changed since it was written."""
+    path = manifest_path(pdf_directory)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault("overrides", {})
+    known = manifest.setdefault("pdfs", {})
+
+    # Manifests written before matches moved to the cache carry a "chapters" section; it is dropped.
+    changed = manifest.pop("chapters", None) is not None
+    pdf_files = sorted(f for f in os.listdir(pdf_directory) if f.lower().endswith('.pdf'))
+    for filename in pdf_files:
+        file_hash = _file_hash(os.path.join(pdf_directory, filename))
+        if known.get(filename, {}).get("sha256") == file_hash:
+            continue
+        name, number = pdf_text.detect_chapter(os.path.join(pdf_directory, filename))
+        known[filename] = {"sha256": file_hash, "chapter_name": name, "chapter_number": number}
+        changed = True
+    for filename in [f for f in known if f not in pdf_files]:
+        del known[filename]
+        changed = True
+
+    if changed:
+        try:
+            _save(manifest, path)
+        except OSError as e:
+            print(f"Warning: could not save chapter manifest to {path}: {e}")
+    return manifest
+
+
+def pdfs_in_chapter_order(pdf_directory):
+    """(filename, chapter_name, chapter_number) for every PDF, ordered by chapter number then file name."""
+    pdfs = load_manifest(pdf_directory)["pdfs"]
+    entries = [(f, e["chapter_name"], e.get("chapter_number")) for f, e in pdfs.items()]
+    return sorted(entries, key=lambda e: (e[2] is None, e[2] or 0, e[0]))
+
+
+def match_chapters(chapters, pdf_directory):
+    """Pairs database chapters with PDFs in `pdf_directory`, one PDF per chapter.
+
+    Returns ({chapter_id: pdf_path}, unmatched_chapters, unmatched_pdf_files). Overrides are applied
+    first, then the remaining pairs are taken best-similarity-first above MATCH_THRESHOLD.
+    """
+    manifest = load_manifest(pdf_directory)
+    pdfs = manifest["pdfs"]
+    matched, used_pdfs, records = {}, set(), {}
+
+    for chapter in chapters:
+        filename = manifest["overrides"].get(chapter['name'])
+        if filename in pdfs and filename not in used_pdfs:
+            matched[chapter['id']] = filename
+            used_pdfs.add(filename)
+            records[chapter['name']] = {"pdf": filename, "score": None, "source": "override"}
+
+    candidates = []
+    for chapter in chapters:
+        if chapter['id'] in matched:
+            continue
+        for filename, entry in pdfs.items():
+            if filename in used_pdfs:
+                continue
+            score = name_similarity(chapter['name'], entry["chapter_name"])
+            if entry.get("chapter_number") is not None and entry["chapter_number"] == chapter.get('order_index'):
+                score += NUMBER_BONUS
+            if score >= MATCH_THRESHOLD:
+                candidates.append((score, chapter, filename))
+    for score, chapter, filename in sorted(candidates, key=lambda c: -c[0]):
+        if chapter['id'] in matched or filename in used_pdfs:
+            continue
+        matched[chapter['id']] = filename
+        used_pdfs.add(filename)
+        records[chapter['name']] = {"pdf": filename, "score": round(score, 3), "source": "name"}
+
+    # The run's matches go to the cache for inspection, never into the versioned manifest.
+    cache.put('chapter_matches', cache.make_key(os.path.abspath(manifest_path(pdf_directory))), records)
+
+    unmatched_chapters = [c for c in chapters if c['id'] not in matched]
+    unmatched_pdfs = sorted(f for f in pdfs if f not in used_pdfs)
+    return {cid: os.path.join(pdf_directory, f) for cid, f in matched.items()}, unmatched_chapters, unmatched_pdfs
+
+
+def report_unmatched(unmatched_chapters, unmatched_pdfs, pdf_directory):
+    """Prints what could not be paired, so skipped chapters are never silent."""
+    for chapter in unmatched_chapters:
+        print(f"Warning: no PDF in {pdf_directory} matches chapter '{chapter['name']}'; it will be skipped. "
+              f"Add it to \"overrides\" in {manifest_path(pdf_directory)} if the PDF exists under another title.")
+    if unmatched_pdfs:
+        print(f"Note: {len(unmatched_pdfs)} PDF(s) match no selected chapter: {', '.join(unmatched_pdfs)}")
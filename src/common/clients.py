@@ -0,0 +1,65 @@
+"""API clients built on first use.
+
+Importing the Supabase, OpenAI and Google SDKs takes over a second, so the pipeline modules
+only ask for a client inside the functions that call an API. Commands that never touch the
+network (status, report, validate, dry runs) start without loading any SDK, and the modules can
+be imported in a plain interpreter or a test without credentials.
+
+    from common import clients
+    rows = clients.supabase().table("cards").select("*").execute().data
+    response = clients.xai().chat.completions.create(model="grok-4", messages=[...])
+"""
+import os
+import threading
+
+from dotenv import load_dotenv
+
+_lock = threading.Lock()
+_clients = {}
+
+
+def _get(name, build):
+    with _lock:
+        if name not in _clients:
+            load_dotenv()
+            _clients[name] = build()
+        return _clients[name]
+
+
+def supabase():
+    """Supabase client for SUPABASE_URL / SUPABASE_KEY."""
+    def build():
+        from supabase import create_client
+        return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+    return _get('supabase', build)
+
+
+def xai():
+    """OpenAI-compatible client for xAI's Grok models (XAI_API_KEY, XAI_BASE_URL)."""
+    def build():
+        from openai import OpenAI
+        return OpenAI(api_key=os.getenv("XAI_API_KEY"), base_url=os.getenv("XAI_BASE_URL", "https://api.x.ai/v1"))
+    return _get('xai', build)
+
+
+def genai():
+    """google-genai client used by generation (GEMINI_API_KEY, optional GEMINI_BASE_URL)."""
+    def build():
+        from google import genai as google_genai
+        base_url = os.getenv("GEMINI_BASE_URL")
+        return google_genai.Client(http_options={'base_url': base_url}) if base_url else google_genai.Client()
+    return _get('genai', build)
+
+
+def gemini_model(model_name):
+    """google-generativeai model used by run_evaluation.py (GEMINI_API_KEY, optional GEMINI_BASE_URL)."""
+    def build():
+        import google.generativeai as generativeai
+        base_url = os.getenv("GEMINI_BASE_URL")
+        if base_url:
+            generativeai.configure(api_key=os.getenv("GEMINI_API_KEY"), transport='rest',
+                                   client_options={'api_endpoint': base_url})
+        else:
+            generativeai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+        return generativeai.GenerativeModel(model_name)
+    return _get(f'gemini:{model_name}', build)
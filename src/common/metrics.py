@@ -0,0 +1,231 @@
+"""Lightweight per-stage timing, counters and token/cost accounting shared by all pipeline scripts.
+
+Every event is appended as one JSON line to the run's metrics file, and `print_summary()`
+prints where the wall time and the money went at the end of a run.
+
+    from common import metrics
+    metrics.start_run("evaluate_accuracy")
+    with metrics.labels(chapter=chapter_name):
+        with metrics.span("pdf_extract"):
+            text = get_pdf_text(path)
+        with metrics.span("llm_call", model=model):
+            response = client.chat.completions.create(...)
+        metrics.record_usage(model, response)
+    metrics.print_summary()
+"""
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from . import store
+
+# --- Configuration ---
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+METRICS_DIR = os.getenv("METRICS_DIR", os.path.join(ROOT_DIR, 'metrics'))
+# USD per 1M (prompt, completion) tokens. Update when provider pricing changes.
+MODEL_PRICES = {
+    'grok-4': (3.00, 15.00),
+    'grok-3-mini': (0.30, 0.50),
+    'gemini-1.5-flash': (0.075, 0.30),
+    'gemini-1.5-pro-latest': (1.25, 5.00),
+    'gemini-2.0-flash': (0.10, 0.40),
+}
+
+_lock = threading.Lock()
+_local = threading.local()
+_run = None
+
+
+def _new_run(name, labels):
+    run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{name}"
+    return {
+        "run_id": run_id,
+        "name": name,
+        "labels": labels,
+        "started": time.perf_counter(),
+        "path": os.getenv("METRICS_FILE") or os.path.join(METRICS_DIR, f"{run_id}.jsonl"),
+        "file": None,
+        "spans": {},
+        "counters": {},
+        "usage": {},
+    }
+
+
+def start_run(name=None, **labels):
+    """Starts a new metrics run. Called once at the top of each script's main()."""
+    global _run
+    name = name or os.path.splitext(os.path.basename(sys.argv[0] or 'run'))[0]
+    with _lock:
+        if _run and _run["file"]:
+            _run["file"].close()
+        _run = _new_run(name, labels)
+    _emit({"type": "run_start", **labels})
+    return _run["run_id"]
+
+
+def _current_run():
+    if _run is None:
+        start_run()
+    return _run
+
+
+def run_id():
+    """The current run's id, as returned by `start_run`."""
+    return _current_run()["run_id"]
+
+
+def current_labels():
+    """Returns the labels set by enclosing `labels()` blocks on this thread."""
+    return dict(getattr(_local, 'labels', {}))
+
+
+def set_labels(**new_labels):
+    """Replaces this thread's labels, e.g. at the top of a per-chapter loop iteration."""
+    _local.labels = dict(new_labels)
+
+
+@contextmanager
+def labels(**new_labels):
+    """Attaches labels (e.g. chapter, chunk) to every event recorded inside the block on this thread."""
+    previous = current_labels()
+    _local.labels = {**previous, **new_labels}
+    try:
+        yield
+    finally:
+        _local.labels = previous
+
+
+def _emit(event):
+    run = _current_run()
+    event = {"ts": round(time.time(), 3), "run_id": run["run_id"], **event}
+    line = json.dumps(event, ensure_ascii=False, default=str)
+    with _lock:
+        try:
+            if run["file"] is None:
+                os.makedirs(os.path.dirname(run["path"]) or '.', exist_ok=True)
+                run["file"] = open(run["path"], 'a', encoding='utf-8')
+            run["file"].write(line + "\n")
+            run["file"].flush()
+        except OSError as e:
+            print(f"Warning: could not write metrics to {run['path']}: {e}")
+
+
+def _chapter_of(event_labels):
+    return event_labels.get("chapter", "(no chapter)")
+
+
+@contextmanager
+def span(stage, **extra):
+    """Times the enclosed block as one occurrence of `stage`."""
+    event_labels = {**current_labels(), **extra}
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        run = _current_run()
+        with _lock:
+            totals = run["spans"].setdefault(stage, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+            totals["count"] += 1
+            totals["total_s"] += duration
+            totals["max_s"] = max(totals["max_s"], duration)
+        event = {"type": "span", "name": stage, "duration_s": round(duration, 6), **event_labels}
+        if error:
+            event["error"] = error
+        _emit(event)
+
+
+def incr(name, value=1, **extra):
+    """Adds `value` to the counter `name`."""
+    event_labels = {**current_labels(), **extra}
+    run = _current_run()
+    with _lock:
+        run["counters"][name] = run["counters"].get(name, 0) + value
+    _emit({"type": "counter", "name": name, "value": value, **event_labels})
+
+
+def token_counts(response):
+    """Extracts (prompt_tokens, completion_tokens) from an OpenAI-compatible or Gemini response."""
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        return usage.prompt_tokens or 0, usage.completion_tokens or 0
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        return usage.prompt_token_count or 0, usage.candidates_token_count or 0
+    return 0, 0
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    """Cost in USD for the given token counts, or 0.0 for models without a known price."""
+    prompt_price, completion_price = MODEL_PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def record_usage(model, response=None, prompt_tokens=None, completion_tokens=None, **extra):
+    """Records token usage and estimated cost of one LLM call, from the response or explicit counts."""
+    if response is not None:
+        prompt_tokens, completion_tokens = token_counts(response)
+    prompt_tokens, completion_tokens = prompt_tokens or 0, completion_tokens or 0
+    event_labels = {**current_labels(), **extra}
+    cost = estimate_cost(model, prompt_tokens, completion_tokens)
+    run = _current_run()
+    with _lock:
+        totals = run["usage"].setdefault(_chapter_of(event_labels),
+                                         {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0})
+        totals["calls"] += 1
+        totals["prompt_tokens"] += prompt_tokens
+        totals["completion_tokens"] += completion_tokens
+        totals["cost_usd"] += cost
+    _emit({"type": "usage", "model": model, "prompt_tokens": prompt_tokens,
+           "completion_tokens": completion_tokens, "cost_usd": round(cost, 6), **event_labels})
+    return prompt_tokens, completion_tokens
+
+
+def record_response(stage, model, prompt, text):
+    """Keeps one model response in the project store (common/store.py), under the current run and chapter."""
+    store.record_response(run_id(), stage, model, prompt, text, chapter=current_labels().get("chapter"))
+
+
+def summary():
+    """Returns the aggregated spans, counters and per-chapter usage of the current run."""
+    run = _current_run()
+    with _lock:
+        return {
+            "run_id": run["run_id"],
+            "wall_time_s": round(time.perf_counter() - run["started"], 3),
+            "spans": {k: dict(v) for k, v in run["spans"].items()},
+            "counters": dict(run["counters"]),
+            "usage_per_chapter": {k: dict(v) for k, v in run["usage"].items()},
+        }
+
+
+def print_summary():
+    """Prints the end-of-run summary and appends it to the metrics file and the project store."""
+    result = summary()
+    _emit({"type": "summary", **result})
+    store.finish_run(result["run_id"], _current_run()["name"], result)
+
+    print(f"\n--- Run summary ({result['run_id']}, {result['wall_time_s']:.1f}s wall time) ---")
+    if result["spans"]:
+        print(f"{'Stage':<24}{'Count':>8}{'Total s':>12}{'Mean s':>10}{'Max s':>10}")
+        for stage, t in sorted(result["spans"].items(), key=lambda item: -item[1]["total_s"]):
+            print(f"{stage:<24}{t['count']:>8}{t['total_s']:>12.2f}{t['total_s'] / t['count']:>10.3f}{t['max_s']:>10.2f}")
+    if result["counters"]:
+        print("Counters: " + ", ".join(f"{k}={v}" for k, v in sorted(result["counters"].items())))
+    if result["usage_per_chapter"]:
+        print(f"{'Chapter':<40}{'Calls':>7}{'Prompt tok':>12}{'Compl. tok':>12}{'Cost $':>10}")
+        total_cost = 0.0
+        for chapter, u in result["usage_per_chapter"].items():
+            total_cost += u["cost_usd"]
+            print(f"{chapter[:39]:<40}{u['calls']:>7}{u['prompt_tokens']:>12}{u['completion_tokens']:>12}{u['cost_usd']:>10.4f}")
+        print(f"{'Total':<40}{'':>31}{total_cost:>10.4f}")
+    print(f"Metrics written to {_current_run()['path']}")
+    return result
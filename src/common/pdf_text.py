@@ -0,0 +1,252 @@
+"""Single-pass, page-at-a-time PDF text extraction for NCERT chapter PDFs.
+
+Each page is laid out once with pdfplumber's `extract_text_lines`, which returns the same text as
+`extract_text` plus the characters behind every line. The font sizes and faces of those characters
+are enough to find the chapter title and the numbered (1.1, 1.2, ...) section headings without
+re-scanning the joined text.
+
+Nearly all of the cost is pdfminer parsing each page's content stream, so whole-document results
+are cached per file fingerprint: generation and every evaluator reuse one parse of each book.
+The text handed to callers has its running heads, reprint notices and the like removed by
+text_clean.py, so no prompt pays for them.
+"""
+import re
+from collections import Counter
+
+from . import cache, text_clean
+
+# --- Configuration ---
+EXTRACTOR_VERSION = 3 # Bump when extraction output changes, to invalidate cached results
+TITLE_SEARCH_PAGES = 3 # Chapter titles sit on the opening page, after at most a unit opener or two
+TITLE_SIZE_RATIO = 1.35 # Title characters are at least this much larger than the page's body text
+HEADING_SIZE_RATIO = 1.1 # Numbered headings are larger than body text, or set in a bold face
+BOLD_FONT_MARKERS = ('bold', 'demi', 'black', 'heavy', 'semibold')
+NUMBERED_HEADING = re.compile(r'^(\d+(?:\.\d+)+)\s+(\S.*)$')
+TITLE_LABEL = re.compile(r'^(chapter|unit|c|u)\s*(\d+)$', re.IGNORECASE)
+SMALL_WORDS = {'a', 'an', 'and', 'as', 'at', 'by', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'}
+
+
+def _visible(chars):
+    return [c for c in chars if c['text'].strip()]
+
+
+def _body_size(chars):
+    """The most common character size on the page, i.e. the size of its running text."""
+    sizes = Counter(round(c['size'], 1) for c in chars)
+    return sizes.most_common(1)[0][0] if sizes else 0.0
+
+
+def _is_bold(fontname):
+    name = fontname.split('+')[-1].lower()
+    return any(marker in name for marker in BOLD_FONT_MARKERS)
+
+
+def _overlaps(a, b):
+    overlap = min(a['bottom'], b['bottom']) - max(a['top'], b['top'])
+    return overlap >= 0.5 * min(a['bottom'] - a['top'], b['bottom'] - b['top'])
+
+
+def _heading_text(first, page_chars):
+    """Re-reads a heading from the characters beside its number.
+
+    Small-caps headings ('9.2 PRIMARY AND ...') set their lower-case letters a few points
+    lower than the capitals, which line extraction splits onto a separate line.
+    """
+    band = sorted((c for c in page_chars if c['x0'] >= first['x0'] - 1 and c['size'] >= first['size'] * 0.6
+                   and _overlaps(c, first)), key=lambda c: c['x0'])
+    text, prev = '', None
+    for c in band:
+        if prev:
+            gap = c['x0'] - prev['x1']
+            if gap > first['size'] * 2: # the heading ended; anything further right is another column
+                break
+            if gap > min(c['size'], prev['size']) * 0.2:
+                text += ' '
+        text += c['text']
+        prev = c
+    return text
+
+
+def _line_headings(lines, page_chars, body_size, page_number):
+    headings = []
+    for line in lines:
+        chars = _visible(line['chars'])
+        if not chars or not NUMBERED_HEADING.match(line['text']):
+            continue
+        first = chars[0]
+        if first['size'] < body_size * HEADING_SIZE_RATIO and not _is_bold(first['fontname']):
+            continue
+        match = NUMBERED_HEADING.match(_heading_text(first, page_chars)) or NUMBERED_HEADING.match(line['text'])
+        if match:
+            headings.append({
+                "number": match.group(1),
+                "title": match.group(2).strip(),
+                "level": match.group(1).count('.'),
+                "page": page_number,
+                "size": round(first['size'], 1),
+            })
+    return headings
+
+
+def _title_rows(chars, body_size):
+    """Groups a page's large characters into visual rows, left to right.
+
+    Rows are formed by vertical overlap rather than a shared baseline, so drop caps
+    (a 30pt 'B' followed by 15pt 'IOLOGICAL') rejoin the rest of their word.
+    """
+    rows = []
+    for c in sorted((c for c in chars if c['size'] >= body_size * TITLE_SIZE_RATIO), key=lambda c: c['top']):
+        height = c['bottom'] - c['top']
+        for row in rows:
+            overlap = min(row['bottom'], c['bottom']) - max(row['top'], c['top'])
+            if overlap >= 0.5 * min(height, row['height']):
+                row['chars'].append(c)
+                row['top'], row['bottom'] = min(row['top'], c['top']), max(row['bottom'], c['bottom'])
+                row['height'] = min(row['height'], height)
+                break
+        else:
+            rows.append({'top': c['top'], 'bottom': c['bottom'], 'height': height, 'chars': [c]})
+
+    texts = []
+    for row in sorted(rows, key=lambda r: r['top']):
+        text, prev = '', None
+        for c in sorted(row['chars'], key=lambda c: c['x0']):
+            if prev and c['x0'] - prev['x1'] > min(c['size'], prev['size']) * 0.2:
+                text += ' '
+            text += c['text']
+            prev = c
+        if re.search(r'[A-Za-z0-9]', text):
+            texts.append(text.strip())
+    return texts
+
+
+def _page_title(chars, body_size):
+    """Returns (label, number, title) for an opening page, e.g. ('chapter', 2, 'BIOLOGICAL CLASSIFICATION')."""
+    label, number, title_rows = None, None, []
+    for row in _title_rows(chars, body_size):
+        match = TITLE_LABEL.match(row)
+        if match:
+            label = 'unit' if match.group(1).lower() in ('unit', 'u') else 'chapter'
+            number = int(match.group(2))
+        elif re.search(r'[A-Za-z]', row):
+            title_rows.append(row)
+    return label, number, " ".join(title_rows) or None
+
+
+def _display_name(title):
+    """Title-cases all-caps titles ('CELL CYCLE AND CELL DIVISION' -> 'Cell Cycle and Cell Division')."""
+    title = re.sub(r'\s+', ' ', title).strip()
+    if title != title.upper():
+        return title
+    words = title.lower().split(' ')
+    return " ".join(w if i and w in SMALL_WORDS else w[:1].upper() + w[1:] for i, w in enumerate(words))
+
+
+def iter_pages(pdf_path, max_pages=None):
+    """Lazily yields one dict per page with its text, numbered headings and (on opening pages) title.
+
+    Every page is laid out exactly once and released before the next one is read, so a caller
+    that stops iterating early never pays for the rest of the document.
+    """
+    import pdfplumber # imported here so modules that only read cached results never load it
+    with pdfplumber.open(pdf_path) as pdf:
+        for index, page in enumerate(pdf.pages):
+            if max_pages is not None and index >= max_pages:
+                break
+            lines = page.extract_text_lines(return_chars=True)
+            chars = _visible(page.chars)
+            body_size = _body_size(chars)
+            label, number, title = _page_title(chars, body_size) if index < TITLE_SEARCH_PAGES else (None, None, None)
+            yield {
+                "number": index + 1,
+                "text": "\n".join(line['text'] for line in lines),
+                "headings": _line_headings(lines, chars, body_size, index + 1),
+                "title_label": label,
+                "title_number": number,
+                "title": title,
+            }
+            page.close()
+
+
+def choose_chapter_name(pages):
+    """Picks the chapter name from already-extracted opening pages.
+
+    A title labelled 'CHAPTER n' wins, then any unlabelled title; unit openers ('UNIT 1 ...')
+    are skipped. Without a usable title this falls back to the first non-empty line of text.
+    """
+    titled = [p for p in pages if p.get("title")]
+    for page in titled:
+        if page["title_label"] == 'chapter':
+            return _display_name(page["title"])
+    for page in titled:
+        if page["title_label"] is None:
+            return _display_name(page["title"])
+    for page in pages:
+        for line in page["text"].splitlines():
+            if line.strip():
+                return line.strip()
+    return "Unknown Chapter"
+
+
+def choose_chapter_number(pages):
+    """The number from the opening 'CHAPTER n' label, or None when the PDF has no such label."""
+    for page in pages:
+        if page.get("title_label") == 'chapter':
+            return page["title_number"]
+    return None
+
+
+def _extract_raw(pdf_path, max_pages=None):
+    """The extraction as printed, with `page_starts` (each page's offset in `text`); cached per file."""
+    key = cache.make_key(EXTRACTOR_VERSION, cache.file_fingerprint(pdf_path), max_pages)
+    cached = cache.get('pdf_text', key)
+    if cached is not None:
+        return key, cached
+    pages = [page for page in iter_pages(pdf_path, max_pages) if page["text"]]
+    opening_pages = [p for p in pages if p["number"] <= TITLE_SEARCH_PAGES]
+    page_starts, offset = [], 0
+    for page in pages:
+        page_starts.append(offset)
+        offset += len(page["text"]) + 1
+    return key, cache.put('pdf_text', key, {
+        "text": "\n".join(page["text"] for page in pages),
+        "page_starts": page_starts,
+        "chapter_name": choose_chapter_name(opening_pages),
+        "chapter_number": choose_chapter_number(opening_pages),
+        "headings": [h for page in pages for h in page["headings"]],
+        "num_pages": len(pages),
+    })
+
+
+def _cleaned(extracted):
+    text, starts = extracted["text"], extracted["page_starts"]
+    page_texts = [text[start:end - 1] for start, end in zip(starts, starts[1:] + [len(text) + 1])]
+    clean, removed = text_clean.clean_pages(page_texts)
+    return {"text": clean, "raw_tokens": text_clean.count_tokens(text), "clean_tokens": text_clean.count_tokens(clean),
+            "removed": removed}
+
+
+def extract_pdf(pdf_path, max_pages=None, clean=None):
+    """Reads a PDF in one pass: its text, chapter name and numbered section headings.
+
+    The text has its page furniture removed (see text_clean.py) unless `clean` is False or
+    CLEAN_TEXT=0; `cleaning` then reports the tokens before and after. Both the extraction and the
+    cleaned text are cached until the file changes, so later runs skip PDF parsing entirely.
+    """
+    key, extracted = _extract_raw(pdf_path, max_pages)
+    if not (text_clean.ENABLED if clean is None else clean):
+        return extracted
+    clean_key = cache.make_key(text_clean.CLEANER_VERSION, key)
+    cleaned = cache.get('clean_text', clean_key) or cache.put('clean_text', clean_key, _cleaned(extracted))
+    return {**extracted, "text": cleaned["text"], "cleaning": {k: v for k, v in cleaned.items() if k != "text"}}
+
+
+def extract_text(pdf_path, max_pages=None, clean=None):
+    """All page text joined by newlines, as the old per-page `extract_text` join produced (cleaned by default)."""
+    return extract_pdf(pdf_path, max_pages, clean)["text"]
+
+
+def detect_chapter(pdf_path):
+    """Returns (name, number) from the opening pages only, without parsing the rest of the document."""
+    pages = list(iter_pages(pdf_path, max_pages=TITLE_SEARCH_PAGES))
+    return choose_chapter_name(pages), choose_chapter_number(pages)
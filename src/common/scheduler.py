@@ -0,0 +1,94 @@
+"""Dependency-aware task execution and a shared LLM rate limiter.
+
+`run_dag` starts each task as soon as the tasks it depends on have finished, so independent stages
+(e.g. a chapter's topic and chunk evaluations, which only need its summary) run side by side and
+one chapter's PDF extraction overlaps another chapter's LLM calls. Every LLM call goes through
+`rate_limited()`, which caps how many calls are in flight and how fast they start; that cap, not
+the number of tasks, bounds a run's concurrency.
+
+    results = scheduler.run_dag({
+        "text": (read_pdf, []),
+        "summary": (summarize, ["text"]),        # called as summarize(results["text"])
+        "chunk:1": (judge_chunk_1, ["summary"]),
+    })
+
+    with scheduler.rate_limited():
+        response = client.chat.completions.create(...)
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from . import metrics
+
+# --- Configuration ---
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4")) # Most LLM calls in flight at once, per process
+LLM_RPM = float(os.getenv("LLM_RPM", "60")) # Most LLM calls started per minute, per process (0 = no limit)
+
+_slots = threading.BoundedSemaphore(max(1, LLM_CONCURRENCY))
+_lock = threading.Lock()
+_next_start = 0.0
+
+
+@contextmanager
+def rate_limited():
+    """Holds one of the LLM_CONCURRENCY call slots, starting calls no faster than LLM_RPM per minute."""
+    global _next_start
+    with _slots:
+        if LLM_RPM > 0:
+            with _lock:
+                now = time.monotonic()
+                start = max(now, _next_start)
+                _next_start = start + 60.0 / LLM_RPM
+            if start > now:
+                with metrics.span("rate_limit_wait"):
+                    time.sleep(start - now)
+        yield
+
+
+def run_dag(tasks, max_workers=None):
+    """Runs `tasks` ({name: (function, [dependency names])}); returns {name: result}.
+
+    A task is called with its dependencies' results, in the order listed, once they have all
+    finished. A task that raises is reported and gets None as its result, and its dependents still
+    run, so each stage decides for itself whether it can go on without its input (as the scripts
+    already do when a summary or PDF is missing). Ready tasks start in the order they were given.
+    """
+    dependents = {name: [] for name in tasks}
+    waiting = {}
+    for name, (_, dependencies) in tasks.items():
+        unknown = [d for d in dependencies if d not in tasks]
+        if unknown:
+            raise ValueError(f"task '{name}' depends on unknown task(s): {', '.join(unknown)}")
+        waiting[name] = set(dependencies)
+        for dependency in dependencies:
+            dependents[dependency].append(name)
+
+    results, running = {}, {}
+    # Threads beyond the LLM slots keep PDF extraction and result assembly moving while calls wait.
+    with ThreadPoolExecutor(max_workers=max_workers or LLM_CONCURRENCY + 2) as pool:
+        def submit_ready():
+            for name in [n for n, pending in waiting.items() if not pending]:
+                del waiting[name]
+                function, dependencies = tasks[name]
+                running[pool.submit(function, *(results[d] for d in dependencies))] = name
+
+        submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"Task '{name}' failed: {e}")
+                    metrics.incr("task_errors")
+                    results[name] = None
+                for dependent in dependents[name]:
+                    waiting[dependent].discard(name)
+            submit_ready()
+    if waiting:
+        raise ValueError(f"dependency cycle among tasks: {', '.join(sorted(waiting))}")
+    return results
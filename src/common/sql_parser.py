@@ -0,0 +1,213 @@
+"""Reads the chapter, topics and cards out of a generated SQL file without running it.
+
+`src/generation/main.py` writes one PL/pgSQL `DO $$ ... $$` block per chapter, following the
+sample in its prompt: existence checks (`SELECT id INTO ... WHERE name = '...'`), conditional
+`INSERT INTO topics ... VALUES (...)` and one `INSERT INTO cards ... FROM (VALUES (...), ...)
+as cards_data(front, back, card_type, order_index)` per topic. The model does not always follow
+the sample exactly, so the parser works on tokens rather than on the sample's layout: it only
+relies on string literals being SQL-escaped ('') and on cards following the topic they belong to.
+
+A chapter can also be given as JSON in the same shape `parse_sql` returns.
+"""
+import os
+import re
+import json
+
+TOKEN = re.compile(r"""
+    (?P<comment>--[^\n]*)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<unterminated>')
+  | (?P<number>-?\d+(?:\.\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<symbol>[(),;=])
+  | (?P<other>\S)
+""", re.VERBOSE)
+ENTITY_TABLES = ('subjects', 'book_title', 'chapters', 'topics')
+
+
+class SQLParseError(ValueError):
+    pass
+
+
+def tokenize(sql):
+    """Yields (kind, value) tokens; string values are unescaped, comments dropped."""
+    for match in TOKEN.finditer(sql):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+        if kind == 'unterminated':
+            line = sql.count('\n', 0, match.start()) + 1
+            raise SQLParseError(f"unterminated string literal on line {line}")
+        value = match.group()
+        if kind == 'string':
+            value = value[1:-1].replace("''", "'")
+        elif kind == 'number':
+            value = float(value) if '.' in value else int(value)
+        yield kind, value
+
+
+def _is(token, word):
+    return token[0] == 'word' and token[1].lower() == word
+
+
+def _statements(tokens):
+    statement = []
+    for token in tokens:
+        if token == ('symbol', ';'):
+            if statement:
+                yield statement
+            statement = []
+        else:
+            statement.append(token)
+    if statement:
+        yield statement
+
+
+def _group(tokens, start):
+    """Splits the parenthesised list opening at tokens[start] into its top-level items.
+
+    Returns (items, index after the closing parenthesis); each item is a list of tokens.
+    """
+    items, item, depth = [], [], 0
+    for i in range(start, len(tokens)):
+        token = tokens[i]
+        if token == ('symbol', '('):
+            depth += 1
+            if depth == 1:
+                continue
+        elif token == ('symbol', ')'):
+            depth -= 1
+            if depth == 0:
+                items.append(item)
+                return items, i + 1
+        elif token == ('symbol', ',') and depth == 1:
+            items.append(item)
+            item = []
+            continue
+        item.append(token)
+    raise SQLParseError("unbalanced parentheses")
+
+
+def _literal(item):
+    """The value of a single string or number item; None for expressions like gen_random_uuid()."""
+    return item[0][1] if len(item) == 1 and item[0][0] in ('string', 'number') else None
+
+
+def _names(items):
+    return [item[0][1].lower() for item in items if item and item[0][0] == 'word']
+
+
+def _insert(statement, start):
+    """Parses `INSERT INTO table (cols) VALUES (...), (...)` or `... SELECT ... FROM (VALUES ...) as alias(cols)`.
+
+    Returns (table, [row dicts]).
+    """
+    table = statement[start + 2][1].lower()
+    i = start + 3
+    columns = []
+    if i < len(statement) and statement[i] == ('symbol', '('):
+        column_items, i = _group(statement, i)
+        columns = _names(column_items)
+    while i < len(statement) and not _is(statement[i], 'values'):
+        i += 1
+    tuples = []
+    i += 1
+    while i < len(statement) and statement[i] == ('symbol', '('):
+        items, i = _group(statement, i)
+        tuples.append([_literal(item) for item in items])
+        if i < len(statement) and statement[i] == ('symbol', ','):
+            i += 1
+    # `FROM (VALUES ...) as cards_data(front, back, ...)` names the tuple columns itself.
+    if i + 1 < len(statement) and statement[i] == ('symbol', ')'):
+        j = i + 1
+        if j < len(statement) and _is(statement[j], 'as'):
+            j += 1
+        if j + 1 < len(statement) and statement[j][0] == 'word' and statement[j + 1] == ('symbol', '('):
+            columns = _names(_group(statement, j + 1)[0])
+    return table, [dict(zip(columns, values)) for values in tuples]
+
+
+def _lookup(statement, start):
+    """Parses `SELECT id INTO _x FROM table WHERE col = 'value' AND ...` into (table, {col: value})."""
+    table = statement[start + 1][1].lower()
+    conditions = {}
+    for i in range(start + 2, len(statement) - 2):
+        token, equals, value = statement[i], statement[i + 1], statement[i + 2]
+        if token[0] == 'word' and equals == ('symbol', '=') and value[0] in ('string', 'number'):
+            conditions[token[1].lower().split('.')[-1]] = value[1]
+    return table, conditions
+
+
+def parse_sql(sql):
+    """Returns {class_name, subject_name, book_title, chapter_name, chapter_order, topics}.
+
+    Each topic is {name, order_index, cards}, each card {front, back, card_type, order_index}.
+    Raises SQLParseError when the file is not a parseable chapter script.
+    """
+    chapter = {"class_name": None, "subject_name": None, "book_title": None, "chapter_name": None,
+               "chapter_order": None, "topics": []}
+    topics_by_name = {}
+    current_topic = None
+
+    def topic(name):
+        if name not in topics_by_name:
+            topics_by_name[name] = {"name": name, "order_index": len(chapter["topics"]) + 1, "cards": []}
+            chapter["topics"].append(topics_by_name[name])
+        return topics_by_name[name]
+
+    for statement in _statements(tokenize(sql)):
+        for i, token in enumerate(statement):
+            if _is(token, 'insert') and i + 2 < len(statement) and _is(statement[i + 1], 'into'):
+                table, rows = _insert(statement, i)
+                for row in rows:
+                    if table == 'subjects':
+                        chapter["class_name"] = chapter["class_name"] or row.get("class_name")
+                        chapter["subject_name"] = chapter["subject_name"] or row.get("subject_name")
+                    elif table == 'book_title':
+                        chapter["book_title"] = chapter["book_title"] or row.get("title")
+                    elif table == 'chapters':
+                        chapter["chapter_name"] = row.get("name") or chapter["chapter_name"]
+                        if isinstance(row.get("order_index"), int):
+                            chapter["chapter_order"] = row["order_index"]
+                    elif table == 'topics' and row.get("name"):
+                        current_topic = topic(row["name"])
+                    elif table == 'cards':
+                        if current_topic is None:
+                            current_topic = topic("Uncategorized")
+                        current_topic["cards"].append({
+                            "front": row.get("front"),
+                            "back": row.get("back"),
+                            "card_type": row.get("card_type"),
+                            "order_index": row.get("order_index"),
+                        })
+            elif _is(token, 'from') and i + 1 < len(statement) and statement[i + 1][0] == 'word' \
+                    and statement[i + 1][1].lower() in ENTITY_TABLES:
+                table, conditions = _lookup(statement, i)
+                if table == 'subjects':
+                    chapter["class_name"] = chapter["class_name"] or conditions.get("class_name")
+                    chapter["subject_name"] = chapter["subject_name"] or conditions.get("subject_name")
+                elif table == 'book_title':
+                    chapter["book_title"] = chapter["book_title"] or conditions.get("title")
+                elif table == 'chapters':
+                    chapter["chapter_name"] = chapter["chapter_name"] or conditions.get("name")
+                elif table == 'topics' and conditions.get("name"):
+                    current_topic = topic(conditions["name"])
+
+    if not chapter["topics"] and not chapter["chapter_name"]:
+        raise SQLParseError("no chapter, topic or card statements found")
+    return chapter
+
+
+def load_chapter(path):
+    """Parses a generated .sql file, or loads a .json file already in `parse_sql`'s shape."""
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    if os.path.splitext(path)[1].lower() == '.json':
+        try:
+            chapter = json.loads(content)
+        except ValueError as e:
+            raise SQLParseError(f"invalid JSON: {e}") from e
+        if not isinstance(chapter, dict) or not isinstance(chapter.get("topics"), list):
+            raise SQLParseError("JSON chapter must be an object with a 'topics' list")
+        return chapter
+    return parse_sql(content)
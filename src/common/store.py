@@ -0,0 +1,195 @@
+"""The project's embedded SQLite store, shared by every pipeline script and worker.
+
+One database file (STORE_DB, `store.db` at the repository root) holds:
+
+- `entries`: the content-addressed cache behind `common/cache.py` (extracted PDF text, cleaned
+  text, generated SQL, golden example selections)
+- `llm_responses`: every model response with its run, stage, chapter and a hash of the prompt,
+  so a run's chapter summaries and judge replies can be looked up afterwards
+- `runs`: one row per run with its evaluator, results file and, once finished, its metrics summary
+- the evaluation tables of `evaluation/results_store.py`, which opens the same file
+
+The database runs in WAL mode, so readers never block the writer. Each thread gets its own
+connection and each write is one short `BEGIN IMMEDIATE` transaction that waits up to
+BUSY_TIMEOUT_SECONDS for the write lock, so threads of one run and separate worker processes on
+the same host can all write to it at once. Set STORE_DB="" to disable it: cache lookups then miss,
+and nothing is recorded.
+
+    from common import store
+    with store.transaction(store.thread_connection()) as connection:
+        connection.execute("INSERT INTO ...")
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# --- Configuration ---
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+STORE_DB = os.getenv("STORE_DB", os.path.join(ROOT_DIR, 'store.db'))
+STORE_RESPONSES = os.getenv("STORE_RESPONSES", "1") != "0" # Record every model response in llm_responses
+BUSY_TIMEOUT_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE TABLE IF NOT EXISTS llm_responses (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT,
+    stage TEXT,
+    model TEXT,
+    chapter TEXT,
+    prompt_key TEXT,
+    response TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_responses_run ON llm_responses (run_id, stage, chapter);
+CREATE INDEX IF NOT EXISTS idx_llm_responses_prompt ON llm_responses (prompt_key);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    evaluator TEXT,
+    source_file TEXT,
+    created_at TEXT
+);
+"""
+# Columns added after the first release; older databases get them via ALTER TABLE on connect.
+MIGRATIONS = [
+    ('runs', 'finished_at', 'TEXT'),
+    ('runs', 'summary', 'TEXT'),
+]
+
+_local = threading.local()
+
+
+def migrate(connection, migrations):
+    """Adds any (table, column, type) the database does not have yet."""
+    for table, column, column_type in migrations:
+        existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+def connect(db_path=STORE_DB):
+    """Opens a new connection in WAL and autocommit mode, creating the schema if needed.
+
+    Transactions are begun explicitly with `transaction`. The connection belongs to the calling
+    thread; use `thread_connection()` for the thread's shared one.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    # Switching to WAL does not wait for the busy timeout, so processes opening a new database at once retry.
+    deadline = time.monotonic() + BUSY_TIMEOUT_SECONDS
+    while True:
+        try:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            with transaction(connection):
+                migrate(connection, MIGRATIONS)
+            break
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) or time.monotonic() > deadline:
+                connection.close()
+                raise
+            time.sleep(0.05)
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def thread_connection(db_path=STORE_DB):
+    """This thread's connection to `db_path`, opened on first use (and again in a forked child)."""
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+    if db_path not in connections:
+        connections[db_path] = connect(db_path)
+    return connections[db_path]
+
+
+@contextmanager
+def transaction(connection):
+    """One write transaction; takes the write lock up front so it never fails half-way with SQLITE_BUSY."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        yield connection
+    except BaseException:
+        connection.execute("ROLLBACK")
+        raise
+    connection.execute("COMMIT")
+
+
+# --- Cache entries ---
+
+def get_entry(namespace, key, db_path=STORE_DB):
+    """The JSON value stored under (namespace, key), or None."""
+    if not db_path:
+        return None
+    row = thread_connection(db_path).execute(
+        "SELECT value FROM entries WHERE namespace = ? AND key = ?", (namespace, key)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def put_entry(namespace, key, value, db_path=STORE_DB):
+    """Stores a JSON-serializable value under (namespace, key), replacing any previous one."""
+    if not db_path:
+        return
+    with transaction(thread_connection(db_path)) as c:
+        c.execute("INSERT OR REPLACE INTO entries (namespace, key, value, created_at) VALUES (?, ?, ?, ?)",
+                  (namespace, key, json.dumps(value, ensure_ascii=False), time.time()))
+
+
+# --- Runs and responses ---
+
+def prompt_key(model, prompt):
+    """Hash identifying a prompt sent to a model; the prompt itself (with its chapter text) is not stored."""
+    payload = json.dumps([model, prompt], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def record_response(run_id, stage, model, prompt, response, chapter=None, db_path=STORE_DB):
+    """Records one model response. Errors are reported, never raised: the run goes on without it."""
+    if not db_path or not STORE_RESPONSES:
+        return
+    try:
+        with transaction(thread_connection(db_path)) as c:
+            c.execute("INSERT INTO llm_responses (run_id, stage, model, chapter, prompt_key, response, created_at) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                      (run_id, stage, model, chapter, prompt_key(model, prompt), response, time.time()))
+    except sqlite3.Error as e:
+        print(f"Warning: could not record the {stage} response in {db_path}: {e}")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def record_run(connection, run_id, evaluator, source_file=None):
+    """Registers a run inside the caller's transaction; a run saved again keeps its creation time."""
+    connection.execute(
+        "INSERT INTO runs (run_id, evaluator, source_file, created_at) VALUES (?, ?, ?, ?) "
+        "ON CONFLICT (run_id) DO UPDATE SET evaluator = excluded.evaluator, "
+        "source_file = COALESCE(excluded.source_file, runs.source_file)",
+        (run_id, evaluator, source_file, _now()))
+
+
+def finish_run(run_id, name, summary, db_path=STORE_DB):
+    """Stores a finished run's metrics summary (see common/metrics.py)."""
+    if not db_path:
+        return
+    try:
+        with transaction(thread_connection(db_path)) as c:
+            c.execute("INSERT INTO runs (run_id, evaluator, created_at) VALUES (?, ?, ?) ON CONFLICT (run_id) DO NOTHING",
+                      (run_id, name, _now()))
+            c.execute("UPDATE runs SET finished_at = ?, summary = ? WHERE run_id = ?",
+                      (_now(), json.dumps(summary, ensure_ascii=False, default=str), run_id))
+    except sqlite3.Error as e:
+        print(f"Warning: could not record run {run_id} in {db_path}: {e}")
@@ -0,0 +1,143 @@
+"""Generators for processing a book without holding it in memory.
+
+`iter_rows` reads one Supabase page at a time, filtered to the rows a run actually needs.
+`chunked` groups any iterable into lists of a fixed size as the items arrive,
+`json_array` writes a JSON array one element at a time and `iter_json_array` reads one back.
+Chained together, a run holds one page and one chunk of cards, not the whole `cards` table and
+every result:
+
+    with streaming.json_array(path) as write:
+        for chunk in streaming.chunked(streaming.iter_rows("cards", topic_id=topic_ids), 20):
+            for record in judge(chunk):
+                write(record)
+"""
+import os
+import json
+from contextlib import contextmanager
+
+from . import clients, metrics
+
+# --- Configuration ---
+PAGE_SIZE = int(os.getenv("SUPABASE_PAGE_SIZE", "1000"))
+
+
+def _filtered(query, filters):
+    for column, value in filters.items():
+        query = query.in_(column, list(value)) if isinstance(value, (list, tuple, set)) else query.eq(column, value)
+    return query
+
+
+def iter_rows(table_name, columns="*", page_size=PAGE_SIZE, **filters):
+    """Yields the rows of a Supabase table matching `filters`, fetching one page at a time.
+
+    A list, tuple or set filter value matches any of its items (`in`); any other value must be equal.
+    Pages are ordered by id so rows are neither skipped nor repeated between pages.
+    """
+    if any(isinstance(v, (list, tuple, set)) and not v for v in filters.values()):
+        return
+    start = 0
+    while True:
+        with metrics.span("supabase_page", table=table_name):
+            query = _filtered(clients.supabase().table(table_name).select(columns), filters)
+            page = query.order("id").range(start, start + page_size - 1).execute().data
+        yield from page
+        if len(page) < page_size:
+            return
+        start += page_size
+
+
+def count_rows(table_name, **filters):
+    """Number of rows matching `filters` (same rules as `iter_rows`), without fetching them."""
+    if any(isinstance(v, (list, tuple, set)) and not v for v in filters.values()):
+        return 0
+    with metrics.span("supabase_count", table=table_name):
+        query = _filtered(clients.supabase().table(table_name).select("id", count="exact"), filters)
+        return query.limit(1).execute().count or 0
+
+
+def chunked(items, size):
+    """Yields lists of `size` consecutive items (the last may be shorter) as the items arrive."""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@contextmanager
+def json_array(path, indent=4):
+    """Writes a JSON array element by element; yields the function that appends one element.
+
+    The array goes to a temporary file that replaces `path` only when the block finishes without an
+    error, so an interrupted run never leaves a truncated results file behind. The output matches
+    `json.dump(items, f, indent=indent, ensure_ascii=False)`.
+    """
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("[")
+
+        def write(item):
+            nonlocal count
+            text = json.dumps(item, indent=indent, ensure_ascii=False)
+            if indent is not None:
+                text = text.replace("\n", "\n" + " " * indent)
+                f.write(("," if count else "") + "\n" + " " * indent + text)
+            else:
+                f.write((", " if count else "") + text)
+            count += 1
+
+        try:
+            yield write
+        except BaseException:
+            f.close()
+            os.remove(tmp_path)
+            raise
+        f.write("\n]" if count and indent is not None else "]")
+    os.replace(tmp_path, path)
+
+
+def iter_json_array(path, read_size=1 << 16):
+    """Yields the elements of a JSON array from `path`, reading `read_size` characters at a time.
+
+    An element is only taken once the ',' or ']' after it has been read, so a number or literal split
+    across two reads is never decoded from its first half.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        buffer, at_eof = '', False
+
+        def read_more():
+            nonlocal buffer, at_eof
+            more = f.read(read_size)
+            at_eof = not more
+            buffer += more
+
+        while not buffer.lstrip() and not at_eof:
+            read_more()
+        buffer = buffer.lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"{path} does not hold a JSON array")
+        buffer = buffer[1:]
+        while True:
+            buffer = buffer.lstrip()
+            if buffer.startswith(','):
+                buffer = buffer[1:].lstrip()
+            if buffer.startswith(']'):
+                return
+            end = 0
+            if buffer:
+                try:
+                    item, end = decoder.raw_decode(buffer)
+                except ValueError:
+                    end = 0
+            if end and buffer[end:].lstrip()[:1] in (',', ']'):
+                yield item
+                buffer = buffer[end:]
+            elif at_eof:
+                raise ValueError(f"{path} ends inside its JSON array")
+            else:
+                read_more()
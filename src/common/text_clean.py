@@ -0,0 +1,122 @@
+"""Removes page furniture from extracted chapter text before it goes into a prompt.
+
+pdfplumber returns every page as printed, so each page of an NCERT chapter carries its running
+head ('58 BIOLOGY', 'MORPHOLOGY OF FLOWERING PLANTS 59'), a 'Reprint 2025-26' notice, and words
+split across lines with a hyphen. Every generation and judge prompt paid for that noise again.
+`clean_pages` strips it page by page:
+
+- running heads and feet: lines at the top or bottom of a page that repeat on other pages
+  (with page numbers ignored), and bare page numbers
+- reprint notices and the split 'C 1 / HAPTER' labels of chapter openers
+- figure and table captions, when the line holds only the caption
+- line-break hyphenation, which is rejoined ('photo-\\nsynthesis' becomes 'photosynthesis' when
+  the document spells it that way elsewhere, otherwise the hyphen is kept: 'bell-shaped')
+
+`pdf_text.extract_pdf` applies it to every extraction and caches the result; CLEAN_TEXT=0 turns
+it off. `count_tokens` is the token estimate shared with the planner's reports.
+"""
+import os
+import re
+import math
+from collections import Counter
+from functools import lru_cache
+
+# --- Configuration ---
+ENABLED = os.getenv("CLEAN_TEXT", "1") != "0"
+CLEANER_VERSION = 1 # Bump when cleaning output changes, to invalidate cached results
+EDGE_LINES = 2 # Lines at the top and bottom of each page that may be running heads or feet
+MIN_REPEATS = 3 # Pages an edge line must appear on (2 if it carries a page number) to count as furniture
+CAPTION_MAX_WORDS = 12 # Longer caption lines usually have body text from the next column merged in
+CHARS_PER_TOKEN = 4 # Token estimate when tiktoken is not installed
+TOKENIZER_ENCODING = "o200k_base"
+
+REPRINT_NOTICE = re.compile(r'^re-?print(?:ed)?\s+\d{4}(?:\s*[-–]\s*\d{2,4})?$', re.IGNORECASE)
+PAGE_NUMBER = re.compile(r'^\d{1,4}$')
+OPENER_FRAGMENT = re.compile(r'^(?:[CU] \d+|HAPTER|NIT)$')
+CAPTION = re.compile(r'^(?:Figure|Fig\.|Table)\s*\d+(?:\.\d+)*[a-z]?\s+[A-Za-z(]')
+# Body text merged onto a caption line from the next column: a sentence ending or starting mid-line.
+SENTENCE_BREAK = re.compile(r'[.?!]\s+[A-Z]|[a-z,] (?:The|A|An|In|It|Its|This|These|Each|When|There|They|Some|All)\b')
+LINE_BREAK_HYPHEN = re.compile(r'(\w+)-\n([a-z]\w*)')
+WORD = re.compile(r'[A-Za-z]+')
+
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    return tiktoken.get_encoding(TOKENIZER_ENCODING)
+
+
+def count_tokens(text):
+    """Tokens in `text`: exact with tiktoken installed, CHARS_PER_TOKEN characters per token otherwise."""
+    encoder = _encoder()
+    return len(encoder.encode(text)) if encoder else math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def tokenizer_name():
+    return f"tiktoken ({TOKENIZER_ENCODING})" if _encoder() else f"{CHARS_PER_TOKEN} characters per token"
+
+
+def _edge_key(line):
+    """Compares running heads with their page numbers ignored: '58 BIOLOGY' and '60 BIOLOGY' match."""
+    return re.sub(r'\d+', '#', line).lower()
+
+
+def _edges(lines):
+    return set(range(min(EDGE_LINES, len(lines)))) | set(range(max(0, len(lines) - EDGE_LINES), len(lines)))
+
+
+def _furniture(pages):
+    """Edge-line keys that repeat across pages often enough to be running heads or feet."""
+    counts = Counter()
+    for lines in pages:
+        counts.update({_edge_key(lines[i]) for i in _edges(lines) if WORD.search(lines[i])})
+    return {key for key, n in counts.items() if n >= (2 if '#' in key else MIN_REPEATS)}
+
+
+def _kind(line, index, edges, furniture):
+    """Why a line is page furniture, or None if it is content."""
+    if REPRINT_NOTICE.match(line):
+        return "reprint_notices"
+    if index in edges and (PAGE_NUMBER.match(line) or _edge_key(line) in furniture):
+        return "running_heads"
+    if OPENER_FRAGMENT.match(line):
+        return "opener_labels"
+    if CAPTION.match(line) and len(line.split()) <= CAPTION_MAX_WORDS and not SENTENCE_BREAK.search(line):
+        return "captions"
+    return None
+
+
+def clean_pages(page_texts):
+    """Cleans a chapter's page texts; returns (text, {kind: lines or words changed}).
+
+    The text is the cleaned pages joined by newlines, like the raw extraction.
+    """
+    pages = [[re.sub(r'[ \t]+', ' ', line).strip() for line in text.splitlines()] for text in page_texts]
+    pages = [[line for line in lines if line] for lines in pages]
+    furniture = _furniture(pages)
+    removed = Counter()
+    kept_pages = []
+    for lines in pages:
+        edges = _edges(lines)
+        kept = []
+        for index, line in enumerate(lines):
+            kind = _kind(line, index, edges, furniture)
+            if kind:
+                removed[kind] += 1
+            else:
+                kept.append(line)
+        kept_pages.append("\n".join(kept))
+    text = "\n".join(page for page in kept_pages if page)
+
+    # A word split at a line end is rejoined without its hyphen only if the document also spells it whole.
+    vocabulary = {w.lower() for w in WORD.findall(LINE_BREAK_HYPHEN.sub(' ', text))}
+
+    def rejoin(match):
+        removed["hyphenations"] += 1
+        whole = match.group(1) + match.group(2)
+        return whole if whole.lower() in vocabulary else f"{match.group(1)}-{match.group(2)}"
+
+    return LINE_BREAK_HYPHEN.sub(rejoin, text), dict(removed)
@@ -0,0 +1,216 @@
+"""Score analytics across evaluation runs: distributions, weighted means, duplicate rates and drift.
+
+Every judged card of every run becomes one row of a pandas DataFrame, loaded from evaluation JSON
+files (accuracy or chapter format, one run per file) or from the whole results store in one query.
+The per-card quantities every statistic needs (score indicators, confidence-weighted scores,
+repeat flags) are computed once as columns, so each subject/chapter/topic table is a single
+groupby-sum, and drift between runs is a pivot of those tables on the run. A history of a
+million judged cards summarizes in well under a second.
+
+    python analytics.py                                    # every run in the results store
+    python analytics.py ../../accuracy_evaluations.json ../../ARTSaccuracy_evaluations.json --by topic
+    python analytics.py --score correctness --by chapter --json ../../analytics.json
+"""
+import os
+import re
+import json
+import time
+import argparse
+from contextlib import closing
+
+import numpy as np
+import pandas as pd
+
+import results_store
+
+# --- Configuration ---
+DRIFT_THRESHOLD = 0.25 # Change in a group's mean score since the previous run that counts as drift
+DRIFT_MIN_CARDS = 5 # Groups with fewer scored cards in either run are never flagged
+DRIFT_Z = 3.0 # ...and the change must also exceed this many standard errors, so small topics' noise is not drift
+LOW_SCORE = 2 # Scores at or below this count towards the low-score rate
+SCORE_VALUES = {'accuracy': [1, 2, 3, 4], 'correctness': [1, 2, 3, 4, 5], 'relevance': [1, 2, 3, 4, 5]}
+LEVELS = {'run': [], 'subject': ['subject'], 'chapter': ['subject', 'chapter'], 'topic': ['subject', 'chapter', 'topic']}
+SOURCE_SUBJECT = re.compile(r'^(.+?)_?(?:accuracy|chapter)_evaluations', re.IGNORECASE)
+COLUMNS = [*results_store.CARD_COLUMNS, 'run_order', 'subject']
+# Only what the statistics need; card text and rationales are never read from the store.
+STORE_COLUMNS = ('run_id', 'card_id', 'chapter', 'topic', *results_store.SCORE_COLUMNS.values(), 'is_repeated')
+KEY_COLUMNS = ('run_id', 'card_id', 'subject', 'chapter', 'topic')
+
+
+def subject_of(source_file):
+    """The subject a file name carries as a prefix, e.g. 'ARTS' for ARTSaccuracy_evaluations.json."""
+    match = SOURCE_SUBJECT.match(os.path.basename(source_file or ''))
+    return match.group(1) if match else "All Subjects"
+
+
+def _with_keys(frame):
+    """Fills missing group names and stores the keys as categoricals, which group and pivot far faster."""
+    defaults = {'subject': "All Subjects", 'chapter': "All Chapters", 'topic': "Uncategorized"}
+    for column in KEY_COLUMNS:
+        frame[column] = frame[column].fillna(defaults.get(column, "")).astype('category')
+    return frame
+
+
+def load_files(paths):
+    """One run per evaluation JSON file, in the order given."""
+    rows = []
+    for order, path in enumerate(paths):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        run_id, subject = os.path.splitext(os.path.basename(path))[0], subject_of(path)
+        if data and isinstance(data[0], dict) and "card_evaluations" in data[0]:
+            card_rows = results_store.chapter_card_rows(run_id, data)
+        else:
+            card_rows = results_store.accuracy_rows(run_id, data)
+        rows.extend((*row, order, subject) for row in card_rows)
+    return _with_keys(pd.DataFrame.from_records(rows, columns=COLUMNS))
+
+
+def load_store(db_path=results_store.RESULTS_DB):
+    """Every run in the results store, oldest first."""
+    with closing(results_store.connect(db_path)) as connection:
+        runs = connection.execute("SELECT run_id, source_file FROM runs ORDER BY created_at, rowid").fetchall()
+        frame = pd.read_sql_query(f"SELECT {', '.join(STORE_COLUMNS)} FROM card_evaluations", connection)
+    frame['run_order'] = frame['run_id'].map({run_id: order for order, (run_id, _) in enumerate(runs)})
+    frame['subject'] = frame['run_id'].map({run_id: subject_of(source) for run_id, source in runs})
+    return _with_keys(frame)
+
+
+def card_columns(frame, score='accuracy'):
+    """The per-card quantities every group statistic is a sum of, plus the grouping keys."""
+    values = pd.to_numeric(frame[results_store.SCORE_COLUMNS[score]], errors='coerce')
+    scored = values.notna()
+    confidence = pd.to_numeric(frame['confidence_score'], errors='coerce').where(scored)
+    columns = pd.DataFrame({
+        'run_order': frame['run_order'],
+        'run_id': frame['run_id'],
+        'subject': frame['subject'],
+        'chapter': frame['chapter'],
+        'topic': frame['topic'],
+        'cards': 1,
+        'scored': scored.astype(int),
+        'score_sum': values.fillna(0),
+        'square_sum': (values ** 2).fillna(0),
+        'low': (values <= LOW_SCORE).astype(int),
+        'confidence_sum': confidence.fillna(0),
+        'weight': confidence.fillna(0),
+        'weighted_sum': (values * confidence).fillna(0),
+        'repeated': pd.to_numeric(frame['is_repeated'], errors='coerce').fillna(0).astype(int),
+    })
+    for value in SCORE_VALUES[score]:
+        columns[f'score_{value}'] = (values == value).astype(int)
+    return columns
+
+
+def summarize(columns, by='chapter'):
+    """Per run and group: card counts, score histogram, mean, confidence-weighted mean, low and duplicate rates."""
+    totals = columns.groupby(['run_order', 'run_id', *LEVELS[by]], sort=True, observed=True).sum(numeric_only=True)
+    scored = totals['scored'].replace(0, np.nan)
+    summary = totals.drop(columns=['score_sum', 'square_sum', 'confidence_sum', 'weight', 'weighted_sum', 'low'])
+    mean = totals['score_sum'] / scored
+    summary['mean'] = mean.round(3)
+    summary['std'] = np.sqrt((totals['square_sum'] / scored - mean ** 2).clip(lower=0)).round(3)
+    summary['weighted_mean'] = (totals['weighted_sum'] / totals['weight'].replace(0, np.nan)).round(3)
+    summary['mean_confidence'] = (totals['confidence_sum'] / scored).round(1)
+    summary['low_rate'] = (totals['low'] / scored).round(3)
+    summary['duplicate_rate'] = (totals['repeated'] / totals['cards']).round(3)
+    return summary.reset_index()
+
+
+def _previous(table):
+    """For each run column, the value from the latest earlier run in which the group appeared."""
+    return table.ffill(axis=1).shift(1, axis=1)
+
+
+def group_drift(summary, by='chapter', threshold=DRIFT_THRESHOLD, min_cards=DRIFT_MIN_CARDS, z=DRIFT_Z):
+    """Change of each group's mean score since the previous run it appeared in, with its standard error."""
+    table = summary.pivot_table(index=LEVELS[by], columns='run_order', values=['mean', 'std', 'scored'],
+                                aggfunc='first', observed=True)
+    current = {name: table[name].stack() for name in ('mean', 'std', 'scored')}
+    previous = {name: _previous(table[name]).stack() for name in ('mean', 'std', 'scored')}
+    drift = pd.DataFrame({
+        'previous_mean': previous['mean'],
+        'mean': current['mean'],
+        'previous_scored': previous['scored'],
+        'scored': current['scored'],
+    }).dropna(subset=['previous_mean', 'mean'])
+    drift['delta'] = (drift['mean'] - drift['previous_mean']).round(3)
+    standard_error = np.sqrt(previous['std'] ** 2 / previous['scored'] + current['std'] ** 2 / current['scored'])
+    drift['standard_error'] = standard_error.reindex(drift.index).round(3)
+    drift['drifted'] = ((drift['delta'].abs() >= threshold) & (drift['delta'].abs() >= z * drift['standard_error'])
+                        & (drift[['previous_scored', 'scored']].min(axis=1) >= min_cards))
+    drift = drift.reset_index()
+    drift.insert(len(LEVELS[by]) + 1, 'run_id', drift['run_order'].map(dict(zip(summary['run_order'], summary['run_id']))))
+    return drift
+
+
+def card_churn(frame, score='accuracy'):
+    """Per run: cards also scored in an earlier run, how many changed score and the mean change."""
+    values = pd.to_numeric(frame[results_store.SCORE_COLUMNS[score]], errors='coerce').to_numpy(dtype=float)
+    # A cards x runs matrix of scores, filled straight from the category codes.
+    scores = np.full((len(frame['card_id'].cat.categories), frame['run_order'].max() + 1), np.nan)
+    scores[frame['card_id'].cat.codes.to_numpy(), frame['run_order'].to_numpy()] = values
+    scores = pd.DataFrame(scores)
+    delta = scores - _previous(scores)
+    compared = delta.notna()
+    return pd.DataFrame({
+        'cards_compared': compared.sum(),
+        'cards_changed': (compared & (delta != 0)).sum(),
+        'mean_card_delta': delta.mean().round(3),
+    }).rename_axis('run_order').reset_index()
+
+
+def analyze(frame, score='accuracy', by='chapter', threshold=DRIFT_THRESHOLD):
+    """Run overview, per-group summary and drift for one score, computed from a single set of card columns."""
+    columns = card_columns(frame, score)
+    runs = summarize(columns, 'run').merge(card_churn(frame, score), on='run_order', how='left')
+    groups = summarize(columns, by)
+    return {"runs": runs, "groups": groups, "drift": group_drift(groups, by, threshold)}
+
+
+def _records(table):
+    return json.loads(table.to_json(orient='records'))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Score distributions, weighted means, duplicate rates and drift across evaluation runs.")
+    parser.add_argument('files', nargs='*', help="Evaluation JSON files, one run each, oldest first (default: every run in the results store).")
+    parser.add_argument('--db', default=results_store.RESULTS_DB or os.path.join(results_store.store.ROOT_DIR, 'store.db'))
+    parser.add_argument('--score', choices=sorted(SCORE_VALUES), default='accuracy')
+    parser.add_argument('--by', choices=[level for level in LEVELS if level != 'run'], default='chapter')
+    parser.add_argument('--threshold', type=float, default=DRIFT_THRESHOLD, help="Mean-score change that counts as drift.")
+    parser.add_argument('--json', dest='json_path', help="Also write every table to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    started = time.perf_counter()
+    frame = load_files(args.files) if args.files else load_store(args.db)
+    loaded = time.perf_counter()
+    if frame.empty:
+        print("No evaluations to analyze.")
+        return
+    result = analyze(frame, args.score, args.by, args.threshold)
+    computed = time.perf_counter()
+
+    latest = result["groups"]["run_order"].max()
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_columns', None)
+    print(f"--- Runs ({args.score}) ---")
+    print(result["runs"].drop(columns='run_order').to_string(index=False))
+    print(f"\n--- {args.score.capitalize()} by {args.by}, latest run ---")
+    print(result["groups"][result["groups"]["run_order"] == latest].drop(columns='run_order').to_string(index=False))
+    drifted = result["drift"][result["drift"]["drifted"]]
+    print(f"\n--- Groups whose mean {args.score} moved by {args.threshold} or more since their previous run ---")
+    print(drifted.drop(columns=['run_order', 'drifted']).to_string(index=False) if not drifted.empty else "None.")
+    print(f"\n{len(frame)} card evaluations from {frame['run_id'].nunique()} run(s): "
+          f"loaded in {loaded - started:.2f}s, analyzed in {computed - loaded:.2f}s.")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({name: _records(table) for name, table in result.items()}, f, indent=4, ensure_ascii=False)
+        print(f"Tables saved to {args.json_path}")
+
+if __name__ == "__main__":
+    main()
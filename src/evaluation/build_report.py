@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import streaming
+
+# --- Configuration ---
+EVALUATIONS_FILE = os.getenv("EVALUATIONS_FILE", '../../accuracy_evaluations.json')
+REPORT_DIR = os.getenv("REPORT_DIR", '../../report')
+SHARD_SIZE = 500 # Cards per shard file loaded lazily by evaluation_report.html
+SCORES = [1, 2, 3, 4]
+
+
+def _new_stats():
+    return {"count": 0, "histogram": {str(s): 0 for s in SCORES}, "accuracy_sum": 0, "confidence_sum": 0,
+            "scored": 0, "repeated": 0}
+
+
+def _add(stats, card):
+    stats["count"] += 1
+    accuracy = card.get("accuracy_score")
+    if isinstance(accuracy, int) and accuracy in SCORES:
+        stats["histogram"][str(accuracy)] += 1
+        stats["accuracy_sum"] += accuracy
+        stats["confidence_sum"] += card.get("confidence_score") or 0
+        stats["scored"] += 1
+    if card.get("is_repeated"):
+        stats["repeated"] += 1
+
+
+def _finish(stats):
+    scored = stats.pop("scored")
+    stats["mean_accuracy"] = round(stats.pop("accuracy_sum") / scored, 3) if scored else None
+    stats["mean_confidence"] = round(stats.pop("confidence_sum") / scored, 1) if scored else None
+    return stats
+
+
+@contextmanager
+def report_writer(source, report_dir=REPORT_DIR, shard_size=SHARD_SIZE):
+    """Builds the report card by card; yields the function that adds one accuracy record.
+
+    Cards are grouped by chapter and topic in the order they arrive. A topic's cards are written out
+    as soon as they fill a shard, and the rest when the next chapter starts, so memory holds at most
+    one chapter's unfinished shards. The report is assembled in '<report_dir>.tmp' and replaces the
+    previous one only when the block finishes without an error, so the page keeps showing a complete
+    report while a run is in progress, and an interrupted run leaves the old one in place.
+    """
+    staging_dir = f"{os.path.normpath(report_dir)}.tmp"
+    if os.path.isdir(staging_dir):
+        shutil.rmtree(staging_dir)
+    os.makedirs(os.path.join(staging_dir, 'shards'))
+    overall = _new_stats()
+    chapters = {}
+    current = {"chapter": None}
+
+    def flush(c, t, topic):
+        shard_file = f"shards/c{c:03d}-t{t:03d}-{len(topic['shards']):04d}.json"
+        with open(os.path.join(staging_dir, shard_file), 'w', encoding='utf-8') as f:
+            json.dump(topic["pending"], f, ensure_ascii=False, separators=(',', ':'))
+        topic["shards"].append({"file": shard_file, "start": topic["written"], "count": len(topic["pending"])})
+        topic["written"] += len(topic["pending"])
+        topic["pending"] = []
+
+    def flush_chapter(chapter):
+        for t, topic in enumerate(chapter["topics"].values()):
+            if topic["pending"]:
+                flush(chapter["index"], t, topic)
+
+    def add(card):
+        chapter_name = card.get("chapter_name") or "All Chapters"
+        topic_name = card.get("topic_name") or "Uncategorized"
+        if current["chapter"] not in (None, chapter_name):
+            flush_chapter(chapters[current["chapter"]])
+        current["chapter"] = chapter_name
+        chapter = chapters.setdefault(chapter_name, {"index": len(chapters), "stats": _new_stats(), "topics": {}})
+        topic = chapter["topics"].setdefault(topic_name, {"stats": _new_stats(), "shards": [], "pending": [], "written": 0})
+        topic["pending"].append(card)
+        for stats in (topic["stats"], chapter["stats"], overall):
+            _add(stats, card)
+        if len(topic["pending"]) == shard_size:
+            flush(chapter["index"], list(chapter["topics"]).index(topic_name), topic)
+
+    try:
+        yield add
+        for chapter in chapters.values():
+            flush_chapter(chapter)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+    index = {
+        "source": os.path.basename(source),
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        "shard_size": shard_size,
+        "summary": _finish(overall),
+        "chapters": [{"name": chapter_name, **_finish(chapter["stats"]),
+                      "topics": [{"name": topic_name, **_finish(topic["stats"]), "shards": topic["shards"]}
+                                 for topic_name, topic in chapter["topics"].items()]}
+                     for chapter_name, chapter in chapters.items()],
+    }
+    with open(os.path.join(staging_dir, 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    os.makedirs(report_dir, exist_ok=True)
+    if os.path.isdir(os.path.join(report_dir, 'shards')):
+        shutil.rmtree(os.path.join(report_dir, 'shards'))
+    os.replace(os.path.join(staging_dir, 'shards'), os.path.join(report_dir, 'shards'))
+    os.replace(os.path.join(staging_dir, 'index.json'), os.path.join(report_dir, 'index.json'))
+    os.rmdir(staging_dir)
+
+
+def build_report(evaluations_file=EVALUATIONS_FILE, report_dir=REPORT_DIR, shard_size=SHARD_SIZE):
+    """Splits an accuracy evaluation file into per-topic card shards plus a pre-aggregated index.json.
+
+    The file is read one record at a time, so a streamed run's results are never loaded whole.
+    """
+    with report_writer(evaluations_file, report_dir, shard_size) as add:
+        for card in streaming.iter_json_array(evaluations_file):
+            add(card)
+    with open(os.path.join(report_dir, 'index.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    """Builds the sharded report consumed by evaluation_report.html."""
+    parser = argparse.ArgumentParser(description="Build a sharded, pre-aggregated report from an accuracy evaluation file.")
+    parser.add_argument('evaluations_file', nargs='?', default=EVALUATIONS_FILE)
+    parser.add_argument('--output', default=REPORT_DIR, help="Report directory (index.json + shards/).")
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE)
+    args = parser.parse_args()
+
+    index = build_report(args.evaluations_file, args.output, args.shard_size)
+    num_shards = sum(len(t["shards"]) for c in index["chapters"] for t in c["topics"])
+    print(f"Report for {index['summary']['count']} cards written to {args.output} "
+          f"({len(index['chapters'])} chapters, {num_shards} shards).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""Chapter-level evaluation shared by grok_eval.py and run_evaluation.py, run as a task graph.
+
+Per chapter: PDF text -> summary -> {exhaustiveness, card counts of the chapter's topics, one call
+per card chunk} -> combined result. Everything after the summary depends only on the summary, so
+those calls run concurrently, and all chapters go into one graph so one chapter's extraction
+overlaps another's judge calls. How many calls are in flight, and how fast they start, is set by
+the rate limiter in common/scheduler.py (LLM_CONCURRENCY, LLM_RPM).
+
+Card counts are judged for all of a chapter's topics in one call, which sends the summary once
+instead of once per topic; a chapter whose topics' questions exceed TOPIC_BATCH_TOKENS is split
+into several such calls. TOPIC_BATCH=0 goes back to one call per topic.
+"""
+import os
+import sys
+import json
+import math
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import metrics, scheduler, text_clean
+import progress
+
+# --- Configuration ---
+TOPIC_BATCH = os.getenv("TOPIC_BATCH", "1") != "0"
+TOPIC_BATCH_TOKENS = int(os.getenv("TOPIC_BATCH_TOKENS", "6000")) # Question tokens per batched card-count call
+
+# Output instructions shared by the batched card-count prompts of grok_eval.py and run_evaluation.py.
+TOPIC_COUNTS_FORMAT = """**Required Output (Strict JSON):** One object per topic, where i is the topic's "i".
+    ```json
+    [{ "i": <integer>, "score": <integer>, "notes": "<string>" }]
+    ```"""
+
+
+def numbered_topics(topics):
+    """Prompt topics as {"i", "topic", "questions"}, numbered from 1 in batch order."""
+    return [{"i": i, "topic": topic["topic_name"], "questions": [q["question"] for q in topic["questions"]]}
+            for i, topic in enumerate(topics, start=1)]
+
+
+def expand_topic_counts(response, topic_names):
+    """[{i, score, notes}, ...] -> one {score, notes} evaluation per topic, None for a topic the response skipped."""
+    evaluations = [None] * len(topic_names)
+    for row in response if isinstance(response, list) else []:
+        if not isinstance(row, dict):
+            continue
+        try:
+            index = int(row.get("i"))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= index <= len(topic_names):
+            evaluations[index - 1] = {"score": row.get("score"), "notes": row.get("notes", "")}
+    return evaluations
+
+
+def topic_batches(topics, budget=TOPIC_BATCH_TOKENS):
+    """Splits [{topic_name, questions}] into consecutive batches whose questions fit `budget` tokens.
+
+    A topic larger than the budget on its own still gets a batch of its own.
+    """
+    batches, batch, used = [], [], 0
+    for topic in topics:
+        tokens = text_clean.count_tokens(json.dumps([q["question"] for q in topic["questions"]]))
+        if batch and used + tokens > budget:
+            batches.append(batch)
+            batch, used = [], 0
+        batch.append(topic)
+        used += tokens
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _chapter_tasks(number, chapter, pdf_path, topic_map, chapter_cards, stages, chunk_size):
+    """The tasks for one chapter, keyed by '<chapter id>:<stage>'."""
+    chapter_name = chapter['name']
+    prefix = f"{chapter['id']}:"
+
+    def text():
+        with metrics.labels(chapter=chapter_name):
+            return stages["get_pdf_text"](pdf_path)
+
+    def summary(pdf_text):
+        if not pdf_text:
+            return None
+        with metrics.labels(chapter=chapter_name):
+            chapter_summary = stages["get_summary"](pdf_text, chapter_name)
+        if chapter_summary:
+            progress.chapter_started(chapter_name, number, len(chapter_cards))
+        return chapter_summary
+
+    def exhaustiveness(chapter_summary):
+        if not chapter_summary:
+            return None
+        all_card_questions = [{"id": c['id'], "question": c['front']} for c in chapter_cards]
+        with metrics.labels(chapter=chapter_name):
+            return stages["evaluate_exhaustiveness"](chapter_name, chapter_summary, all_card_questions)
+
+    def card_count(topic):
+        def run(chapter_summary):
+            if not chapter_summary:
+                return None
+            print(f"Evaluating card count for topic: '{topic['topic_name']}'...")
+            with metrics.labels(chapter=chapter_name):
+                return [{"topic_name": topic["topic_name"],
+                         "evaluation": stages["evaluate_card_count"](topic["topic_name"], chapter_summary, topic["questions"])}]
+        return run
+
+    def card_counts(j, num_batches, batch):
+        def run(chapter_summary):
+            if not chapter_summary:
+                return None
+            print(f"Evaluating card counts of {len(batch)} topic(s), batch {j + 1}/{num_batches} of '{chapter_name}'...")
+            with metrics.labels(chapter=chapter_name):
+                batch_evals = stages["evaluate_topic_card_counts"](chapter_summary, batch)
+            return [{"topic_name": topic["topic_name"], "evaluation": evaluation}
+                    for topic, evaluation in zip(batch, batch_evals or [None] * len(batch))]
+        return run
+
+    def card_chunk(j, num_chunks, chunk):
+        def run(chapter_summary):
+            if not chapter_summary:
+                return None
+            print(f"Evaluating card chunk {j + 1}/{num_chunks} of '{chapter_name}'...")
+            with metrics.labels(chapter=chapter_name, chunk=j + 1):
+                chunk_eval = stages["evaluate_card_chunk"](chapter_summary, chunk)
+            if chunk_eval:
+                metrics.incr("cards_evaluated", len(chunk_eval), chapter=chapter_name)
+                progress.cards_evaluated(chapter_name, len(chunk_eval))
+            return chunk_eval
+        return run
+
+    def combine(chapter_summary, exhaustiveness_eval, *evaluations):
+        if not chapter_summary:
+            print(f"Skipped chapter '{chapter_name}' (no PDF text or summary).")
+            return None
+        topic_evaluations = [e for batch_evals in evaluations[:len(topic_names)] if batch_evals for e in batch_evals]
+        all_card_evals = [e for chunk_eval in evaluations[len(topic_names):] if chunk_eval for e in chunk_eval]
+        entry = _chapter_entry(chapter_name, topic_map, chapter_cards, exhaustiveness_eval, topic_evaluations, all_card_evals)
+        if "save_chapter" in stages:
+            with metrics.span("results_db_write"):
+                stages["save_chapter"](entry)
+        progress.chapter_finished(chapter_name, {
+            "exhaustiveness": (exhaustiveness_eval or {}).get("score"),
+            "card_count": progress.mean_score((t["evaluation"] or {}).get("score") for t in topic_evaluations),
+            "correctness": progress.mean_score((c["correctness"] or {}).get("score") for c in entry["card_evaluations"]),
+            "relevance": progress.mean_score((c["relevance"] or {}).get("score") for c in entry["card_evaluations"]),
+        })
+        print(f"Successfully evaluated chapter '{chapter_name}'.")
+        return entry
+
+    if not chapter_cards:
+        print(f"Skipped chapter '{chapter_name}' (no cards).")
+        return {}
+    tasks = {
+        prefix + "text": (text, []),
+        prefix + "summary": (summary, [prefix + "text"]),
+    }
+    tasks[prefix + "exhaustiveness"] = (exhaustiveness, [prefix + "summary"])
+    chapter_topics = []
+    for topic_id, topic_name in topic_map.items():
+        topic_cards = [c for c in chapter_cards if c.get('topic_id') == topic_id]
+        if topic_cards:
+            chapter_topics.append({"topic_id": topic_id, "topic_name": topic_name,
+                                   "questions": [{"id": c['id'], "question": c['front']} for c in topic_cards]})
+    topic_names = []
+    if TOPIC_BATCH and "evaluate_topic_card_counts" in stages:
+        batches = topic_batches(chapter_topics)
+        for j, batch in enumerate(batches):
+            topic_names.append(f"{prefix}topics:{j}")
+            tasks[topic_names[-1]] = (card_counts(j, len(batches), batch), [prefix + "summary"])
+    else:
+        for topic in chapter_topics:
+            topic_names.append(f"{prefix}topic:{topic['topic_id']}")
+            tasks[topic_names[-1]] = (card_count(topic), [prefix + "summary"])
+    num_chunks = math.ceil(len(chapter_cards) / chunk_size)
+    chunk_names = []
+    for j in range(num_chunks):
+        chunk = chapter_cards[j * chunk_size:(j + 1) * chunk_size]
+        chunk_names.append(f"{prefix}chunk:{j}")
+        tasks[chunk_names[-1]] = (card_chunk(j, num_chunks, chunk), [prefix + "summary"])
+    tasks[prefix + "result"] = (combine, [prefix + "summary", prefix + "exhaustiveness", *topic_names, *chunk_names])
+    return tasks
+
+
+def _chapter_entry(chapter_name, topic_map, chapter_cards, exhaustiveness_eval, topic_evaluations, all_card_evals):
+    """One chapter's entry of the evaluations file."""
+    card_content_map = {c['id']: {"front": c['front'], "back": c['back']} for c in chapter_cards}
+    card_topic_map = {c['id']: topic_map.get(c.get('topic_id')) for c in chapter_cards}
+    final_card_results = []
+    for eval_item in all_card_evals:
+        card_id = eval_item["card_id"]
+        final_card_results.append({
+            "card_id": card_id,
+            "topic_name": card_topic_map.get(card_id),
+            "content": card_content_map.get(card_id, {}),
+            "correctness": eval_item.get("correctness"),
+            "relevance": eval_item.get("relevance")
+        })
+    return {
+        "chapter_name": chapter_name,
+        "exhaustiveness": exhaustiveness_eval,
+        "optimal_card_count_per_topic": topic_evaluations,
+        "card_evaluations": final_card_results
+    }
+
+
+def evaluate_chapters(selected_chapters, chapter_pdfs, topics, cards, stages, chunk_size):
+    """Evaluates the chapters concurrently; returns their results in chapter order.
+
+    `stages` holds the script's model-specific functions: get_pdf_text(path),
+    get_summary(pdf_text, chapter_name), evaluate_exhaustiveness(chapter_name, summary, questions),
+    evaluate_card_count(topic_name, summary, questions), evaluate_card_chunk(summary, cards) and,
+    optionally, evaluate_topic_card_counts(summary, topics), which judges a batch of
+    [{topic_name, questions}] in one call and returns one evaluation (or None) per topic, and
+    save_chapter(entry), called with each chapter's result as soon as it is complete.
+    A chapter whose PDF, summary or cards are missing is skipped, as before.
+    """
+    tasks = {}
+    for number, chapter in enumerate(selected_chapters, start=1):
+        chapter_topics = [t for t in topics if t.get('chapter_id') == chapter['id']]
+        topic_map = {t['id']: t['name'] for t in chapter_topics}
+        chapter_cards = [c for c in cards if c.get('topic_id') in topic_map]
+        tasks.update(_chapter_tasks(number, chapter, chapter_pdfs[chapter['id']], topic_map, chapter_cards,
+                                    stages, chunk_size))
+
+    print(f"Evaluating {len(selected_chapters)} chapter(s) as {len(tasks)} tasks "
+          f"(up to {scheduler.LLM_CONCURRENCY} concurrent LLM calls, {scheduler.LLM_RPM:g}/min)...")
+    results = scheduler.run_dag(tasks)
+    return [results[f"{c['id']}:result"] for c in selected_chapters if results.get(f"{c['id']}:result")]
@@ -0,0 +1,108 @@
+"""Compact judge responses: positional rows instead of one verbose object per card.
+
+Completion tokens dominate a judge call's latency, and the verbose schema spends most of them
+repeating each card's UUID, the field names and a rationale for every card. In compact mode the
+prompt numbers the cards 1..n and the judge answers with one short row per card, adding a
+rationale only when a score is low:
+
+    accuracy:                [[1, 4, 95], [2, 2, 70, "The text says ..."]]
+    correctness/relevance:   [[1, 5, 4], [2, 2, 3, "The answer omits ..."]]
+
+The expanders rebuild the verbose objects the rest of the pipeline reads (a high-scoring card gets
+an empty rationale), and `max_tokens` is sized from the number of cards in the chunk. Reasoning
+models get no cap, since their reasoning counts against it, and a reply cut off at the cap is
+requested again without one (`with_budget`). Set JUDGE_COMPACT=0 to go back to the verbose schema.
+"""
+import os
+
+# --- Configuration ---
+COMPACT = os.getenv("JUDGE_COMPACT", "1") != "0"
+LOW_SCORE = 2 # Rationales are only requested for scores at or below this
+# Completion budget per call: a fixed allowance plus room for each card's row and a possible rationale.
+MAX_TOKENS_BASE = int(os.getenv("JUDGE_MAX_TOKENS_BASE", "512"))
+MAX_TOKENS_PER_CARD = int(os.getenv("JUDGE_MAX_TOKENS_PER_CARD", "40"))
+# Models whose reasoning tokens count against max_tokens; they are never sent a cap.
+REASONING_MODELS = [m for m in os.getenv("JUDGE_REASONING_MODELS", "grok-4,grok-3-mini").split(",") if m]
+
+# Output instructions shared by the correctness/relevance prompts of grok_eval.py and run_evaluation.py.
+CORRECTNESS_FORMAT = """**Required Output (Strict JSON):** One row per card: [i, correctness, relevance], where i is the card's "i".
+    Only when a score is 1 or 2, add a fourth element: a one-sentence note explaining it.
+    Example: [[1,5,4],[2,2,3,"Green is a secondary colour, not a primary one."]]"""
+
+
+def max_tokens(num_cards, model=None):
+    """The completion cap for a chunk, or None when the call should not be capped."""
+    if not COMPACT or model in REASONING_MODELS:
+        return None
+    return MAX_TOKENS_BASE + num_cards * MAX_TOKENS_PER_CARD
+
+
+def truncated(finish_reason):
+    """Whether a reply stopped at its cap ("length" from OpenAI-style APIs, MAX_TOKENS from Gemini)."""
+    return getattr(finish_reason, 'name', finish_reason) in ("length", "MAX_TOKENS")
+
+
+def with_budget(call, num_cards, model=None):
+    """Runs `call(max_tokens) -> (text, finish_reason)` with the chunk's cap and returns the text.
+
+    A reply cut off at the cap would be unparseable JSON and lose the whole chunk, so it is
+    requested again without a cap.
+    """
+    cap = max_tokens(num_cards, model)
+    text, finish_reason = call(cap)
+    if cap and truncated(finish_reason):
+        print(f"    Response was cut off at {cap} tokens; retrying without a cap.")
+        text, _ = call(None)
+    return text
+
+
+def numbered_cards(cards, question, answer):
+    """Prompt cards as {"i", "q", "a"}, numbered from 1 in chunk order."""
+    return [{"i": i, "q": card[question], "a": card[answer]} for i, card in enumerate(cards, start=1)]
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _rows(response, card_ids):
+    """Yields (card_id, row) for each well-formed row; rows with an unknown index are dropped."""
+    if not isinstance(response, list):
+        return
+    for row in response:
+        if not isinstance(row, list) or len(row) < 3:
+            continue
+        index = _int(row[0])
+        if index is None or not 1 <= index <= len(card_ids):
+            continue
+        yield card_ids[index - 1], row
+
+
+def _note(row):
+    return str(row[3]) if len(row) > 3 and row[3] is not None else ""
+
+
+def expand_accuracy(response, card_ids):
+    """[[i, accuracy, confidence, rationale?], ...] -> [{card_id, accuracy_score, confidence_score, rationale}]."""
+    return [{"card_id": card_id, "accuracy_score": _int(row[1]), "confidence_score": _int(row[2]), "rationale": _note(row)}
+            for card_id, row in _rows(response, card_ids)]
+
+
+def expand_correctness(response, card_ids):
+    """[[i, correctness, relevance, notes?], ...] -> [{card_id, correctness: {score, notes}, relevance: {score, notes}}].
+
+    The single note goes to whichever of the two scores is low.
+    """
+    evaluations = []
+    for card_id, row in _rows(response, card_ids):
+        correctness, relevance, note = _int(row[1]), _int(row[2]), _note(row)
+        evaluations.append({
+            "card_id": card_id,
+            "correctness": {"score": correctness, "notes": note if correctness is not None and correctness <= LOW_SCORE else ""},
+            "relevance": {"score": relevance, "notes": note if relevance is not None and relevance <= LOW_SCORE else ""},
+        })
+    return evaluations
+
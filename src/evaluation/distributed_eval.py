@@ -0,0 +1,293 @@
+"""Coordinator/worker mode for accuracy evaluation of whole books.
+
+The coordinator turns every matched chapter's cards into tasks of TASK_CARDS cards in a shared
+task queue (see task_queue.py). Any number of workers, on this host or others that can reach the
+queue database, lease tasks, judge them exactly like evaluate_accuracy.py does and store the
+results back on the queue. The coordinator then collects the results into the usual outputs:
+the accuracy evaluations JSON, the sharded report and the results database.
+
+    python distributed_eval.py enqueue                 # prints the run id
+    python distributed_eval.py work --run-id <run id>  # start as many of these as you like
+    python distributed_eval.py status --run-id <run id>
+    python distributed_eval.py collect --run-id <run id>
+
+`run --workers N` does all of it on one host: it enqueues, starts N local workers and collects.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+from contextlib import closing, contextmanager
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import metrics, chapter_manifest
+import progress
+import results_store
+import task_queue
+from build_report import build_report
+from golden_index import load_golden
+import evaluate_accuracy
+
+# --- Configuration ---
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+TASK_CARDS = int(os.getenv("TASK_CARDS", "100")) # Cards per task; a task is judged as CARD_CHUNK_SIZE chunks
+POLL_SECONDS = 2 # How often idle workers and the coordinator look at the queue again
+TASK_KIND = 'accuracy_cards'
+
+
+def build_tasks(selected_chapters, chapter_pdfs, topics, cards, task_cards=TASK_CARDS):
+    """Splits each matched chapter's cards into task payloads.
+
+    Payloads are self-contained (card content, topic names and the PDF path relative to the
+    repository), so a worker needs nothing but its own checkout and the queue.
+    """
+    topic_map = {t['id']: t['name'] for t in topics}
+    topic_chapter = {t['id']: t.get('chapter_id') for t in topics}
+    cards_by_chapter = {}
+    for card in cards:
+        cards_by_chapter.setdefault(topic_chapter.get(card.get('topic_id')), []).append(card)
+
+    payloads = []
+    for chapter in selected_chapters:
+        chapter_cards = cards_by_chapter.get(chapter['id'], [])
+        if chapter['id'] not in chapter_pdfs or not chapter_cards:
+            continue
+        pdf = os.path.relpath(os.path.abspath(chapter_pdfs[chapter['id']]), ROOT_DIR)
+        for start in range(0, len(chapter_cards), task_cards):
+            task_cards_slice = [{k: c.get(k) for k in ('id', 'front', 'back', 'topic_id')}
+                                for c in chapter_cards[start:start + task_cards]]
+            payloads.append({
+                "chapter_name": chapter['name'],
+                "pdf": pdf,
+                "cards": task_cards_slice,
+                "topics": {str(c['topic_id']): topic_map.get(c['topic_id'], 'Uncategorized') for c in task_cards_slice},
+            })
+    return payloads
+
+
+def enqueue_run(args):
+    """Coordinator: fetches the book's chapters and cards and queues them as tasks.
+
+    Returns (run_id, payloads), or (None, []) if nothing could be queued.
+    """
+    run_id = args.run_id or metrics.start_run("distributed_eval")
+    print("Fetching data from Supabase...")
+    subjects, books, chapters, topics, cards = (evaluate_accuracy.get_all_data(t)
+                                                for t in ["subjects", "book_title", "chapters", "topics", "cards"])
+    if not all([subjects, books, chapters, topics, cards]):
+        print("Could not fetch all required data from Supabase. Exiting.")
+        return None, []
+    try:
+        subject = next(s for s in subjects if s['class_name'] == args.class_name
+                       and s['subject_name'].lower() == args.subject.lower())
+        book_id = next(b['id'] for b in books if b['subject_id'] == subject['id'])
+    except StopIteration:
+        print(f"No book found for Class {args.class_name} {args.subject}. Exiting.")
+        return None, []
+    selected_chapters = sorted([c for c in chapters if c['book_id'] == book_id], key=lambda x: x['order_index'])
+    chapter_pdfs, unmatched_chapters, unmatched_pdfs = chapter_manifest.match_chapters(selected_chapters, args.pdf_dir)
+    chapter_manifest.report_unmatched(unmatched_chapters, unmatched_pdfs, args.pdf_dir)
+
+    payloads = build_tasks(selected_chapters, chapter_pdfs, topics, cards, args.task_cards)
+    with closing(task_queue.connect(args.queue)) as connection:
+        task_queue.enqueue(connection, run_id, TASK_KIND, payloads, weight_of=lambda p: len(p["cards"]))
+    print(f"Queued {len(payloads)} tasks ({sum(len(p['cards']) for p in payloads)} cards from "
+          f"{len(chapter_pdfs)} chapters) as run '{run_id}' in {args.queue}.")
+    return run_id, payloads
+
+
+@contextmanager
+def keep_leased(db_path, task_id, owner):
+    """Heartbeats the lease from a background thread while the task is being judged."""
+    stop = threading.Event()
+
+    def beat():
+        with closing(task_queue.connect(db_path)) as connection:
+            while not stop.wait(task_queue.LEASE_SECONDS / 3):
+                if not task_queue.heartbeat(connection, task_id, owner):
+                    print(f"Warning: lost the lease on task {task_id}; its result will be discarded.")
+                    return
+
+    thread = threading.Thread(target=beat, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def judge_task(payload, golden_dataset, golden_index, chapter_texts, use_cascade=True):
+    """Judges one task's cards and returns the task result stored on the queue."""
+    chapter_name = payload["chapter_name"]
+    if payload["pdf"] not in chapter_texts:
+        with metrics.labels(chapter=chapter_name):
+            chapter_texts[payload["pdf"]] = evaluate_accuracy.get_pdf_text(os.path.join(ROOT_DIR, payload["pdf"]))
+    chapter_text = chapter_texts[payload["pdf"]]
+    if not chapter_text:
+        raise RuntimeError(f"could not read PDF text from {payload['pdf']}")
+
+    card_chunks = list(evaluate_accuracy.prompt_chunks(payload["cards"]))
+    evaluations = evaluate_accuracy.evaluate_cards(chapter_name, chapter_text, card_chunks, golden_dataset, golden_index,
+                                                   use_cascade=use_cascade)
+    if not evaluations:
+        raise RuntimeError("the judge returned no evaluations")
+    return {"evaluations": evaluations}
+
+
+def work(args):
+    """Worker: leases and judges tasks until the run has nothing left to do."""
+    owner = task_queue.worker_id()
+    metrics.start_run("distributed_eval_worker", worker=owner, queue_run=args.run_id)
+    golden_dataset, golden_index = load_golden()
+    chapter_texts = {}
+    done = failed = 0
+    with closing(task_queue.connect(args.queue)) as connection:
+        while True:
+            task = task_queue.lease(connection, args.run_id, owner)
+            if task is None:
+                if task_queue.is_finished(connection, args.run_id):
+                    break
+                time.sleep(POLL_SECONDS)
+                continue
+            print(f"[{owner}] Task {task['task_id']} (attempt {task['attempt']}): "
+                  f"{len(task['payload']['cards'])} cards of '{task['payload']['chapter_name']}'")
+            try:
+                with keep_leased(args.queue, task['task_id'], owner):
+                    result = judge_task(task['payload'], golden_dataset, golden_index, chapter_texts,
+                                        use_cascade=not args.no_cascade)
+            except Exception as e:
+                print(f"[{owner}] Task {task['task_id']} failed: {e}")
+                task_queue.fail(connection, task['task_id'], owner, e)
+                failed += 1
+                continue
+            if task_queue.complete(connection, task['task_id'], owner, result):
+                done += 1
+            else:
+                print(f"[{owner}] Task {task['task_id']} was re-leased to another worker; result discarded.")
+    print(f"[{owner}] No tasks left: {done} completed, {failed} failed attempts.")
+    metrics.print_summary()
+
+
+def print_status(connection, run_id):
+    done_cards, total_cards = task_queue.progress_totals(connection, run_id)
+    status_counts = task_queue.counts(connection, run_id)
+    print(f"Run '{run_id}': {done_cards}/{total_cards} cards judged; tasks "
+          + ", ".join(f"{status}: {n}" for status, n in sorted(status_counts.items())))
+
+
+def collect(run_id, db_path):
+    """Coordinator: merges the completed tasks into the accuracy evaluations file, report and results DB.
+
+    Returns False if any task gave up, so callers can exit non-zero.
+    """
+    final_evaluations, seen_cards_content = [], set()
+    with closing(task_queue.connect(db_path)) as connection:
+        print_status(connection, run_id)
+        for payload, result in task_queue.results(connection, run_id, TASK_KIND):
+            topic_map = {c['topic_id']: payload["topics"].get(str(c['topic_id'])) for c in payload["cards"]}
+            final_evaluations.extend(evaluate_accuracy.build_card_records(
+                payload["chapter_name"], payload["cards"], result["evaluations"], topic_map, seen_cards_content))
+        failed_tasks = task_queue.failures(connection, run_id)
+        pending = not task_queue.is_finished(connection, run_id)
+
+    for task_id, attempts, error, payload in failed_tasks:
+        print(f"Task {task_id} ({len(payload['cards'])} cards of '{payload['chapter_name']}') "
+              f"failed after {attempts} attempts: {error}")
+    if pending:
+        print("Warning: the run still has pending or leased tasks; collecting the partial results.")
+    if final_evaluations:
+        with open(evaluate_accuracy.EVALUATIONS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_evaluations, f, indent=4, ensure_ascii=False)
+        with metrics.span("report_build"):
+            build_report(evaluate_accuracy.EVALUATIONS_FILE)
+        with metrics.span("results_db_write"):
+            results_store.save_accuracy_results(run_id, final_evaluations, evaluator='distributed_eval',
+                                                source_file=evaluate_accuracy.EVALUATIONS_FILE)
+        print(f"Collected {len(final_evaluations)} card evaluations into {evaluate_accuracy.EVALUATIONS_FILE}.")
+    return not failed_tasks
+
+
+def run_local(args):
+    """Enqueue, judge with N local worker processes and collect, reporting progress meanwhile."""
+    run_id, payloads = enqueue_run(args)
+    if not run_id:
+        return False
+    worker_args = [sys.executable, os.path.abspath(__file__), '--queue', args.queue, 'work', '--run-id', run_id]
+    if args.no_cascade:
+        worker_args.append('--no-cascade')
+    workers = [subprocess.Popen(worker_args, cwd=os.path.dirname(os.path.abspath(__file__)))
+               for _ in range(args.workers)]
+
+    with closing(task_queue.connect(args.queue)) as connection:
+        progress.start("distributed_eval", len({p["chapter_name"] for p in payloads}), sum(len(p["cards"]) for p in payloads))
+        reported = 0
+        while any(w.poll() is None for w in workers):
+            time.sleep(POLL_SECONDS)
+            done_cards, _ = task_queue.progress_totals(connection, run_id)
+            if done_cards > reported:
+                progress.cards_evaluated(None, done_cards - reported)
+                reported = done_cards
+    if any(w.returncode for w in workers):
+        print(f"Warning: {sum(1 for w in workers if w.returncode)} worker(s) exited with an error.")
+
+    ok = collect(run_id, args.queue)
+    progress.finish(evaluate_accuracy.EVALUATIONS_FILE)
+    metrics.print_summary()
+    return ok
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Distributed accuracy evaluation over a shared task queue.")
+    parser.add_argument('--queue', default=task_queue.QUEUE_DB, help="Path of the shared queue database.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_book_arguments(command):
+        command.add_argument('--class-name', default='11')
+        command.add_argument('--subject', default='biology')
+        command.add_argument('--pdf-dir', default=evaluate_accuracy.PDF_DIRECTORY)
+        command.add_argument('--task-cards', type=int, default=TASK_CARDS)
+        command.add_argument('--run-id', help="Add the tasks to an existing run instead of starting a new one.")
+
+    add_book_arguments(commands.add_parser('enqueue', help="Queue a book's cards as tasks and print the run id."))
+    work_parser = commands.add_parser('work', help="Lease and judge tasks until the run is finished.")
+    work_parser.add_argument('--run-id', help="Run to work on (default: the most recently queued run).")
+    work_parser.add_argument('--no-cascade', action='store_true')
+    for name, help_text in (('status', "Show task counts for a run."), ('collect', "Write a run's results.")):
+        commands.add_parser(name, help=help_text).add_argument('--run-id', help="Run id (default: the most recently queued run).")
+    run_parser = commands.add_parser('run', help="Enqueue, judge with local workers and collect.")
+    add_book_arguments(run_parser)
+    run_parser.add_argument('--workers', type=int, default=4)
+    run_parser.add_argument('--no-cascade', action='store_true')
+    # Also accepted after the subcommand, as `cli.py status --queue X` passes it.
+    for command in commands.choices.values():
+        command.add_argument('--queue', default=argparse.SUPPRESS, help="Path of the shared queue database.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == 'enqueue':
+        return 0 if enqueue_run(args)[0] else 1
+    if args.command == 'run':
+        return 0 if run_local(args) else 1
+
+    args.run_id = args.run_id or task_queue.latest_run(args.queue)
+    if not args.run_id:
+        print(f"No runs queued in {args.queue}.")
+        return 1
+    if args.command == 'work':
+        work(args)
+        return 0
+    if args.command == 'status':
+        with closing(task_queue.connect(args.queue)) as connection:
+            print_status(connection, args.run_id)
+        return 0
+    metrics.start_run("distributed_eval_collect")
+    return 0 if collect(args.run_id, args.queue) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
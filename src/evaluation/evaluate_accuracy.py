@@ -1,32 +1,30 @@
 import os
 import json
-import time
-import math
-from openai import OpenAI
-import pdfplumber
-from supabase import create_client, Client
+import sys
+import argparse
+from collections import Counter
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import clients, metrics, pdf_text, chapter_manifest, scheduler, streaming
+import progress
+from build_report import build_report, report_writer
+import results_store
+from golden_index import load_golden, select_examples
+import sampling
+import judge_cascade
+import compact_schema
+
 # --- Configuration ---
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-XAI_API_KEY = os.getenv("XAI_API_KEY")
-EVALUATIONS_FILE = '../../accuracy_evaluations.json'
-PDF_DIRECTORY = '../../books/class11_biology'
-CARD_CHUNK_SIZE = 20 # Increased chunk size for faster evaluation
-
-# --- Initialize Clients ---
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    client = OpenAI(
-        api_key=os.getenv("XAI_API_KEY"),
-        base_url="https://api.x.ai/v1",
-    )
-    grok_model = 'grok-4'
-except Exception as e:
-    print(f"Error initializing clients: {e}")
-    exit()
+EVALUATIONS_FILE = os.getenv("EVALUATIONS_FILE", '../../accuracy_evaluations.json')
+PDF_DIRECTORY = os.getenv("PDF_DIRECTORY", '../../books/class11_biology')
+CARD_CHUNK_SIZE = int(os.getenv("CARD_CHUNK_SIZE", "20")) # Cards per judge call; plan.py shows the trade-off
+PROVENANCE_FIELDS = ("judge_model", "escalated", "escalation_reason", "escalation_failed", "first_pass")
+SAMPLE_EVALUATIONS_FILE = os.getenv("SAMPLE_EVALUATIONS_FILE", '../../accuracy_sample_evaluations.json')
+SAMPLE_REPORT_FILE = os.getenv("SAMPLE_REPORT_FILE", '../../accuracy_sample_report.json')
+grok_model = 'grok-4'
+# Supabase and xAI clients are created on first use (see common/clients.py).
 
 def get_all_data(table_name):
     """Fetches all data from a Supabase table, handling pagination."""
@@ -36,7 +34,8 @@ def get_all_data(table_name):
     while True:
         try:
             start_index = current_page * page_size
-            response = supabase.table(table_name).select("*").range(start_index, start_index + page_size - 1).execute()
+            with metrics.span("supabase_page", table=table_name):
+                response = clients.supabase().table(table_name).select("*").range(start_index, start_index + page_size - 1).execute()
             data = response.data
             all_data.extend(data)
             if len(data) < page_size:
@@ -53,16 +52,81 @@ def get_pdf_text(pdf_path):
         print(f"PDF not found: {pdf_path}")
         return None
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            return "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
+        with metrics.span("pdf_extract", pdf=os.path.basename(pdf_path)):
+            return pdf_text.extract_text(pdf_path)
     except Exception as e:
         print(f"Error reading PDF {pdf_path}: {e}")
         return None
 
-def get_accuracy_evaluation(chapter_text, card_chunk, golden_dataset):
+def get_accuracy_evaluation(chapter_text, card_chunk, golden_examples, model=None):
     """Evaluates a chunk of cards for accuracy against the full chapter text."""
-    print(f"Evaluating a chunk of {len(card_chunk)} cards for accuracy...")
-    prompt = f"""
+    model = model or grok_model
+    print(f"Evaluating a chunk of {len(card_chunk)} cards for accuracy with {model}...")
+    with metrics.span("prompt_build"):
+        prompt = build_accuracy_prompt(chapter_text, card_chunk, golden_examples)
+
+    def ask(max_tokens):
+        # Compact responses are short rows with a bounded length (see compact_schema.py).
+        limits = {"max_tokens": max_tokens} if max_tokens else {}
+        with scheduler.rate_limited(), metrics.span("llm_call", model=model):
+            response = clients.xai().chat.completions.create(
+                model=model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                temperature=0.0, # Set to 0 for deterministic, fact-based evaluation
+                **limits
+            )
+        metrics.record_response("accuracy", model, prompt, response.choices[0].message.content)
+
+        # Extract and print token usage
+        if response.usage:
+            metrics.record_usage(model, response)
+            print(f"    Token Usage: Prompt Tokens = {response.usage.prompt_tokens}, Completion Tokens = {response.usage.completion_tokens}, Total Tokens = {response.usage.total_tokens}")
+        return response.choices[0].message.content, response.choices[0].finish_reason
+
+    try:
+        response_text = compact_schema.with_budget(ask, len(card_chunk), model)
+        cleaned_text = response_text.strip().replace('```', '').replace('json', '')
+
+        with metrics.span("json_parse"):
+            parsed = json.loads(cleaned_text)
+        if compact_schema.COMPACT:
+            return compact_schema.expand_accuracy(parsed, [c["card_id"] for c in card_chunk])
+        return parsed
+    except Exception as e:
+        metrics.incr("llm_errors")
+        print(f"Error during card chunk evaluation: {e}")
+        return None
+
+VERBOSE_ACCURACY_FORMAT = """**Required Output (Strict JSON):**
+    Respond with only a valid JSON list of evaluation objects. No other text or formatting.
+    ```json
+    [
+      {
+        "card_id": "<uuid>",
+        "accuracy_score": <integer_1_to_4>,
+        "confidence_score": <integer_0_to_100>,
+        "rationale": "<brief explanation>"
+      }
+    ]
+    ```
+    Provide a concise rationale (1-2 sentences) for each card's scores, explaining *why* based *only* on the NCERT text."""
+COMPACT_ACCURACY_FORMAT = """**Required Output (Strict JSON):**
+    Respond with only a JSON list with one row per flashcard: [i, accuracy, confidence], where i is the card's "i".
+    Only when accuracy is 1 or 2, add a fourth element: a one-sentence rationale based *only* on the NCERT text.
+    No other text or formatting. Example: [[1,4,95],[2,2,70,"Correct, but the text does not mention it."]]"""
+
+def build_accuracy_prompt(chapter_text, card_chunk, golden_examples):
+    """Builds the accuracy-judge prompt for one chunk of cards."""
+    if compact_schema.COMPACT:
+        prompt_cards, output_format = compact_schema.numbered_cards(card_chunk, "question", "answer"), COMPACT_ACCURACY_FORMAT
+    else:
+        prompt_cards, output_format = card_chunk, VERBOSE_ACCURACY_FORMAT
+    return f"""
     You are an accuracy evaluator for educational flashcards. Evaluate answers based *only* on the provided NCERT chapter text.
 
     **Reference NCERT Chapter Text:**
@@ -77,59 +141,318 @@ def get_accuracy_evaluation(chapter_text, card_chunk, golden_dataset):
     *   **4 (Fully NCERT):** Accurate, directly verifiable from text.
 
     **Golden Standard Examples:**
-    {json.dumps(golden_dataset, indent=None, separators=(',', ':'))}
+    {json.dumps(golden_examples, indent=None, separators=(',', ':'))}
 
     **Evaluation Task:**
     For each flashcard in the chunk below, provide accuracy (1-4) and confidence (0-100) scores. Base judgment *solely* on the NCERT text.
 
     **Flashcard Chunk to Evaluate:**
-    {json.dumps(card_chunk, indent=None, separators=(',', ':'))}
+    {json.dumps(prompt_cards, indent=None, separators=(',', ':'))}
 
-    **Required Output (Strict JSON):**
-    Respond with only a valid JSON list of evaluation objects. No other text or formatting.
-    ```json
-    [
-      {{
-        "card_id": "<uuid>",
-        "accuracy_score": <integer_1_to_4>,
-        "confidence_score": <integer_0_to_100>,
-        "rationale": "<brief explanation>"
-      }}
-    ]
-    ```
-    Provide a concise rationale (1-2 sentences) for each card's scores, explaining *why* based *only* on the NCERT text.
+    {output_format}
     """
-    try:
-        response = client.chat.completions.create(
-            model=grok_model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            temperature=0.0 # Set to 0 for deterministic, fact-based evaluation
-        )
-        cleaned_text = response.choices[0].message.content.strip().replace('```', '').replace('json', '')
+
+def prompt_cards(cards):
+    """The fields of each card the judge sees."""
+    return [{"card_id": c['id'], "question": c['front'], "answer": c['back']} for c in cards]
+
+def prompt_chunks(cards, chunk_size=None):
+    """Splits cards into the judge's prompt chunks, as they arrive; shared by every run mode and plan.py."""
+    for chunk in streaming.chunked(cards, chunk_size or CARD_CHUNK_SIZE):
+        yield prompt_cards(chunk)
+
+def judge_chunk(chapter_name, chapter_text, prompt_chunk, chunk_number, golden_dataset, golden_index, model=None):
+    """Judges one chunk of cards with the golden examples closest to it; returns [] on failure."""
+    with metrics.labels(chapter=chapter_name, chunk=chunk_number):
+        # Only the golden examples closest to this chunk go into the prompt, not the whole dataset.
+        with metrics.span("golden_select"):
+            golden_examples = select_examples(golden_dataset, golden_index, prompt_chunk)
+        chunk_eval = get_accuracy_evaluation(chapter_text, prompt_chunk, golden_examples, model)
+    return chunk_eval or []
+
+def count_judged(chapter_name, chunk_eval):
+    if chunk_eval:
+        metrics.incr("cards_evaluated", len(chunk_eval), chapter=chapter_name)
+        progress.cards_evaluated(chapter_name, len(chunk_eval))
+
+def evaluate_cards(chapter_name, chapter_text, card_chunks, golden_dataset, golden_index, use_cascade=True):
+    """Judges chunks of prompt cards, through the cheap-first cascade unless it is disabled.
+
+    Every result carries its provenance: `judge_model`, `escalated` and, for escalated cards,
+    the reason and the cheap judge's first-pass scores.
+    """
+    def judge(model, prompt_chunk, chunk_number):
+        return judge_chunk(chapter_name, chapter_text, prompt_chunk, chunk_number, golden_dataset, golden_index, model)
+
+    if use_cascade:
+        evaluations = judge_cascade.run_cascade(card_chunks, judge, CARD_CHUNK_SIZE,
+                                                on_first_pass=lambda _, chunk_eval: count_judged(chapter_name, chunk_eval))
+        by_model, by_reason = judge_cascade.summarize(evaluations)
+        escalated = sum(by_reason.values())
+        metrics.incr("cards_escalated", escalated, chapter=chapter_name)
+        print(f"   {escalated}/{len(evaluations)} cards escalated to {judge_cascade.STRONG_JUDGE_MODEL} "
+              f"({', '.join(f'{r}: {n}' for r, n in sorted(by_reason.items())) or 'none'}); final judges: {by_model}.")
+        return evaluations
+
+    evaluations = []
+    for number, prompt_chunk in enumerate(card_chunks, start=1):
+        print(f"-- Evaluating chunk {number}/{len(card_chunks)} --")
+        chunk_eval = judge(grok_model, prompt_chunk, number)
+        count_judged(chapter_name, chunk_eval)
+        evaluations.extend({**e, "judge_model": grok_model, "escalated": False} for e in chunk_eval)
+    return evaluations
+
+def build_card_records(chapter_name, chapter_cards, card_evals, topic_map, seen_cards_content):
+    """Joins the judge's scores with the card content and flags repeated question/answer pairs."""
+    card_info_map = {}
+    for card in chapter_cards:
+        topic_name = topic_map.get(card.get('topic_id'), 'Uncategorized')
+        card_info_map[card['id']] = {
+            "question": card['front'],
+            "answer": card['back'],
+            "topic_name": topic_name
+        }
+
+    records = []
+    for eval_item in card_evals:
+        card_id = eval_item["card_id"]
+        card_info = card_info_map.get(card_id, {})
         
-        # Extract and print token usage
-        if response.usage:
-            print(f"    Token Usage: Prompt Tokens = {response.usage.prompt_tokens}, Completion Tokens = {response.usage.completion_tokens}, Total Tokens = {response.usage.total_tokens}")
+        question = card_info.get("question")
+        answer = card_info.get("answer")
+        
+        is_repeated = False
+        if (question, answer) in seen_cards_content:
+            is_repeated = True
+        else:
+            seen_cards_content.add((question, answer))
+
+        records.append({
+            "card_id": card_id,
+            "chapter_name": chapter_name,
+            "topic_name": card_info.get("topic_name"),
+            "question": question,
+            "answer": answer,
+            "accuracy_score": eval_item.get("accuracy_score"),
+            "confidence_score": eval_item.get("confidence_score"),
+            "rationale": eval_item.get("rationale"),
+            "is_repeated": is_repeated,
+            **{k: eval_item[k] for k in PROVENANCE_FIELDS if k in eval_item},
+        })
+    return records
+
+def sample_chapter(chapter, chapter_text, chapter_cards, topic_map, golden_dataset, golden_index, args, judge_all=False):
+    """Judges a stratified sample of the chapter's cards until the accuracy estimate is tight enough.
+
+    With `judge_all` the stopping rule is skipped and every card is judged. Returns (card_evals, chapter_estimate).
+    """
+    chapter_name = chapter['name']
+    ordered_cards = sampling.stratified_order(chapter_cards, lambda c: c.get('topic_id'), seed=args.seed)
+    topic_sizes = Counter(c.get('topic_id') for c in chapter_cards)
+    card_topics = {c['id']: c.get('topic_id') for c in chapter_cards}
+    scores_by_topic = {}
+    card_evals = []
+    result = sampling.estimate(scores_by_topic, topic_sizes, args.confidence)
+
+    for prompt_chunk in prompt_chunks(ordered_cards):
+        chunk_eval = evaluate_cards(chapter_name, chapter_text, [prompt_chunk], golden_dataset, golden_index,
+                                    use_cascade=not args.no_cascade)
+        for eval_item in chunk_eval:
+            score = eval_item.get("accuracy_score")
+            if isinstance(score, (int, float)) and eval_item.get("card_id") in card_topics:
+                scores_by_topic.setdefault(card_topics[eval_item["card_id"]], []).append(score)
+        card_evals.extend(chunk_eval)
+
+        result = sampling.estimate(scores_by_topic, topic_sizes, args.confidence)
+        print(f"   Estimated accuracy: {sampling.format_estimate(result)}")
+        if not judge_all and sampling.should_stop(result, args.half_width, args.min_cards):
+            break
+
+    topic_estimates = {}
+    for topic_id, size in topic_sizes.items():
+        scores = scores_by_topic.get(topic_id, [])
+        topic_estimates[topic_map.get(topic_id, 'Uncategorized')] = {
+            "population": size,
+            "sampled": len(scores),
+            "mean_accuracy": round(sum(scores) / len(scores), 3) if scores else None,
+        }
+    estimate = {
+        "chapter_name": chapter_name,
+        **{k: result[k] for k in ("population", "sampled", "confidence", "half_width", "ci_low", "ci_high")},
+        "mean_accuracy": result["mean"],
+        "verdict": sampling.verdict(result, args.threshold),
+        "stopped_early": result["sampled"] < result["population"],
+        "topics": topic_estimates,
+    }
+    return card_evals, estimate
+
+def run_sampled_evaluation(run_id, args, selected_chapters, chapter_pdfs, topics, cards, topic_map, golden_dataset, golden_index):
+    """Quality-gates every matched chapter from a stratified sample of its cards."""
+    chapters_to_sample = [c for c in selected_chapters if c['id'] in chapter_pdfs]
+    chapter_manifest.report_unmatched([c for c in selected_chapters if c['id'] not in chapter_pdfs], [], PDF_DIRECTORY)
+    topic_chapter = {t['id']: t.get('chapter_id') for t in topics}
+    cards_by_chapter = {}
+    for card in cards:
+        cards_by_chapter.setdefault(topic_chapter.get(card.get('topic_id')), []).append(card)
+
+    progress.start("evaluate_accuracy", len(chapters_to_sample),
+                   sum(len(cards_by_chapter.get(c['id'], [])) for c in chapters_to_sample))
+    final_evaluations, estimates = [], []
+    seen_cards_content = set()
+    for i, chapter in enumerate(chapters_to_sample):
+        chapter_name = chapter['name']
+        chapter_cards = cards_by_chapter.get(chapter['id'], [])
+        if not chapter_cards:
+            print(f"No cards found for chapter {chapter_name}. Skipping.")
+            continue
+        print(f"\n--- Sampling Chapter {i + 1}/{len(chapters_to_sample)}: '{chapter_name}' ({len(chapter_cards)} cards) ---")
+        with metrics.labels(chapter=chapter_name):
+            chapter_text = get_pdf_text(chapter_pdfs[chapter['id']])
+        if not chapter_text:
+            print(f"Could not read PDF text for {chapter_name}. Skipping.")
+            continue
+
+        progress.chapter_started(chapter_name, i + 1, len(chapter_cards))
+        card_evals, estimate = sample_chapter(chapter, chapter_text, chapter_cards, topic_map,
+                                              golden_dataset, golden_index, args)
+        final_evaluations.extend(build_card_records(chapter_name, chapter_cards, card_evals, topic_map, seen_cards_content))
+        estimates.append(estimate)
+        progress.chapter_finished(chapter_name, {"accuracy": estimate["mean_accuracy"], "accuracy_ci": estimate["half_width"]})
 
-        return json.loads(cleaned_text)
+    print("\n--- Sampled accuracy by chapter ---")
+    for estimate in estimates:
+        print(f"  {estimate['verdict'].upper():<13} {estimate['chapter_name']}: "
+              f"{sampling.format_estimate({**estimate, 'mean': estimate['mean_accuracy']})}")
+
+    report = {
+        "run_id": run_id,
+        "confidence": args.confidence,
+        "target_half_width": args.half_width,
+        "threshold": args.threshold,
+        "seed": args.seed,
+        "cards_judged": len(final_evaluations),
+        "cards_total": sum(e["population"] for e in estimates),
+        "chapters": estimates,
+    }
+    with open(SAMPLE_REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    if final_evaluations:
+        with open(SAMPLE_EVALUATIONS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_evaluations, f, indent=4, ensure_ascii=False)
+        with metrics.span("results_db_write"):
+            results_store.save_accuracy_results(run_id, final_evaluations, evaluator='evaluate_accuracy_sample',
+                                                source_file=SAMPLE_EVALUATIONS_FILE)
+    print(f"Judged {report['cards_judged']} of {report['cards_total']} cards. "
+          f"Estimates saved to {SAMPLE_REPORT_FILE}, sampled cards to {SAMPLE_EVALUATIONS_FILE}.")
+    progress.finish(SAMPLE_EVALUATIONS_FILE if final_evaluations else None)
+    metrics.print_summary()
+    return estimates
+
+def select_book_streaming():
+    """Finds the book's chapters (and their PDFs) with filtered queries instead of reading whole tables."""
+    subject = next((s for s in streaming.iter_rows("subjects", class_name='11') if s['subject_name'].lower() == 'biology'), None)
+    if subject is None:
+        raise LookupError("no Class 11 Biology subject")
+    book = next(streaming.iter_rows("book_title", subject_id=subject['id']), None)
+    if book is None:
+        raise LookupError(f"no book for subject {subject['id']}")
+    selected_chapters = sorted(streaming.iter_rows("chapters", book_id=book['id']), key=lambda x: x['order_index'])
+    return selected_chapters, chapter_manifest.match_chapters(selected_chapters, PDF_DIRECTORY)[0]
+
+def run_streaming_evaluation(run_id, args, golden_dataset, golden_index):
+    """Judges every card of the book while holding only one page and one chunk of cards at a time.
+
+    Cards are read page by page for one chapter's topics, judged as each chunk fills, and every
+    result goes straight to EVALUATIONS_FILE, the report shards and the results store. Repeated question/answer pairs
+    are flagged within a chapter, so memory grows with the largest chapter, not with the book.
+    """
+    try:
+        selected_chapters, chapter_pdfs = select_book_streaming()
     except Exception as e:
-        print(f"Error during card chunk evaluation: {e}")
-        return None
+        print(f"Setup error: {e}")
+        return
+    chapter_manifest.report_unmatched([c for c in selected_chapters if c['id'] not in chapter_pdfs], [], PDF_DIRECTORY)
+    chapters_to_judge = [c for c in selected_chapters if c['id'] in chapter_pdfs]
+    topic_maps = {c['id']: {t['id']: t['name'] for t in streaming.iter_rows("topics", chapter_id=c['id'])}
+                  for c in chapters_to_judge}
+    card_counts = {c['id']: streaming.count_rows("cards", topic_id=list(topic_maps[c['id']])) for c in chapters_to_judge}
+    print(f"Streaming {sum(card_counts.values())} cards from {len(chapters_to_judge)} chapters.")
+    progress.start("evaluate_accuracy", len(chapters_to_judge), sum(card_counts.values()))
+
+    judged = 0
+    with streaming.json_array(EVALUATIONS_FILE) as write, report_writer(EVALUATIONS_FILE) as add_to_report:
+        for i, chapter in enumerate(chapters_to_judge):
+            chapter_name, topic_map = chapter['name'], topic_maps[chapter['id']]
+            if not card_counts[chapter['id']]:
+                print(f"No cards found for chapter {chapter_name}. Skipping.")
+                continue
+            print(f"\n--- Streaming Chapter {i + 1}/{len(chapters_to_judge)}: '{chapter_name}' ({card_counts[chapter['id']]} cards) ---")
+            with metrics.labels(chapter=chapter_name):
+                chapter_text = get_pdf_text(chapter_pdfs[chapter['id']])
+            if not chapter_text:
+                print(f"Could not read PDF text for {chapter_name}. Skipping.")
+                continue
+
+            progress.chapter_started(chapter_name, i + 1, card_counts[chapter['id']])
+            seen_cards_content = set()
+            # Running totals for the chapter's headline scores, so no per-card scores are kept.
+            accuracy_total = confidence_total = scored = 0
+            cards = streaming.iter_rows("cards", columns="id,topic_id,front,back", topic_id=list(topic_map))
+            for chunk in streaming.chunked(cards, CARD_CHUNK_SIZE):
+                prompt_chunk = prompt_cards(chunk)
+                card_evals = evaluate_cards(chapter_name, chapter_text, [prompt_chunk], golden_dataset, golden_index,
+                                            use_cascade=not args.no_cascade)
+                records = build_card_records(chapter_name, chunk, card_evals, topic_map, seen_cards_content)
+                for record in records:
+                    write(record)
+                    add_to_report(record)
+                with metrics.span("results_db_write"):
+                    results_store.save_accuracy_results(run_id, records, source_file=EVALUATIONS_FILE)
+                judged += len(records)
+                for record in records:
+                    if isinstance(record["accuracy_score"], int):
+                        accuracy_total += record["accuracy_score"]
+                        confidence_total += record["confidence_score"] or 0
+                        scored += 1
+            progress.chapter_finished(chapter_name, {
+                "accuracy": round(accuracy_total / scored, 2) if scored else None,
+                "confidence": round(confidence_total / scored, 2) if scored else None,
+            })
+
+    print(f"\nJudged {judged} cards. Results saved to {EVALUATIONS_FILE} and the report rebuilt.")
+    progress.finish(EVALUATIONS_FILE if judged else None)
+    metrics.print_summary()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Judge flashcard accuracy against the NCERT chapter text.")
+    parser.add_argument('--sample', action='store_true',
+                        help="Quality-gate every chapter from a stratified sample of its cards instead of judging all of them.")
+    parser.add_argument('--half-width', type=float, default=sampling.SAMPLE_HALF_WIDTH,
+                        help="Stop sampling a chapter once its accuracy interval is within +/- this.")
+    parser.add_argument('--confidence', type=float, default=sampling.SAMPLE_CONFIDENCE)
+    parser.add_argument('--min-cards', type=int, default=sampling.SAMPLE_MIN_CARDS)
+    parser.add_argument('--threshold', type=float, default=sampling.QUALITY_THRESHOLD,
+                        help="Mean accuracy a chapter must reach to pass.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the sampling order.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Judge every card of the book, reading cards page by page and writing results as they come.")
+    parser.add_argument('--no-cascade', action='store_true',
+                        help=f"Judge every card with {grok_model} instead of {judge_cascade.CHEAP_JUDGE_MODEL} first.")
+    args = parser.parse_args()
+    if args.sample and args.stream:
+        parser.error("--sample and --stream cannot be combined")
+    return args
 
 def main():
     """Main function to run the chapter-based accuracy evaluation."""
+    args = parse_args()
     print("Starting flashcard accuracy evaluation...")
+    run_id = metrics.start_run("evaluate_accuracy_sample" if args.sample else "evaluate_accuracy")
 
     # 1. Load the golden dataset
     print("Loading golden dataset...")
     try:
-        with open('../../dataset/golden_dataset.json', 'r', encoding='utf-8') as f:
-            golden_dataset = json.load(f)
+        golden_dataset, golden_index = load_golden()
     except FileNotFoundError:
         print("Error: golden_dataset.json not found. Please create the dataset first.")
         return
@@ -137,6 +460,10 @@ def main():
         print("Error: golden_dataset.json is not a valid JSON file.")
         return
 
+    if args.stream:
+        run_streaming_evaluation(run_id, args, golden_dataset, golden_index)
+        return
+
     # 2. Fetch all data from Supabase
     print("Fetching data from Supabase...")
     subjects, books, chapters, topics, cards = (get_all_data(t) for t in ["subjects", "book_title", "chapters", "topics", "cards"])
@@ -156,14 +483,20 @@ def main():
         subject_name = selected_subject['subject_name']
         book_id = next(b['id'] for b in books if b['subject_id'] == subject_id)
         selected_chapters = sorted([c for c in chapters if c['book_id'] == book_id], key=lambda x: x['order_index'])
-        # Ensure PDF files are sorted to match chapter order
-        pdf_files = sorted([f for f in os.listdir(PDF_DIRECTORY) if f.lower().endswith('.pdf')])
+        chapter_pdfs = chapter_manifest.match_chapters(selected_chapters, PDF_DIRECTORY)[0]
     except (StopIteration, FileNotFoundError) as e:
         print(f"Setup error for Class 8 Arts: {e}")
         return
 
     print(f"Found {len(selected_chapters)} chapters for Class {class_name} {subject_name.capitalize()}.")
 
+    if args.sample:
+        estimates = run_sampled_evaluation(run_id, args, selected_chapters, chapter_pdfs, topics, cards, topic_map,
+                                           golden_dataset, golden_index)
+        if any(e["verdict"] == "fail" for e in estimates):
+            sys.exit(1)
+        return
+
     # 4. Process each chapter
     final_evaluations = []
     seen_cards_content = set() # To store (question, answer) tuples for duplicate detection
@@ -174,7 +507,8 @@ def main():
         return
 
     chapter = selected_chapters[0] # Get the first chapter
-    if 0 >= len(pdf_files):
+    if chapter['id'] not in chapter_pdfs:
+        chapter_manifest.report_unmatched([chapter], [], PDF_DIRECTORY)
         print(f"Warning: No matching PDF found for chapter {chapter['name']}. Skipping.")
         return
     
@@ -182,8 +516,9 @@ def main():
     print(f"\n--- Processing Chapter 1 (for testing): '{chapter_name}' ---")
 
     # a. Get the full, unsanitized PDF text
-    pdf_path = os.path.join(PDF_DIRECTORY, pdf_files[0])
-    full_chapter_text = get_pdf_text(pdf_path)
+    pdf_path = chapter_pdfs[chapter['id']]
+    with metrics.labels(chapter=chapter_name):
+        full_chapter_text = get_pdf_text(pdf_path)
     if not full_chapter_text:
         print(f"Could not read PDF text for {chapter_name}. Skipping.")
         return
@@ -203,61 +538,22 @@ def main():
         return
     
     print(f"Found {len(chapter_cards)} cards for the first topic of this chapter.")
+    progress.start("evaluate_accuracy", 1, len(chapter_cards))
+    progress.chapter_started(chapter_name, 1, len(chapter_cards))
 
     # c. Perform accuracy evaluation in chunks
-    num_chunks = math.ceil(len(chapter_cards) / CARD_CHUNK_SIZE)
-    print(f"Splitting cards into {num_chunks} chunks of size {CARD_CHUNK_SIZE}.")
-    all_card_evals = []
-    for j in range(num_chunks):
-        start = j * CARD_CHUNK_SIZE
-        end = start + CARD_CHUNK_SIZE
-        chunk = chapter_cards[start:end]
-        
-        print(f"-- Evaluating chunk {j + 1}/{num_chunks} --")
-        
-        # Prepare chunk with only necessary data for the prompt
-        prompt_chunk = [{"card_id": c['id'], "question": c['front'], "answer": c['back']}
-                        for c in chunk]
-        
-        chunk_eval = get_accuracy_evaluation(full_chapter_text, prompt_chunk, golden_dataset)
-        if chunk_eval:
-            all_card_evals.extend(chunk_eval)
-        time.sleep(0.1) # Reduced rate limit delay for faster evaluation
+    card_chunks = list(prompt_chunks(chapter_cards))
+    print(f"Splitting cards into {len(card_chunks)} chunks of size {CARD_CHUNK_SIZE}.")
+    all_card_evals = evaluate_cards(chapter_name, full_chapter_text, card_chunks, golden_dataset, golden_index,
+                                    use_cascade=not args.no_cascade)
     
     # d. Combine all results into the final structure and check for duplicates
-    card_info_map = {}
-    for card in chapter_cards:
-        topic_name = topic_map.get(card.get('topic_id'), 'Uncategorized')
-        card_info_map[card['id']] = {
-            "question": card['front'],
-            "answer": card['back'],
-            "topic_name": topic_name
-        }
-
-    for eval_item in all_card_evals:
-        card_id = eval_item["card_id"]
-        card_info = card_info_map.get(card_id, {})
-        
-        question = card_info.get("question")
-        answer = card_info.get("answer")
-        
-        is_repeated = False
-        if (question, answer) in seen_cards_content:
-            is_repeated = True
-        else:
-            seen_cards_content.add((question, answer))
-
-        final_evaluations.append({
-            "card_id": card_id,
-            "topic_name": card_info.get("topic_name"),
-            "question": question,
-            "answer": answer,
-            "accuracy_score": eval_item.get("accuracy_score"),
-            "confidence_score": eval_item.get("confidence_score"),
-            "rationale": eval_item.get("rationale"),
-            "is_repeated": is_repeated
-        })
+    final_evaluations.extend(build_card_records(chapter_name, chapter_cards, all_card_evals, topic_map, seen_cards_content))
 
+    progress.chapter_finished(chapter_name, {
+        "accuracy": progress.mean_score(e["accuracy_score"] for e in final_evaluations),
+        "confidence": progress.mean_score(e["confidence_score"] for e in final_evaluations),
+    })
     print(f"Successfully evaluated {len(chapter_cards)} cards for the first topic of chapter '{chapter_name}'.")
 
     # 5. Save the final results
@@ -265,6 +561,13 @@ def main():
         with open(EVALUATIONS_FILE, 'w', encoding='utf-8') as f:
             json.dump(final_evaluations, f, indent=4, ensure_ascii=False)
         print(f"\nAccuracy evaluation process completed. Results saved to {EVALUATIONS_FILE}")
+        with metrics.span("report_build"):
+            build_report(EVALUATIONS_FILE)
+        print("Sharded report written for evaluation_report.html.")
+        with metrics.span("results_db_write"):
+            results_store.save_accuracy_results(run_id, final_evaluations, source_file=EVALUATIONS_FILE)
+    progress.finish(EVALUATIONS_FILE if final_evaluations else None)
+    metrics.print_summary()
 
 if __name__ == "__main__":
     main()
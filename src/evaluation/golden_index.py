@@ -0,0 +1,138 @@
+import os
+import re
+import sys
+import json
+import math
+import hashlib
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import cache
+
+# --- Configuration ---
+GOLDEN_DATASET_FILE = os.getenv("GOLDEN_DATASET_FILE", '../../dataset/golden_dataset.json')
+GOLDEN_INDEX_FILE = os.getenv("GOLDEN_INDEX_FILE", '../../dataset/golden_index.json')
+GOLDEN_EXAMPLES_K = 3 # Golden examples included in each judge prompt
+BM25_K1 = 1.5
+BM25_B = 0.75
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'can', 'do', 'does', 'for', 'from', 'has', 'have', 'how',
+    'in', 'is', 'it', 'its', 'of', 'on', 'or', 'some', 'that', 'the', 'their', 'this', 'to', 'was', 'were',
+    'what', 'when', 'where', 'which', 'who', 'why', 'with',
+}
+
+
+def tokenize(text):
+    """Lowercased content words with a naive plural strip, e.g. 'Classifications' -> 'classification'."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", (text or '').lower()):
+        if word in STOPWORDS or len(word) < 2:
+            continue
+        if len(word) > 3 and word.endswith('s') and not word.endswith('ss'):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def _example_text(example):
+    answers = " ".join(a.get("answer_text", "") for a in example.get("answers", []))
+    return f"{example.get('question', '')} {answers}"
+
+
+def build_index(dataset, dataset_hash):
+    """Builds a BM25 index with one document per golden question (question plus its graded answers)."""
+    docs = [tokenize(_example_text(example)) for example in dataset]
+    doc_freq = {}
+    for tokens in docs:
+        for term in set(tokens):
+            doc_freq[term] = doc_freq.get(term, 0) + 1
+    num_docs = len(docs)
+    return {
+        "dataset_hash": dataset_hash,
+        "avg_doc_len": sum(len(d) for d in docs) / num_docs if num_docs else 0.0,
+        "doc_lens": [len(d) for d in docs],
+        "term_freqs": [{t: tokens.count(t) for t in set(tokens)} for tokens in docs],
+        "idf": {t: math.log(1 + (num_docs - n + 0.5) / (n + 0.5)) for t, n in doc_freq.items()},
+    }
+
+
+def load_golden(dataset_file=GOLDEN_DATASET_FILE, index_file=GOLDEN_INDEX_FILE):
+    """Loads the golden dataset and its index, rebuilding the index whenever the dataset changed."""
+    with open(dataset_file, 'rb') as f:
+        raw = f.read()
+    dataset = json.loads(raw)
+    dataset_hash = hashlib.sha256(raw).hexdigest()
+    try:
+        with open(index_file, 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        if index.get("dataset_hash") == dataset_hash:
+            return dataset, index
+    except (OSError, ValueError):
+        pass
+    index = build_index(dataset, dataset_hash)
+    try:
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+    except OSError as e:
+        print(f"Warning: could not save golden index to {index_file}: {e}")
+    return dataset, index
+
+
+def bm25_scores(index, query_tokens):
+    scores = [0.0] * len(index["doc_lens"])
+    avg_len = index["avg_doc_len"] or 1.0
+    for term in set(query_tokens):
+        idf = index["idf"].get(term)
+        if idf is None:
+            continue
+        for i, freqs in enumerate(index["term_freqs"]):
+            tf = freqs.get(term)
+            if tf:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * index["doc_lens"][i] / avg_len)
+                scores[i] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+
+def select_example_ids(index, card_chunk, k=GOLDEN_EXAMPLES_K):
+    """Picks the k golden examples most similar to the chunk's cards.
+
+    Each card's BM25 scores are normalised to its best match, so one long card cannot drown
+    out the rest of the chunk; examples are then ranked by their summed relevance.
+    """
+    num_docs = len(index["doc_lens"])
+    if num_docs <= k:
+        return list(range(num_docs))
+    totals = [0.0] * num_docs
+    for card in card_chunk:
+        scores = bm25_scores(index, tokenize(f"{card.get('question', '')} {card.get('answer', '')}"))
+        best = max(scores)
+        if best > 0:
+            totals = [t + s / best for t, s in zip(totals, scores)]
+    # Ties (including chunks that match nothing) keep dataset order, so results are deterministic.
+    return sorted(sorted(range(num_docs), key=lambda i: -totals[i])[:k])
+
+
+def select_examples(dataset, index, card_chunk, k=GOLDEN_EXAMPLES_K):
+    """Returns the golden examples for a chunk, cached per chunk contents, index version and k."""
+    key = cache.make_key(index["dataset_hash"], k, [(c.get('question'), c.get('answer')) for c in card_chunk])
+    example_ids = cache.get('golden_selection', key)
+    if example_ids is None:
+        example_ids = cache.put('golden_selection', key, select_example_ids(index, card_chunk, k))
+    return [dataset[i] for i in example_ids]
+
+
+def main():
+    """Rebuilds the golden index and optionally shows the examples selected for a query."""
+    parser = argparse.ArgumentParser(description="Build the golden-dataset index used for few-shot selection.")
+    parser.add_argument('--query', help="Show the examples selected for this question.")
+    parser.add_argument('-k', type=int, default=GOLDEN_EXAMPLES_K)
+    args = parser.parse_args()
+
+    dataset, index = load_golden()
+    print(f"Golden index covers {len(dataset)} examples ({len(index['idf'])} terms) -> {GOLDEN_INDEX_FILE}")
+    if args.query:
+        for i in select_example_ids(index, [{"question": args.query}], args.k):
+            print(f"  - {dataset[i]['question']}")
+
+if __name__ == "__main__":
+    main()
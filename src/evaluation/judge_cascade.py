@@ -0,0 +1,99 @@
+"""Two-tier accuracy judging: a cheap model judges every card and only uncertain cards are re-judged
+by the expensive model.
+
+Most cards are clear-cut (accurate, judged with high confidence), so the expensive model only sees
+the cards where the cheap judge was unsure or found a problem. Escalated cards from several chunks
+are re-batched into full chunks, since the chapter text dominates every prompt and each extra call
+pays for it again. Every merged result records which model produced it.
+"""
+import os
+
+# --- Configuration ---
+CHEAP_JUDGE_MODEL = os.getenv("CHEAP_JUDGE_MODEL", 'grok-3-mini')
+STRONG_JUDGE_MODEL = os.getenv("STRONG_JUDGE_MODEL", 'grok-4')
+ESCALATE_BELOW_CONFIDENCE = 80 # Cheap-judge confidence (0-100) under which a card is re-judged
+ESCALATE_AT_OR_BELOW_ACCURACY = 2 # Cards the cheap judge calls incorrect/external are always re-judged
+SCORES = (1, 2, 3, 4)
+
+
+def escalation_reason(eval_item, min_confidence=ESCALATE_BELOW_CONFIDENCE, max_accuracy=ESCALATE_AT_OR_BELOW_ACCURACY):
+    """Why a cheap-judge result needs the expensive model, or None if it can be kept."""
+    if eval_item is None:
+        return "missing"
+    accuracy, confidence = eval_item.get("accuracy_score"), eval_item.get("confidence_score")
+    if accuracy not in SCORES or not isinstance(confidence, (int, float)):
+        return "invalid"
+    if accuracy <= max_accuracy:
+        return "low_accuracy"
+    if confidence < min_confidence:
+        return "low_confidence"
+    return None
+
+
+def _with_provenance(eval_item, model, reason=None, first_pass=None):
+    result = dict(eval_item)
+    result["judge_model"] = model
+    result["escalated"] = reason is not None
+    if reason is not None:
+        result["escalation_reason"] = reason
+    if first_pass is not None:
+        result["first_pass"] = {
+            "model": CHEAP_JUDGE_MODEL,
+            "accuracy_score": first_pass.get("accuracy_score"),
+            "confidence_score": first_pass.get("confidence_score"),
+        }
+    return result
+
+
+def run_cascade(card_chunks, judge, chunk_size, on_first_pass=None):
+    """Judges `card_chunks` (lists of prompt cards) with the cheap model, then escalates.
+
+    `judge(model, prompt_chunk, chunk_number)` returns a list of evaluation dicts (possibly empty).
+    `on_first_pass(prompt_chunk, evals)` is called after each cheap chunk, e.g. for progress events.
+    Returns the merged evaluations in card order; a card missing from both tiers is left out.
+    """
+    first_pass, escalations = {}, []
+    for number, prompt_chunk in enumerate(card_chunks, start=1):
+        evals = judge(CHEAP_JUDGE_MODEL, prompt_chunk, number)
+        if on_first_pass:
+            on_first_pass(prompt_chunk, evals)
+        by_id = {e.get("card_id"): e for e in evals}
+        for card in prompt_chunk:
+            first_pass[card["card_id"]] = by_id.get(card["card_id"])
+            reason = escalation_reason(first_pass[card["card_id"]])
+            if reason:
+                escalations.append((card, reason))
+
+    second_pass = {}
+    escalated_cards = [card for card, _ in escalations]
+    for start in range(0, len(escalated_cards), chunk_size):
+        prompt_chunk = escalated_cards[start:start + chunk_size]
+        number = len(card_chunks) + start // chunk_size + 1
+        second_pass.update({e.get("card_id"): e for e in judge(STRONG_JUDGE_MODEL, prompt_chunk, number)})
+
+    reasons = dict((card["card_id"], reason) for card, reason in escalations)
+    merged = []
+    for prompt_chunk in card_chunks:
+        for card in prompt_chunk:
+            card_id = card["card_id"]
+            cheap, strong, reason = first_pass.get(card_id), second_pass.get(card_id), reasons.get(card_id)
+            if reason is None:
+                merged.append(_with_provenance(cheap, CHEAP_JUDGE_MODEL))
+            elif strong is not None:
+                merged.append(_with_provenance(strong, STRONG_JUDGE_MODEL, reason, first_pass=cheap))
+            elif cheap is not None:
+                # The expensive judge failed; keep the cheap verdict but mark it as unconfirmed.
+                result = _with_provenance(cheap, CHEAP_JUDGE_MODEL, reason)
+                result["escalation_failed"] = True
+                merged.append(result)
+    return merged
+
+
+def summarize(evaluations):
+    """Counts of cards per judging model and escalation reason, for the end-of-run printout."""
+    by_model, by_reason = {}, {}
+    for e in evaluations:
+        by_model[e.get("judge_model")] = by_model.get(e.get("judge_model"), 0) + 1
+        if e.get("escalated"):
+            by_reason[e.get("escalation_reason")] = by_reason.get(e.get("escalation_reason"), 0) + 1
+    return by_model, by_reason
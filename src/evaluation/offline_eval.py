@@ -0,0 +1,204 @@
+"""Judges generated chapters straight from output/*.sql, before they are loaded into Supabase.
+
+Each SQL (or JSON) file is parsed into its chapter, topics and cards (see common/sql_parser.py),
+checked for structural problems, and a stratified sample of its cards is judged against the
+chapter PDF exactly like `evaluate_accuracy.py --sample` does. Files with structural errors or a
+failing accuracy verdict are marked rejected in the quality report, and `scripts/supabase-run.py`
+skips them, so bad chapters never reach the database and no DB round trip is needed to judge them.
+"""
+import os
+import re
+import sys
+import json
+import uuid
+import hashlib
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import metrics, chapter_manifest, sql_parser
+import progress
+import results_store
+import sampling
+from golden_index import load_golden
+import evaluate_accuracy
+
+# --- Configuration ---
+SQL_DIRECTORY = os.getenv("OUTPUT_DIR", '../../output')
+OFFLINE_REPORT_FILE = os.getenv("OFFLINE_REPORT_FILE", '../../offline_quality_report.json')
+OFFLINE_EVALUATIONS_FILE = os.getenv("OFFLINE_EVALUATIONS_FILE", '../../offline_evaluations.json')
+MIN_CARDS_PER_TOPIC = 2 # Topics with fewer cards are reported as thin (a warning, not a rejection)
+PLACEHOLDER = re.compile(r'\b(todo|tbd|placeholder|fill here|lorem ipsum|add more|add the rest)\b', re.IGNORECASE)
+
+
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def structural_issues(chapter):
+    """Returns (errors, warnings). Any error rejects the file without judging it."""
+    errors, warnings = [], []
+    if not chapter.get("chapter_name"):
+        errors.append("no chapter name")
+    if not chapter["topics"]:
+        errors.append("no topics")
+    seen_questions = set()
+    for topic in chapter["topics"]:
+        cards = topic.get("cards") or []
+        if not cards:
+            errors.append(f"topic '{topic['name']}' has no cards")
+        elif len(cards) < MIN_CARDS_PER_TOPIC:
+            warnings.append(f"topic '{topic['name']}' has only {len(cards)} card(s)")
+        for number, card in enumerate(cards, start=1):
+            front, back = (card.get("front") or "").strip(), (card.get("back") or "").strip()
+            if not front or not back:
+                errors.append(f"card {number} of topic '{topic['name']}' has an empty question or answer")
+            elif PLACEHOLDER.search(front) or PLACEHOLDER.search(back):
+                errors.append(f"card {number} of topic '{topic['name']}' contains placeholder text")
+            elif front.lower() in seen_questions:
+                warnings.append(f"card {number} of topic '{topic['name']}' repeats an earlier question")
+            seen_questions.add(front.lower())
+    return errors, warnings
+
+
+def chapter_cards(filename, chapter):
+    """Shapes parsed cards like the `cards` table rows the evaluators read from Supabase.
+
+    Cards get stable UUIDs derived from the file and their position, so repeated runs over the
+    same file judge (and cache) the same card ids.
+    """
+    cards, topic_map = [], {}
+    for topic in chapter["topics"]:
+        topic_id = f"{filename}:{topic['order_index']}"
+        topic_map[topic_id] = topic['name']
+        for number, card in enumerate(topic.get("cards") or [], start=1):
+            cards.append({
+                "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{filename}/{topic['name']}/{number}/{card.get('front')}")),
+                "front": card.get("front"),
+                "back": card.get("back"),
+                "topic_id": topic_id,
+            })
+    return cards, topic_map
+
+
+def find_pdfs(parsed, pdf_directory):
+    """Maps each file to its chapter PDF: main.py names outputs after their PDF, else match by chapter name."""
+    found, unnamed = {}, []
+    for filename, chapter in parsed.items():
+        pdf_path = os.path.join(pdf_directory, f"{os.path.splitext(filename)[0]}.pdf")
+        if os.path.exists(pdf_path):
+            found[filename] = pdf_path
+        else:
+            unnamed.append({"id": filename, "name": chapter["chapter_name"], "order_index": chapter.get("chapter_order")})
+    if unnamed:
+        found.update(chapter_manifest.match_chapters(unnamed, pdf_directory)[0])
+    return found
+
+
+def evaluate_file(filename, chapter, pdf_path, golden_dataset, golden_index, args):
+    """Judges one parsed file; returns (report entry without status, card records)."""
+    cards, topic_map = chapter_cards(filename, chapter)
+    if not pdf_path:
+        return {"reasons": [f"no PDF in {args.pdf_dir} for chapter '{chapter['chapter_name']}'"]}, []
+    with metrics.labels(chapter=chapter["chapter_name"]):
+        chapter_text = evaluate_accuracy.get_pdf_text(pdf_path)
+    if not chapter_text:
+        return {"reasons": [f"could not read {pdf_path}"]}, []
+
+    progress.chapter_started(chapter["chapter_name"], 1, len(cards))
+    card_evals, estimate = evaluate_accuracy.sample_chapter(
+        {"name": chapter["chapter_name"]}, chapter_text, cards, topic_map, golden_dataset, golden_index, args,
+        judge_all=args.all)
+    records = evaluate_accuracy.build_card_records(chapter["chapter_name"], cards, card_evals, topic_map, set())
+    progress.chapter_finished(chapter["chapter_name"], {"accuracy": estimate["mean_accuracy"],
+                                                        "accuracy_ci": estimate["half_width"]})
+    reasons = []
+    if estimate["verdict"] == 'fail':
+        reasons.append(f"mean accuracy {sampling.format_estimate({**estimate, 'mean': estimate['mean_accuracy']})} "
+                       f"is below {args.threshold}")
+    return {"pdf": os.path.basename(pdf_path), "accuracy": estimate, "reasons": reasons}, records
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Judge generated SQL/JSON chapters before loading them into Supabase.")
+    parser.add_argument('files', nargs='*', help=f"Files to check (default: every .sql/.json file in {SQL_DIRECTORY}).")
+    parser.add_argument('--pdf-dir', default=evaluate_accuracy.PDF_DIRECTORY)
+    parser.add_argument('--structure-only', action='store_true', help="Only run the structural checks; no LLM calls.")
+    parser.add_argument('--all', action='store_true', help="Judge every card instead of a stratified sample.")
+    parser.add_argument('--half-width', type=float, default=sampling.SAMPLE_HALF_WIDTH)
+    parser.add_argument('--confidence', type=float, default=sampling.SAMPLE_CONFIDENCE)
+    parser.add_argument('--min-cards', type=int, default=sampling.SAMPLE_MIN_CARDS)
+    parser.add_argument('--threshold', type=float, default=sampling.QUALITY_THRESHOLD)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-cascade', action='store_true')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    run_id = metrics.start_run("offline_eval")
+    paths = args.files
+    if not paths and os.path.isdir(SQL_DIRECTORY):
+        paths = sorted(os.path.join(SQL_DIRECTORY, f) for f in os.listdir(SQL_DIRECTORY) if f.endswith(('.sql', '.json')))
+    if not paths:
+        print(f"No generated .sql or .json files found in {SQL_DIRECTORY}.")
+        return 1
+
+    report = {"run_id": run_id, "threshold": args.threshold, "sampled": not args.all, "files": {}}
+    parsed = {}
+    for path in paths:
+        filename = os.path.basename(path)
+        entry = report["files"][filename] = {"path": os.path.abspath(path), "sha256": file_hash(path), "reasons": [], "warnings": []}
+        try:
+            with metrics.span("sql_parse", file=filename):
+                chapter = sql_parser.load_chapter(path)
+        except (sql_parser.SQLParseError, UnicodeDecodeError) as e:
+            entry["reasons"].append(f"could not parse: {e}")
+            continue
+        errors, warnings = structural_issues(chapter)
+        entry.update({"chapter_name": chapter.get("chapter_name"), "topics": len(chapter["topics"]),
+                      "cards": sum(len(t.get("cards") or []) for t in chapter["topics"]), "warnings": warnings})
+        entry["reasons"].extend(errors)
+        if not errors:
+            parsed[filename] = chapter
+
+    final_evaluations = []
+    if parsed and not args.structure_only:
+        golden_dataset, golden_index = load_golden()
+        pdfs = find_pdfs(parsed, args.pdf_dir)
+        progress.start("offline_eval", len(parsed), sum(report["files"][f]["cards"] for f in parsed))
+        for filename, chapter in parsed.items():
+            print(f"\n--- {filename}: '{chapter['chapter_name']}' ({report['files'][filename]['cards']} cards) ---")
+            result, records = evaluate_file(filename, chapter, pdfs.get(filename), golden_dataset, golden_index, args)
+            report["files"][filename]["reasons"].extend(result.pop("reasons"))
+            report["files"][filename].update(result)
+            final_evaluations.extend(records)
+        progress.finish(OFFLINE_EVALUATIONS_FILE if final_evaluations else None)
+
+    print("\n--- Offline quality gate ---")
+    for filename, entry in report["files"].items():
+        entry["status"] = 'rejected' if entry["reasons"] else 'accepted'
+        accuracy = entry.get("accuracy")
+        summary = sampling.format_estimate({**accuracy, 'mean': accuracy['mean_accuracy']}) if accuracy else "not judged"
+        print(f"  {entry['status'].upper():<9} {filename}: {summary}")
+        for reason in entry["reasons"]:
+            print(f"      - {reason}")
+        for warning in entry["warnings"]:
+            print(f"      ! {warning}")
+
+    with open(OFFLINE_REPORT_FILE, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    if final_evaluations:
+        with open(OFFLINE_EVALUATIONS_FILE, 'w', encoding='utf-8') as f:
+            json.dump(final_evaluations, f, indent=4, ensure_ascii=False)
+        with metrics.span("results_db_write"):
+            results_store.save_accuracy_results(run_id, final_evaluations, evaluator='offline_eval',
+                                                source_file=OFFLINE_EVALUATIONS_FILE)
+    rejected = [f for f, e in report["files"].items() if e["status"] == 'rejected']
+    print(f"{len(report['files']) - len(rejected)} accepted, {len(rejected)} rejected. Report saved to {OFFLINE_REPORT_FILE}; "
+          f"scripts/supabase-run.py will skip the rejected files.")
+    metrics.print_summary()
+    return 1 if rejected else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
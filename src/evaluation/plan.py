@@ -0,0 +1,241 @@
+"""Dry-run planner: the calls, tokens, cost and wall time of a job, before it spends anything.
+
+The plan is built from the same pieces as the real run: the cached PDF text, the cards read from
+Supabase, evaluate_accuracy's chunking and prompt builder, and generation's prompt builder and
+cache key. Prompts are built but never sent. Prompt tokens are counted with tiktoken when it is
+installed (4 characters per token otherwise), completion tokens are estimated from
+the response format, and the wall time comes from a simple per-call latency model under the
+limits in common/scheduler.py.
+
+    python plan.py accuracy --chunk-size 10 20 40 --workers 1 4 8 --deadline 30
+    python plan.py generation --class 11 --subject biology --book-title Biology --cards-per-topic 20
+    python plan.py text ../../books/class11_biology        # tokens saved by text cleaning, per chapter
+"""
+import os
+import sys
+import json
+import math
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'generation'))
+from common import cache, metrics, pdf_text, chapter_manifest, scheduler, streaming, text_clean
+from common.text_clean import count_tokens
+from golden_index import load_golden, select_examples
+import compact_schema
+import judge_cascade
+import evaluate_accuracy
+import main as generation
+
+# --- Configuration ---
+# Latency model for one call: a fixed overhead plus reading the prompt and writing the completion.
+CALL_OVERHEAD_S = 1.5
+PROMPT_TOKENS_PER_S = 5000
+COMPLETION_TOKENS_PER_S = 60
+ESCALATION_RATE = 0.25 # Share of cards the cheap judge is expected to pass on to the strong judge
+JUDGE_TOKENS_PER_CARD = {True: 10, False: 60} # Completion tokens per card, compact vs verbose rows
+# Generated SQL: fixed preamble, per-topic block and per-card row. The prompt asks for 5-6 topics.
+SQL_TOKENS_BASE = 350
+SQL_TOKENS_PER_TOPIC = 100
+SQL_TOKENS_PER_CARD = 40
+GENERATION_TOPICS = 6
+
+
+def call_seconds(prompt_tokens, completion_tokens):
+    return CALL_OVERHEAD_S + prompt_tokens / PROMPT_TOKENS_PER_S + completion_tokens / COMPLETION_TOKENS_PER_S
+
+
+def projected_seconds(calls, busy_seconds, workers, rpm):
+    """Wall time of `calls` sequential calls spread over `workers` processes, each limited to `rpm`."""
+    if not calls:
+        return 0.0
+    per_worker = math.ceil(calls / workers)
+    spacing = 60.0 / rpm if rpm > 0 else 0.0
+    return max(busy_seconds / workers, (per_worker - 1) * spacing + busy_seconds / calls)
+
+
+def _new_totals(**fields):
+    return {**fields, "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0, "busy_s": 0.0}
+
+
+def _add_call(totals, model, prompt_tokens, completion_tokens):
+    totals["calls"] += 1
+    totals["prompt_tokens"] += prompt_tokens
+    totals["completion_tokens"] += completion_tokens
+    totals["cost_usd"] += metrics.estimate_cost(model, prompt_tokens, completion_tokens)
+    totals["busy_s"] += call_seconds(prompt_tokens, completion_tokens)
+
+
+def _sum_totals(rows, **fields):
+    totals = _new_totals(**fields)
+    for row in rows:
+        for key in ("calls", "prompt_tokens", "completion_tokens", "cost_usd", "busy_s"):
+            totals[key] += row[key]
+    return totals
+
+
+def plan_accuracy_chapter(chapter_name, chapter_text, cards, chunk_size, golden_dataset, golden_index,
+                          use_cascade=True, escalation_rate=ESCALATION_RATE):
+    """Calls and tokens for judging one chapter's cards, chunked exactly as evaluate_accuracy.py does."""
+    # The chapter text is in every prompt; count it once and add it to each prompt built without it.
+    text_tokens = count_tokens(chapter_text)
+    per_card = JUDGE_TOKENS_PER_CARD[compact_schema.COMPACT]
+    first_model = judge_cascade.CHEAP_JUDGE_MODEL if use_cascade else evaluate_accuracy.grok_model
+    totals = _new_totals(chapter=chapter_name, cards=len(cards), chunks=0)
+
+    def add_chunk(model, prompt_chunk):
+        examples = select_examples(golden_dataset, golden_index, prompt_chunk) if golden_dataset else []
+        prompt_tokens = text_tokens + count_tokens(evaluate_accuracy.build_accuracy_prompt("", prompt_chunk, examples))
+        _add_call(totals, model, prompt_tokens, len(prompt_chunk) * per_card)
+
+    first_chunk = None
+    for prompt_chunk in evaluate_accuracy.prompt_chunks(cards, chunk_size):
+        first_chunk = first_chunk or prompt_chunk
+        totals["chunks"] += 1
+        add_chunk(first_model, prompt_chunk)
+    if use_cascade and first_chunk:
+        # Escalated cards are re-batched into full chunks; the first chunk's cards stand in for them.
+        escalated = round(len(cards) * escalation_rate)
+        for start in range(0, escalated, chunk_size):
+            add_chunk(judge_cascade.STRONG_JUDGE_MODEL, first_chunk[:min(chunk_size, escalated - start)])
+    return totals
+
+
+def load_book_cards():
+    """Yields (chapter, chapter text, cards) for every matched chapter of evaluate_accuracy.py's book."""
+    selected_chapters, chapter_pdfs = evaluate_accuracy.select_book_streaming()
+    chapter_manifest.report_unmatched([c for c in selected_chapters if c['id'] not in chapter_pdfs], [],
+                                      evaluate_accuracy.PDF_DIRECTORY)
+    for chapter in selected_chapters:
+        if chapter['id'] not in chapter_pdfs:
+            continue
+        topic_ids = [t['id'] for t in streaming.iter_rows("topics", columns="id", chapter_id=chapter['id'])]
+        cards = list(streaming.iter_rows("cards", columns="id,topic_id,front,back", topic_id=topic_ids))
+        chapter_text = pdf_text.extract_text(chapter_pdfs[chapter['id']]) if cards else None
+        if chapter_text:
+            yield chapter, chapter_text, cards
+
+
+def plan_accuracy(args):
+    golden_dataset, golden_index = [], None
+    try:
+        golden_dataset, golden_index = load_golden()
+    except (OSError, ValueError):
+        print("Golden dataset not found; planning prompts without golden examples.")
+
+    chapters = {size: [] for size in args.chunk_size}
+    for chapter, chapter_text, cards in load_book_cards():
+        for size in args.chunk_size:
+            chapters[size].append(plan_accuracy_chapter(chapter['name'], chapter_text, cards, size, golden_dataset,
+                                                        golden_index, not args.no_cascade, args.escalation_rate))
+    return {size: (_sum_totals(rows, chunk_size=size, cards=sum(r["cards"] for r in rows)), rows)
+            for size, rows in chapters.items()}
+
+
+def plan_generation(args):
+    """One call per chapter whose generation is not cached yet, with the exact prompt main.py would send."""
+    folder = os.path.join("../../books", f"class{args.class_name}_{args.subject.lower()}")
+    if not os.path.isdir(folder):
+        raise FileNotFoundError(f"Folder {folder} does not exist.")
+    rows = []
+    for filename, chapter_name, chapter_number in chapter_manifest.pdfs_in_chapter_order(folder):
+        extracted = pdf_text.extract_pdf(os.path.join(folder, filename))
+        prompt = generation.build_generation_prompt(
+            extracted["text"], args.class_name, args.subject.lower(), args.book_title, generation.BOOK_ICON,
+            generation.BOOK_COLOR, args.language, chapter_name, args.cards_per_topic,
+            section_headings=extracted["headings"], chapter_number=chapter_number
+        )
+        key = generation.generation_cache_key(prompt)
+        cached = not generation.FORCE_REGENERATE and cache.get('generation', key) is not None
+        row = _new_totals(chapter=chapter_name, cached=cached)
+        if not cached:
+            completion = SQL_TOKENS_BASE + GENERATION_TOPICS * (SQL_TOKENS_PER_TOPIC + args.cards_per_topic * SQL_TOKENS_PER_CARD)
+            _add_call(row, generation.preferred_model, count_tokens(prompt), completion)
+        rows.append(row)
+    return {None: (_sum_totals(rows, cached=sum(r["cached"] for r in rows)), rows)}
+
+
+def text_report(pdf_directory):
+    """Tokens of each chapter's text before and after cleaning (see common/text_clean.py)."""
+    removed_kinds = ("running_heads", "reprint_notices", "opener_labels", "captions", "hyphenations")
+    print(f"{'Chapter':<40} {'Raw tok':>8} {'Clean tok':>10} {'Saved':>7}   " + " ".join(f"{k:>{len(k)}}" for k in removed_kinds))
+    raw_total = clean_total = 0
+    for filename, chapter_name, _ in chapter_manifest.pdfs_in_chapter_order(pdf_directory):
+        cleaning = pdf_text.extract_pdf(os.path.join(pdf_directory, filename), clean=True)["cleaning"]
+        raw_total += cleaning["raw_tokens"]
+        clean_total += cleaning["clean_tokens"]
+        saved = 1 - cleaning["clean_tokens"] / cleaning["raw_tokens"] if cleaning["raw_tokens"] else 0
+        print(f"{chapter_name[:40]:<40} {cleaning['raw_tokens']:>8} {cleaning['clean_tokens']:>10} {saved:>7.1%}   "
+              + " ".join(f"{cleaning['removed'].get(k, 0):>{len(k)}}" for k in removed_kinds))
+    if raw_total:
+        print(f"{'Total':<40} {raw_total:>8} {clean_total:>10} {1 - clean_total / raw_total:>7.1%}")
+    print("Every prompt that includes a chapter's text saves its share of these tokens.")
+
+
+def print_plan(plans, workers, rpm, deadline):
+    for size, (totals, rows) in plans.items():
+        title = f"chunk size {size}" if size is not None else "generation"
+        print(f"\n=== {title} ===")
+        print(f"{'Chapter':<40} {'Calls':>6} {'Prompt tok':>11} {'Compl. tok':>11} {'Cost $':>9} {'Busy min':>9}")
+        for row in rows:
+            print(f"{row['chapter'][:40]:<40} {row['calls']:>6} {row['prompt_tokens']:>11} {row['completion_tokens']:>11} "
+                  f"{row['cost_usd']:>9.4f} {row['busy_s'] / 60:>9.1f}")
+        print(f"{'Total':<40} {totals['calls']:>6} {totals['prompt_tokens']:>11} {totals['completion_tokens']:>11} "
+              f"{totals['cost_usd']:>9.4f} {totals['busy_s'] / 60:>9.1f}")
+        for count in workers:
+            minutes = projected_seconds(totals["calls"], totals["busy_s"], count, rpm) / 60
+            totals.setdefault("projected_minutes", {})[count] = round(minutes, 1)
+            verdict = "" if deadline is None else ("  meets deadline" if minutes <= deadline else "  misses deadline")
+            print(f"  {count} worker(s): {minutes:.1f} min{verdict}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Plan the calls, tokens, cost and wall time of a job without calling any LLM.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    accuracy = commands.add_parser('accuracy', help="Judging every card of the book (evaluate_accuracy.py --stream, distributed_eval.py).")
+    accuracy.add_argument('--chunk-size', type=int, nargs='+', default=[evaluate_accuracy.CARD_CHUNK_SIZE],
+                          help="Cards per judge call; give several to compare them.")
+    accuracy.add_argument('--workers', type=int, nargs='+', default=[1],
+                          help="Worker processes (1 = evaluate_accuracy.py --stream, N = distributed_eval.py run --workers N).")
+    accuracy.add_argument('--escalation-rate', type=float, default=ESCALATION_RATE)
+    accuracy.add_argument('--no-cascade', action='store_true')
+    accuracy.add_argument('--rpm', type=float, default=scheduler.LLM_RPM,
+                          help="LLM calls started per minute per process (0 = no limit).")
+    generation_parser = commands.add_parser('generation', help="Generating a book's SQL (generation/main.py).")
+    generation_parser.add_argument('--class', dest='class_name', required=True)
+    generation_parser.add_argument('--subject', required=True)
+    generation_parser.add_argument('--book-title', required=True)
+    generation_parser.add_argument('--language', default='English')
+    generation_parser.add_argument('--cards-per-topic', type=int, default=20)
+    text_parser = commands.add_parser('text', help="Tokens saved per chapter by removing page furniture from the PDF text.")
+    text_parser.add_argument('pdf_directory', nargs='?', default=evaluate_accuracy.PDF_DIRECTORY)
+    for command in (accuracy, generation_parser):
+        command.add_argument('--deadline', type=float, help="Minutes the job must finish in.")
+        command.add_argument('--json', dest='json_path', help="Also write the plan to this JSON file.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics.start_run("plan")
+    print(f"Counting tokens with {text_clean.tokenizer_name()}.")
+    if args.command == 'text':
+        text_report(args.pdf_directory)
+        return
+    try:
+        if args.command == 'accuracy':
+            plans, workers, rpm = plan_accuracy(args), args.workers, args.rpm
+        else:
+            # main.py's calls are sequential and do not go through the rate limiter.
+            plans, workers, rpm = plan_generation(args), [1], 0
+    except (LookupError, FileNotFoundError) as e:
+        print(f"Setup error: {e}")
+        sys.exit(1)
+    print_plan(plans, workers, rpm, args.deadline)
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump([{**totals, "chapters": rows} for totals, rows in plans.values()], f, indent=4, ensure_ascii=False)
+        print(f"\nPlan saved to {args.json_path}")
+
+if __name__ == "__main__":
+    main()
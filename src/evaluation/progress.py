@@ -0,0 +1,91 @@
+"""Append-only progress feed for long evaluation runs.
+
+Each event is one JSON line in EVENTS_FILE, written as soon as it happens, so `monitor.html`
+(served by `scripts/serve_monitor.py`) can show throughput, ETA and per-chapter scores while
+the run is still going instead of waiting for the final results file.
+"""
+import os
+import json
+import time
+import threading
+
+# --- Configuration ---
+EVENTS_FILE = os.getenv("EVENTS_FILE", '../../evaluation_events.jsonl')
+
+_lock = threading.Lock()
+_state = None
+
+
+def _write(event_type, **fields):
+    if _state is None:
+        return
+    event = {"type": event_type, "seq": _state["seq"], "ts": round(time.time(), 3), "run_id": _state["run_id"], **fields}
+    _state["seq"] += 1
+    try:
+        with open(_state["path"], 'a', encoding='utf-8') as f:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+    except OSError as e:
+        print(f"Warning: could not write progress event to {_state['path']}: {e}")
+
+
+def _throughput():
+    elapsed = time.time() - _state["started"]
+    done, total = _state["done_cards"], _state["total_cards"]
+    cards_per_min = done / elapsed * 60 if elapsed > 0 else 0.0
+    eta_s = (total - done) / cards_per_min * 60 if cards_per_min > 0 and total > done else 0.0
+    return {"done_cards": done, "total_cards": total, "elapsed_s": round(elapsed, 1),
+            "cards_per_min": round(cards_per_min, 2), "eta_s": round(eta_s, 1)}
+
+
+def start(evaluator, total_chapters, total_cards, path=None):
+    """Starts a new feed, replacing the previous run's events."""
+    global _state
+    with _lock:
+        _state = {
+            "path": path or EVENTS_FILE,
+            "run_id": f"{evaluator}-{int(time.time())}",
+            "seq": 0,
+            "started": time.time(),
+            "done_cards": 0,
+            "total_cards": total_cards,
+        }
+        try:
+            open(_state["path"], 'w', encoding='utf-8').close()
+        except OSError as e:
+            print(f"Warning: could not reset progress feed {_state['path']}: {e}")
+        _write("run_start", evaluator=evaluator, total_chapters=total_chapters, total_cards=total_cards)
+
+
+def chapter_started(chapter_name, index, num_cards):
+    with _lock:
+        _write("chapter_start", chapter=chapter_name, index=index, cards=num_cards)
+
+
+def cards_evaluated(chapter_name, count):
+    """Records that `count` more cards of the chapter have been judged."""
+    with _lock:
+        if _state is None:
+            return
+        _state["done_cards"] += count
+        _write("progress", chapter=chapter_name, cards=count, **_throughput())
+
+
+def chapter_finished(chapter_name, scores):
+    """Publishes the chapter's headline scores, e.g. {"exhaustiveness": 4, "correctness": 4.6}."""
+    with _lock:
+        if _state is None:
+            return
+        _write("chapter_done", chapter=chapter_name, scores=scores, **_throughput())
+
+
+def finish(results_file=None):
+    with _lock:
+        if _state is None:
+            return
+        _write("run_end", results_file=os.path.basename(results_file) if results_file else None, **_throughput())
+
+
+def mean_score(values):
+    """Mean of the numeric scores in `values`, rounded for display; None if there are none."""
+    numbers = [v for v in values if isinstance(v, (int, float))]
+    return round(sum(numbers) / len(numbers), 2) if numbers else None
@@ -0,0 +1,412 @@
+import os
+import sys
+import json
+import sqlite3
+import argparse
+from contextlib import closing
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import store
+
+# --- Configuration ---
+# Indexed copy of every evaluation run in the project store (common/store.py), written alongside the
+# JSON files, which `export` regenerates from it. Set RESULTS_DB="" to disable.
+RESULTS_DB = os.getenv("RESULTS_DB", store.STORE_DB)
+
+# The runs table is the store's (see common/store.py).
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS card_evaluations (
+    run_id TEXT NOT NULL,
+    card_id TEXT NOT NULL,
+    chapter TEXT,
+    topic TEXT,
+    question TEXT,
+    answer TEXT,
+    accuracy_score INTEGER,
+    confidence_score INTEGER,
+    correctness_score INTEGER,
+    relevance_score INTEGER,
+    rationale TEXT,
+    correctness_notes TEXT,
+    relevance_notes TEXT,
+    is_repeated INTEGER,
+    judge_model TEXT,
+    escalated INTEGER,
+    PRIMARY KEY (run_id, card_id)
+);
+CREATE INDEX IF NOT EXISTS idx_card_evaluations_chapter ON card_evaluations (run_id, chapter);
+CREATE INDEX IF NOT EXISTS idx_card_evaluations_topic ON card_evaluations (run_id, topic);
+CREATE INDEX IF NOT EXISTS idx_card_evaluations_accuracy ON card_evaluations (run_id, accuracy_score);
+CREATE INDEX IF NOT EXISTS idx_card_evaluations_confidence ON card_evaluations (run_id, confidence_score);
+CREATE INDEX IF NOT EXISTS idx_card_evaluations_card ON card_evaluations (card_id);
+CREATE TABLE IF NOT EXISTS chapter_evaluations (
+    run_id TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    exhaustiveness_score INTEGER,
+    exhaustiveness_notes TEXT,
+    PRIMARY KEY (run_id, chapter)
+);
+CREATE TABLE IF NOT EXISTS topic_evaluations (
+    run_id TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    card_count_score INTEGER,
+    card_count_notes TEXT,
+    PRIMARY KEY (run_id, chapter, topic)
+);
+"""
+# Columns added after the first release; older databases get them via ALTER TABLE on connect.
+MIGRATIONS = [
+    ('card_evaluations', 'judge_model', 'TEXT'),
+    ('card_evaluations', 'escalated', 'INTEGER'),
+]
+CARD_COLUMNS = ('run_id', 'card_id', 'chapter', 'topic', 'question', 'answer', 'accuracy_score', 'confidence_score',
+                'correctness_score', 'relevance_score', 'rationale', 'correctness_notes', 'relevance_notes',
+                'is_repeated', 'judge_model', 'escalated')
+SCORE_COLUMNS = {
+    'accuracy': 'accuracy_score',
+    'confidence': 'confidence_score',
+    'correctness': 'correctness_score',
+    'relevance': 'relevance_score',
+}
+GROUP_COLUMNS = {'run': 'run_id', 'chapter': 'chapter', 'topic': 'topic', 'judge': 'judge_model'}
+
+
+def connect(db_path=RESULTS_DB):
+    """Opens the results database (WAL, autocommit; see store.connect), creating the schema if needed."""
+    connection = store.connect(db_path)
+    connection.executescript(SCHEMA)
+    with store.transaction(connection):
+        store.migrate(connection, MIGRATIONS)
+    return connection
+
+
+def _score(value):
+    return value.get("score") if isinstance(value, dict) else None
+
+
+def _notes(value):
+    return value.get("notes") if isinstance(value, dict) else None
+
+
+def _flag(value):
+    return None if value is None else int(bool(value))
+
+
+def accuracy_rows(run_id, evaluations):
+    """Maps evaluate_accuracy.py records to card_evaluations rows."""
+    for e in evaluations:
+        yield (run_id, e.get("card_id"), e.get("chapter_name"), e.get("topic_name"), e.get("question"),
+               e.get("answer"), e.get("accuracy_score"), e.get("confidence_score"), None, None,
+               e.get("rationale"), None, None, int(bool(e.get("is_repeated"))), e.get("judge_model"),
+               _flag(e.get("escalated")))
+
+
+def chapter_card_rows(run_id, chapter_evaluations):
+    """Maps grok_eval.py/run_evaluation.py card results to card_evaluations rows."""
+    for chapter in chapter_evaluations:
+        for c in chapter.get("card_evaluations") or []:
+            content = c.get("content") or {}
+            yield (run_id, c.get("card_id"), chapter.get("chapter_name"), c.get("topic_name"), content.get("front"),
+                   content.get("back"), c.get("accuracy_score"), c.get("confidence_score"),
+                   _score(c.get("correctness")), _score(c.get("relevance")), c.get("rationale"),
+                   _notes(c.get("correctness")), _notes(c.get("relevance")), int(bool(c.get("is_repeated"))),
+                   c.get("judge_model"), _flag(c.get("escalated")))
+
+
+def insert_card_rows(connection, rows):
+    connection.executemany(
+        f"INSERT OR REPLACE INTO card_evaluations ({', '.join(CARD_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * len(CARD_COLUMNS))})", rows)
+
+
+def save_accuracy_results(run_id, evaluations, evaluator='evaluate_accuracy', source_file=None, db_path=RESULTS_DB):
+    """Stores one evaluate_accuracy.py run. Does nothing when the store is disabled."""
+    if not db_path:
+        return
+    try:
+        with closing(connect(db_path)) as connection, store.transaction(connection):
+            store.record_run(connection, run_id, evaluator, source_file)
+            insert_card_rows(connection, accuracy_rows(run_id, evaluations))
+    except sqlite3.Error as e:
+        print(f"Error writing results to {db_path}: {e}")
+
+
+def save_chapter_results(run_id, chapter_evaluations, evaluator, source_file=None, db_path=RESULTS_DB):
+    """Stores chapters of a grok_eval.py/run_evaluation.py run. Does nothing when the store is disabled.
+
+    Chapters can be saved one at a time as they finish, from any thread or process.
+    """
+    if not db_path:
+        return
+    try:
+        with closing(connect(db_path)) as connection, store.transaction(connection):
+            store.record_run(connection, run_id, evaluator, source_file)
+            insert_card_rows(connection, chapter_card_rows(run_id, chapter_evaluations))
+            for chapter in chapter_evaluations:
+                exhaustiveness = chapter.get("exhaustiveness")
+                connection.execute(
+                    "INSERT OR REPLACE INTO chapter_evaluations VALUES (?, ?, ?, ?)",
+                    (run_id, chapter.get("chapter_name"), _score(exhaustiveness), _notes(exhaustiveness)))
+                connection.executemany(
+                    "INSERT OR REPLACE INTO topic_evaluations VALUES (?, ?, ?, ?, ?)",
+                    [(run_id, chapter.get("chapter_name"), t.get("topic_name"), _score(t.get("evaluation")),
+                      _notes(t.get("evaluation"))) for t in chapter.get("optimal_card_count_per_topic") or []])
+    except sqlite3.Error as e:
+        print(f"Error writing results to {db_path}: {e}")
+
+
+def import_file(path, run_id=None, db_path=RESULTS_DB):
+    """Imports an existing accuracy or chapter evaluation JSON file as a run."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    run_id = run_id or os.path.splitext(os.path.basename(path))[0]
+    if data and isinstance(data[0], dict) and "card_evaluations" in data[0]:
+        save_chapter_results(run_id, data, 'chapter_import', path, db_path)
+    else:
+        save_accuracy_results(run_id, data, 'accuracy_import', path, db_path)
+    return run_id
+
+
+# --- Queries ---
+
+def latest_run(connection, tables=('card_evaluations', 'chapter_evaluations')):
+    """The newest run with rows in any of `tables`; runs that only recorded metrics or responses are skipped."""
+    has_rows = " OR ".join(f"EXISTS (SELECT 1 FROM {table} WHERE run_id = r.run_id)" for table in tables)
+    row = connection.execute(
+        f"SELECT run_id FROM runs r WHERE {has_rows} ORDER BY created_at DESC, rowid DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+def list_runs(connection):
+    return connection.execute("""
+        SELECT r.run_id, r.evaluator, r.created_at, COUNT(c.card_id), ROUND(AVG(c.accuracy_score), 3),
+               ROUND(AVG(c.correctness_score), 3)
+        FROM runs r LEFT JOIN card_evaluations c ON c.run_id = r.run_id
+        GROUP BY r.run_id ORDER BY r.created_at, r.rowid
+    """)
+
+
+def score_distribution(connection, run_id, score='accuracy', by='chapter'):
+    """Yields (group, score, count) for one run."""
+    column, group = SCORE_COLUMNS[score], GROUP_COLUMNS[by]
+    return connection.execute(f"""
+        SELECT {group}, {column}, COUNT(*) FROM card_evaluations
+        WHERE run_id = ? AND {column} IS NOT NULL
+        GROUP BY {group}, {column} ORDER BY {group}, {column}
+    """, (run_id,))
+
+
+def low_confidence_cards(connection, run_id, threshold=60, limit=50):
+    return connection.execute("""
+        SELECT card_id, chapter, topic, accuracy_score, confidence_score, question
+        FROM card_evaluations
+        WHERE run_id = ? AND confidence_score < ?
+        ORDER BY confidence_score, accuracy_score LIMIT ?
+    """, (run_id, threshold, limit))
+
+
+def group_diff(connection, base_run, new_run, score='accuracy', by='topic'):
+    """Yields (group, base_mean, new_mean, delta, cards) comparing two runs."""
+    column, group = SCORE_COLUMNS[score], GROUP_COLUMNS[by]
+    return connection.execute(f"""
+        SELECT {group},
+               ROUND(AVG(CASE WHEN run_id = ? THEN {column} END), 3) AS base_mean,
+               ROUND(AVG(CASE WHEN run_id = ? THEN {column} END), 3) AS new_mean,
+               ROUND(AVG(CASE WHEN run_id = ? THEN {column} END) - AVG(CASE WHEN run_id = ? THEN {column} END), 3),
+               COUNT(*)
+        FROM card_evaluations WHERE run_id IN (?, ?)
+        GROUP BY {group} ORDER BY 4
+    """, (base_run, new_run, new_run, base_run, base_run, new_run))
+
+
+def changed_cards(connection, base_run, new_run, score='accuracy', limit=50):
+    """Yields cards whose score changed between two runs, biggest drops first."""
+    column = SCORE_COLUMNS[score]
+    return connection.execute(f"""
+        SELECT b.card_id, b.topic, b.{column}, n.{column}, n.{column} - b.{column}, b.question
+        FROM card_evaluations b JOIN card_evaluations n ON n.card_id = b.card_id
+        WHERE b.run_id = ? AND n.run_id = ? AND b.{column} IS NOT n.{column}
+        ORDER BY n.{column} - b.{column} LIMIT ?
+    """, (base_run, new_run, limit))
+
+
+def model_responses(connection, run_id, stage=None, chapter=None):
+    """Yields a run's recorded model responses (see store.record_response), e.g. its chapter summaries."""
+    return connection.execute("""
+        SELECT stage, chapter, model, response FROM llm_responses
+        WHERE run_id = ? AND (? IS NULL OR stage = ?) AND (? IS NULL OR chapter = ?)
+        ORDER BY id
+    """, (run_id, stage, stage, chapter, chapter))
+
+
+# --- Export ---
+
+def _scored(score, notes):
+    return None if score is None and notes is None else {"score": score, "notes": notes}
+
+
+# Keys older evaluation files do not have; a NULL column means the record had no such key.
+OPTIONAL_ACCURACY_KEYS = ('chapter_name', 'rationale')
+
+
+def accuracy_records(connection, run_id):
+    """The evaluate_accuracy.py records of a run, in the order they were saved."""
+    for row in connection.execute("""
+        SELECT card_id, chapter, topic, question, answer, accuracy_score, confidence_score, rationale,
+               is_repeated, judge_model, escalated
+        FROM card_evaluations WHERE run_id = ? ORDER BY rowid
+    """, (run_id,)):
+        record = dict(zip(("card_id", "chapter_name", "topic_name", "question", "answer", "accuracy_score",
+                           "confidence_score", "rationale"), row))
+        for key in OPTIONAL_ACCURACY_KEYS:
+            if record[key] is None:
+                del record[key]
+        record["is_repeated"] = bool(row[8])
+        if row[9] is not None:
+            record["judge_model"] = row[9]
+        if row[10] is not None:
+            record["escalated"] = bool(row[10])
+        yield record
+
+
+def chapter_records(connection, run_id):
+    """The grok_eval.py/run_evaluation.py chapter entries of a run, in the order they were saved."""
+    topics, cards = {}, {}
+    for chapter, topic, score, notes in connection.execute(
+            "SELECT chapter, topic, card_count_score, card_count_notes FROM topic_evaluations WHERE run_id = ? ORDER BY rowid",
+            (run_id,)):
+        topics.setdefault(chapter, []).append({"topic_name": topic, "evaluation": _scored(score, notes)})
+    for row in connection.execute("""
+        SELECT chapter, card_id, topic, question, answer, correctness_score, correctness_notes,
+               relevance_score, relevance_notes
+        FROM card_evaluations WHERE run_id = ? ORDER BY rowid
+    """, (run_id,)):
+        cards.setdefault(row[0], []).append({
+            "card_id": row[1],
+            "topic_name": row[2],
+            "content": {"front": row[3], "back": row[4]},
+            "correctness": _scored(row[5], row[6]),
+            "relevance": _scored(row[7], row[8]),
+        })
+    for chapter, score, notes in connection.execute(
+            "SELECT chapter, exhaustiveness_score, exhaustiveness_notes FROM chapter_evaluations WHERE run_id = ? ORDER BY rowid",
+            (run_id,)):
+        yield {
+            "chapter_name": chapter,
+            "exhaustiveness": _scored(score, notes),
+            "optimal_card_count_per_topic": topics.get(chapter, []),
+            "card_evaluations": cards.get(chapter, []),
+        }
+
+
+def is_chapter_run(connection, run_id):
+    return connection.execute("SELECT 1 FROM chapter_evaluations WHERE run_id = ? LIMIT 1", (run_id,)).fetchone() is not None
+
+
+def export_run(connection, run_id, path):
+    """Writes a run back out as the evaluations JSON file its script produced; returns the number of entries."""
+    records = chapter_records(connection, run_id) if is_chapter_run(connection, run_id) else accuracy_records(connection, run_id)
+    records = list(records)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(records, f, indent=4, ensure_ascii=False)
+    return len(records)
+
+
+def _print_rows(headers, rows):
+    print("\t".join(headers))
+    for row in rows:
+        print("\t".join("" if v is None else str(v) for v in row))
+
+
+def main():
+    """Query CLI over the results database."""
+    parser = argparse.ArgumentParser(description="Query stored evaluation results.")
+    parser.add_argument('--db', default=RESULTS_DB or os.path.join(store.ROOT_DIR, 'store.db'))
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = commands.add_parser('import', help="Import an existing evaluation JSON file as a run.")
+    import_parser.add_argument('files', nargs='+')
+
+    commands.add_parser('runs', help="List stored runs.")
+
+    dist_parser = commands.add_parser('distribution', help="Score distribution per chapter/topic.")
+    dist_parser.add_argument('--run', help="Run id (default: latest evaluated run).")
+    dist_parser.add_argument('--score', choices=sorted(SCORE_COLUMNS), default='accuracy')
+    dist_parser.add_argument('--by', choices=sorted(GROUP_COLUMNS), default='chapter')
+
+    low_parser = commands.add_parser('low-confidence', help="Cards judged with low confidence.")
+    low_parser.add_argument('--run', help="Run id (default: latest evaluated run).")
+    low_parser.add_argument('--threshold', type=int, default=60)
+    low_parser.add_argument('--limit', type=int, default=50)
+
+    diff_parser = commands.add_parser('diff', help="Compare two runs.")
+    diff_parser.add_argument('base_run')
+    diff_parser.add_argument('new_run')
+    diff_parser.add_argument('--score', choices=sorted(SCORE_COLUMNS), default='accuracy')
+    diff_parser.add_argument('--by', choices=sorted(GROUP_COLUMNS), default='topic')
+    diff_parser.add_argument('--limit', type=int, default=50)
+
+    responses_parser = commands.add_parser('responses', help="Model responses recorded during a run.")
+    responses_parser.add_argument('--run', help="Run id (default: latest run with responses).")
+    responses_parser.add_argument('--stage', help="e.g. summary, exhaustiveness, topic_card_counts, card_chunk, accuracy, generation")
+    responses_parser.add_argument('--chapter')
+
+    export_parser = commands.add_parser('export', help="Regenerate a run's evaluations JSON file (and report).")
+    export_parser.add_argument('--run', help="Run id (default: latest evaluated run).")
+    export_parser.add_argument('--output', help="File to write (default: the file the run was saved from).")
+    export_parser.add_argument('--report', action='store_true', help="Also rebuild the sharded report of an accuracy run.")
+
+    args = parser.parse_args()
+    if args.command == 'import':
+        for path in args.files:
+            print(f"Imported {path} as run '{import_file(path, db_path=args.db)}'.")
+        return
+
+    with closing(connect(args.db)) as connection:
+        if args.command == 'runs':
+            _print_rows(["run_id", "evaluator", "created_at", "cards", "mean_accuracy", "mean_correctness"],
+                        list_runs(connection))
+            return
+        if args.command == 'diff':
+            print(f"--- {args.score} by {args.by}: {args.base_run} -> {args.new_run} ---")
+            _print_rows([args.by, "base_mean", "new_mean", "delta", "cards"],
+                        group_diff(connection, args.base_run, args.new_run, args.score, args.by))
+            print(f"\n--- Cards whose {args.score} changed ---")
+            _print_rows(["card_id", "topic", "base", "new", "delta", "question"],
+                        changed_cards(connection, args.base_run, args.new_run, args.score, args.limit))
+            return
+
+        if args.run:
+            run_id = args.run
+        elif args.command == 'responses':
+            run_id = latest_run(connection, tables=('llm_responses',))
+        else:
+            run_id = latest_run(connection)
+        if not run_id:
+            print("No runs stored yet.")
+            return
+        if args.command == 'export':
+            source_file = connection.execute("SELECT source_file FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+            path = args.output or (source_file[0] if source_file else None)
+            if not path:
+                print(f"Run '{run_id}' has no results file on record; pass --output.")
+                return
+            print(f"Exported {export_run(connection, run_id, path)} entries of run '{run_id}' to {path}")
+            if args.report and not is_chapter_run(connection, run_id):
+                import build_report
+                build_report.build_report(path)
+                print(f"Report rebuilt in {build_report.REPORT_DIR}")
+        elif args.command == 'distribution':
+            print(f"--- {args.score} distribution by {args.by} for run '{run_id}' ---")
+            _print_rows([args.by, "score", "cards"], score_distribution(connection, run_id, args.score, args.by))
+        elif args.command == 'responses':
+            _print_rows(["stage", "chapter", "model", "response"],
+                        model_responses(connection, run_id, args.stage, args.chapter))
+        elif args.command == 'low-confidence':
+            print(f"--- Cards with confidence < {args.threshold} in run '{run_id}' ---")
+            _print_rows(["card_id", "chapter", "topic", "accuracy", "confidence", "question"],
+                        low_confidence_cards(connection, run_id, args.threshold, args.limit))
+
+if __name__ == "__main__":
+    main()
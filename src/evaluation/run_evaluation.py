@@ -2,30 +2,24 @@
 
 import os
 import json
-import time
-import math
-import google.generativeai as genai
-import pdfplumber
-from supabase import create_client, Client
+import sys
 from dotenv import load_dotenv
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import clients, metrics, pdf_text, chapter_manifest, scheduler
+import progress
+import chapter_pipeline
+import compact_schema
+import results_store
+
 # --- Configuration ---
 load_dotenv()
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-EVALUATIONS_FILE = '../../chapter_evaluations.json'
-PDF_DIRECTORY = '../../books/class8_arts'
+EVALUATIONS_FILE = os.getenv("EVALUATIONS_FILE", '../../chapter_evaluations.json')
+PDF_DIRECTORY = os.getenv("PDF_DIRECTORY", '../../books/class8_arts')
 CARD_CHUNK_SIZE = 10 # Number of cards to evaluate per API call
-
-# --- Initialize Clients ---
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-except Exception as e:
-    print(f"Error initializing clients: {e}")
-    exit()
+GEMINI_MODEL_NAME = 'gemini-1.5-flash'
+# Supabase and Gemini clients are created on first use (see common/clients.py).
+# GEMINI_BASE_URL optionally overrides the Gemini endpoint, e.g. for a local mock server.
 
 def get_all_data(table_name):
     """Fetches all data from a Supabase table, handling pagination."""
@@ -35,7 +29,8 @@ def get_all_data(table_name):
     while True:
         try:
             start_index = current_page * page_size
-            response = supabase.table(table_name).select("*").range(start_index, start_index + page_size - 1).execute()
+            with metrics.span("supabase_page", table=table_name):
+                response = clients.supabase().table(table_name).select("*").range(start_index, start_index + page_size - 1).execute()
             data = response.data
             all_data.extend(data)
             if len(data) < page_size:
@@ -52,19 +47,41 @@ def get_pdf_text(pdf_path):
         print(f"PDF not found: {pdf_path}")
         return None
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            return "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
+        with metrics.span("pdf_extract", pdf=os.path.basename(pdf_path)):
+            return pdf_text.extract_text(pdf_path)
     except Exception as e:
         print(f"Error reading PDF {pdf_path}: {e}")
         return None
 
+def call_gemini(contents, stage, num_cards=None):
+    """Sends a prompt to Gemini, recording its latency and token usage.
+
+    `num_cards` marks a judge call whose completion budget is sized by compact_schema.with_budget.
+    """
+    def ask(max_tokens):
+        limits = {"generation_config": {"max_output_tokens": max_tokens}} if max_tokens else {}
+        with scheduler.rate_limited(), metrics.span("llm_call", model=GEMINI_MODEL_NAME, call=stage):
+            response = clients.gemini_model(GEMINI_MODEL_NAME).generate_content(contents, **limits)
+        metrics.record_usage(GEMINI_MODEL_NAME, response)
+        metrics.record_response(stage, GEMINI_MODEL_NAME, contents, response.text)
+        return response.text, response.candidates[0].finish_reason if response.candidates else None
+
+    if num_cards is None:
+        return ask(None)[0]
+    return compact_schema.with_budget(ask, num_cards, GEMINI_MODEL_NAME)
+
+def parse_json_response(response_text):
+    """Strips markdown fences from a model response and parses it as JSON."""
+    with metrics.span("json_parse"):
+        cleaned_text = response_text.strip().replace('`', '').replace('json', '')
+        return json.loads(cleaned_text)
+
 def get_summary_from_gemini(pdf_text, chapter_name):
     """Uses Gemini to create a structured summary of the chapter text."""
     print("Requesting chapter summary from Gemini...")
     prompt = f"""Please create a concise, structured summary of the following book chapter text, focusing on all key concepts, definitions, and facts. Return only the summary text."""
     try:
-        response = gemini_model.generate_content([prompt, pdf_text])
-        return response.text
+        return call_gemini([prompt, pdf_text], "summary")
     except Exception as e:
         print(f"Error during Gemini summary for chapter '{chapter_name}': {e}")
         return None
@@ -87,9 +104,7 @@ def get_chapter_exhaustiveness_evaluation(chapter_name, summary, all_card_questi
     ```
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        cleaned_text = response.text.strip().replace('`', '').replace('json', '')
-        return json.loads(cleaned_text)
+        return parse_json_response(call_gemini(prompt, "exhaustiveness"))
     except Exception as e:
         print(f"Error during exhaustiveness evaluation: {e}")
         return None
@@ -111,39 +126,64 @@ def get_topic_card_count_evaluation(topic_name, summary, topic_card_questions):
     ```
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        cleaned_text = response.text.strip().replace('`', '').replace('json', '')
-        return json.loads(cleaned_text)
+        return parse_json_response(call_gemini(prompt, "topic_card_count"))
     except Exception as e:
         print(f"Error during topic card count evaluation for '{topic_name}': {e}")
         return None
 
+def get_topic_card_count_evaluations(summary, topics):
+    """Evaluates, in one call, if the number of cards is optimal for each topic of a batch."""
+    prompt = f"""
+    **Task:** Based on the chapter summary, evaluate for each topic below if its number of flashcards is optimal (not too many, not too few).
+    **Chapter Summary:**
+    {summary}
+    **Topics and Their Flashcard Questions:**
+    {json.dumps(chapter_pipeline.numbered_topics(topics), indent=2)}
+
+    **IMPORTANT: Every score MUST be an integer between 1 (very bad) and 5 (very good).**
+
+    {chapter_pipeline.TOPIC_COUNTS_FORMAT}
+    """
+    try:
+        response_text = call_gemini(prompt, "topic_card_counts")
+        return chapter_pipeline.expand_topic_counts(parse_json_response(response_text), [t["topic_name"] for t in topics])
+    except Exception as e:
+        print(f"Error during batched topic card count evaluation: {e}")
+        return None
+
+VERBOSE_CARD_CHUNK_FORMAT = """**Required Output (Strict JSON):** A list of evaluation objects.
+    ```json
+    [
+      {
+        "card_id": "<uuid>",
+        "correctness": { "score": <integer>, "notes": "<string>" },
+        "relevance": { "score": <integer>, "notes": "<string>" }
+      }
+    ]
+    ```"""
+
 def get_card_chunk_evaluation(summary, card_chunk):
     """Evaluates a small chunk of cards for correctness and relevance."""
+    if compact_schema.COMPACT:
+        prompt_cards, output_format = compact_schema.numbered_cards(card_chunk, 'front', 'back'), compact_schema.CORRECTNESS_FORMAT
+    else:
+        prompt_cards, output_format = card_chunk, VERBOSE_CARD_CHUNK_FORMAT
     prompt = f"""
     **Task:** For each card in the chunk, evaluate its correctness and relevance based on the chapter summary.
     **Chapter Summary:**
     {summary}
     **Flashcard Chunk:**
-    {json.dumps(card_chunk, indent=2)}
+    {json.dumps(prompt_cards, indent=2)}
 
     **IMPORTANT: All scores MUST be an integer between 1 (very bad) and 5 (very good).**
 
-    **Required Output (Strict JSON):** A list of evaluation objects.
-    ```json
-    [
-      {{
-        "card_id": "<uuid>",
-        "correctness": {{ "score": <integer>, "notes": "<string>" }},
-        "relevance": {{ "score": <integer>, "notes": "<string>" }}
-      }}
-    ]
-    ```
+    {output_format}
     """
     try:
-        response = gemini_model.generate_content(prompt)
-        cleaned_text = response.text.strip().replace('`', '').replace('json', '')
-        return json.loads(cleaned_text)
+        response_text = call_gemini(prompt, "card_chunk", num_cards=len(card_chunk))
+        if not compact_schema.COMPACT:
+            return parse_json_response(response_text)
+        return compact_schema.expand_correctness(parse_json_response(response_text), [c['id'] for c in card_chunk])
     except Exception as e:
         print(f"Error during card chunk evaluation: {e}")
         return None
@@ -151,6 +191,8 @@ def get_card_chunk_evaluation(summary, card_chunk):
 def main():
     """Main function to run the chapter-based evaluation."""
     print("Starting chapter-based flashcard evaluation...")
+    evaluator = os.path.splitext(os.path.basename(__file__))[0]
+    run_id = metrics.start_run(evaluator)
 
     # 1. Fetch all data
     print("Fetching data from Supabase...")
@@ -162,86 +204,43 @@ def main():
     try:
         subject_id = next(s['id'] for s in subjects if s['class_name'] == '8' and s['subject_name'].lower() == 'arts')
         book_id = next(b['id'] for b in books if b['subject_id'] == subject_id)
-        selected_chapters = sorted([c for c in chapters if c['book_id'] == book_id], key=lambda x: x['order_index'])
-        pdf_files = sorted([f for f in os.listdir(PDF_DIRECTORY) if f.lower().endswith('.pdf')])
+        book_chapters = sorted([c for c in chapters if c['book_id'] == book_id], key=lambda x: x['order_index'])
+        chapter_pdfs, unmatched_chapters, unmatched_pdfs = chapter_manifest.match_chapters(book_chapters, PDF_DIRECTORY)
     except (StopIteration, FileNotFoundError) as e:
         print(f"Setup error: {e}")
         return
 
-    # 3. Process each chapter
-    final_evaluations = []
-    for i, chapter in enumerate(selected_chapters):
-        if i >= len(pdf_files): break
-        chapter_name = chapter['name']
-        print(f"\n--- Processing Chapter {i + 1}/{len(selected_chapters)}: '{chapter_name}' ---")
-
-        # a. Get PDF text and summary
-        pdf_path = os.path.join(PDF_DIRECTORY, pdf_files[i])
-        pdf_text = get_pdf_text(pdf_path)
-        if not pdf_text: continue
-        summary = get_summary_from_gemini(pdf_text, chapter_name)
-        if not summary: continue
-        time.sleep(1)
-
-        # b. Get cards and topics for this chapter
-        chapter_topics = [t for t in topics if t.get('chapter_id') == chapter['id']]
-        topic_map = {t['id']: t['name'] for t in chapter_topics}
-        chapter_cards = [c for c in cards if c.get('topic_id') in topic_map]
-        if not chapter_cards: continue
-
-        # c. Perform chapter-level exhaustiveness evaluation
-        all_card_questions = [{"id": c['id'], "question": c['front']} for c in chapter_cards]
-        exhaustiveness_eval = get_chapter_exhaustiveness_evaluation(chapter_name, summary, all_card_questions)
-        time.sleep(1)
-
-        # d. Perform topic-level card count evaluation
-        topic_evaluations = []
-        for topic_id, topic_name in topic_map.items():
-            topic_cards = [c for c in chapter_cards if c.get('topic_id') == topic_id]
-            if not topic_cards: continue
-            print(f"Evaluating card count for topic: '{topic_name}'...")
-            topic_card_questions = [{"id": c['id'], "question": c['front']} for c in topic_cards]
-            count_eval = get_topic_card_count_evaluation(topic_name, summary, topic_card_questions)
-            topic_evaluations.append({"topic_name": topic_name, "evaluation": count_eval})
-            time.sleep(1)
-
-        # e. Perform card-level evaluation in chunks
-        num_chunks = math.ceil(len(chapter_cards) / CARD_CHUNK_SIZE)
-        all_card_evals = []
-        for j in range(num_chunks):
-            start = j * CARD_CHUNK_SIZE
-            end = start + CARD_CHUNK_SIZE
-            chunk = chapter_cards[start:end]
-            print(f"Evaluating card chunk {j + 1}/{num_chunks}...")
-            chunk_eval = get_card_chunk_evaluation(summary, chunk)
-            if chunk_eval: all_card_evals.extend(chunk_eval)
-            time.sleep(2)
-        
-        # f. Combine all results into final structure
-        card_content_map = {c['id']: {"front": c['front'], "back": c['back']} for c in chapter_cards}
-        final_card_results = []
-        for eval_item in all_card_evals:
-            card_id = eval_item["card_id"]
-            final_card_results.append({
-                "card_id": card_id,
-                "content": card_content_map.get(card_id, {}),
-                "correctness": eval_item.get("correctness"),
-                "relevance": eval_item.get("relevance")
-            })
-
-        final_evaluations.append({
-            "chapter_name": chapter_name,
-            "exhaustiveness": exhaustiveness_eval,
-            "optimal_card_count_per_topic": topic_evaluations,
-            "card_evaluations": final_card_results
-        })
-        print(f"Successfully evaluated chapter '{chapter_name}'.")
+    # Only chapters paired with their own PDF are evaluated; never fall back to file order.
+    chapter_manifest.report_unmatched(unmatched_chapters, unmatched_pdfs, PDF_DIRECTORY)
+    selected_chapters = [c for c in book_chapters if c['id'] in chapter_pdfs]
+    if not selected_chapters:
+        print(f"No chapter could be matched to a PDF in {PDF_DIRECTORY}. Aborting before any evaluation.")
+        return
+    selected_chapter_ids = {c['id'] for c in selected_chapters}
+    selected_topic_ids = {t['id'] for t in topics if t.get('chapter_id') in selected_chapter_ids}
+    progress.start(os.path.splitext(os.path.basename(__file__))[0], len(selected_chapter_ids),
+                   sum(1 for c in cards if c.get('topic_id') in selected_topic_ids))
+
+    # 3. Evaluate the chapters; stages that only need a chapter's summary run concurrently
+    final_evaluations = chapter_pipeline.evaluate_chapters(selected_chapters, chapter_pdfs, topics, cards, {
+        "get_pdf_text": get_pdf_text,
+        "get_summary": get_summary_from_gemini,
+        "evaluate_exhaustiveness": get_chapter_exhaustiveness_evaluation,
+        "evaluate_card_count": get_topic_card_count_evaluation,
+        "evaluate_topic_card_counts": get_topic_card_count_evaluations,
+        "evaluate_card_chunk": get_card_chunk_evaluation,
+        # Each chapter is in the results store as soon as it finishes, not only once the whole run has.
+        "save_chapter": lambda entry: results_store.save_chapter_results(run_id, [entry], evaluator, EVALUATIONS_FILE),
+    }, CARD_CHUNK_SIZE)
 
     # 4. Save results
     if final_evaluations:
         with open(EVALUATIONS_FILE, 'w') as f:
             json.dump(final_evaluations, f, indent=4)
         print(f"\nEvaluation process completed. Results saved to {EVALUATIONS_FILE}")
+    progress.finish(EVALUATIONS_FILE if final_evaluations else None)
+    metrics.set_labels()
+    metrics.print_summary()
 
 if __name__ == "__main__":
     main()
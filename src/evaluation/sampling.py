@@ -0,0 +1,115 @@
+"""Stratified sampling with a sequential stopping rule, for quality-gating a chapter without
+judging every card.
+
+Cards are ordered so that every prefix of the order is a proportional stratified sample (each
+topic contributes in proportion to its size). The evaluator judges the order chunk by chunk and
+stops as soon as the confidence interval on the chapter's mean accuracy is narrower than the
+target. The interval uses the stratified variance with a finite population correction, so
+judging the whole chapter gives a zero-width interval.
+"""
+import math
+import random
+from statistics import NormalDist
+
+# --- Configuration ---
+SAMPLE_CONFIDENCE = 0.95 # Confidence level of the reported interval
+SAMPLE_HALF_WIDTH = 0.15 # Stop once the interval on mean accuracy (1-4 scale) is within +/- this
+SAMPLE_MIN_CARDS = 30 # Never stop before this many cards; the normal approximation needs them
+QUALITY_THRESHOLD = 3.0 # Mean accuracy a chapter must reach to pass the gate
+
+
+def stratified_order(cards, stratum_of, seed=0):
+    """Returns the cards in an order whose every prefix is a proportional stratified sample.
+
+    Each stratum is shuffled, and its i-th card of N is placed at (i + u) / N for a random
+    offset u, the systematic-sampling trick; sorting by that position interleaves the strata.
+    """
+    rng = random.Random(seed)
+    strata = {}
+    for card in cards:
+        strata.setdefault(stratum_of(card), []).append(card)
+    positioned = []
+    for members in strata.values():
+        rng.shuffle(members)
+        offset = rng.random()
+        positioned.extend(((i + offset) / len(members), rng.random(), card) for i, card in enumerate(members))
+    return [card for _, _, card in sorted(positioned, key=lambda p: (p[0], p[1]))]
+
+
+def _variance(values):
+    if len(values) < 2:
+        return None
+    mean = sum(values) / len(values)
+    return sum((v - mean) ** 2 for v in values) / (len(values) - 1)
+
+
+def estimate(scores_by_stratum, stratum_sizes, confidence=SAMPLE_CONFIDENCE):
+    """Stratified estimate of the population mean score.
+
+    `scores_by_stratum` maps stratum -> sampled scores, `stratum_sizes` maps stratum -> population
+    size. Strata sampled fewer than twice borrow the pooled variance. Unsampled strata are assumed
+    to sit at the sampled mean, and each adds weight² × the pooled variance (as if one card were
+    known), so the interval stays wide while parts of the chapter are unseen. Returns a dict with mean, half_width, ci_low, ci_high and counts.
+    """
+    population = sum(stratum_sizes.values())
+    all_scores = [s for scores in scores_by_stratum.values() for s in scores]
+    if not all_scores or not population:
+        return {"mean": None, "half_width": None, "ci_low": None, "ci_high": None,
+                "sampled": len(all_scores), "population": population, "confidence": confidence}
+
+    overall_mean = sum(all_scores) / len(all_scores)
+    pooled_variance = _variance(all_scores) or 0.0
+    mean, variance = 0.0, 0.0
+    for stratum, size in stratum_sizes.items():
+        scores = scores_by_stratum.get(stratum, [])
+        weight = size / population
+        if not scores:
+            mean += weight * overall_mean
+            variance += weight ** 2 * pooled_variance
+            continue
+        n = len(scores)
+        mean += weight * sum(scores) / n
+        stratum_variance = _variance(scores)
+        if stratum_variance is None:
+            stratum_variance = pooled_variance
+        variance += weight ** 2 * (1 - n / size) * stratum_variance / n
+
+    half_width = NormalDist().inv_cdf(0.5 + confidence / 2) * math.sqrt(max(variance, 0.0))
+    return {
+        "mean": round(mean, 3),
+        "half_width": round(half_width, 3),
+        "ci_low": round(mean - half_width, 3),
+        "ci_high": round(mean + half_width, 3),
+        "sampled": len(all_scores),
+        "population": population,
+        "confidence": confidence,
+    }
+
+
+def should_stop(result, target_half_width=SAMPLE_HALF_WIDTH, min_cards=SAMPLE_MIN_CARDS):
+    """True once enough cards are judged and the interval is at least as tight as the target."""
+    if result["half_width"] is None:
+        return False
+    if result["sampled"] >= result["population"]:
+        return True
+    return result["sampled"] >= min_cards and result["half_width"] <= target_half_width
+
+
+def verdict(result, threshold=QUALITY_THRESHOLD):
+    """'pass' when the whole interval clears the threshold, 'fail' when it lies below, else 'inconclusive'."""
+    if result["mean"] is None:
+        return "inconclusive"
+    if result["ci_low"] >= threshold:
+        return "pass"
+    if result["ci_high"] < threshold:
+        return "fail"
+    return "inconclusive"
+
+
+def format_estimate(result):
+    """e.g. '3.42 ± 0.14 (95% CI 3.28-3.56, 60/400 cards)'."""
+    if result["mean"] is None:
+        return f"no scores (0/{result['population']} cards)"
+    return (f"{result['mean']:.2f} ± {result['half_width']:.2f} "
+            f"({result['confidence']:.0%} CI {result['ci_low']:.2f}-{result['ci_high']:.2f}, "
+            f"{result['sampled']}/{result['population']} cards)")
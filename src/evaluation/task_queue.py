@@ -0,0 +1,186 @@
+"""SQLite-backed work queue with leases, for spreading an evaluation run over many worker processes.
+
+A coordinator enqueues tasks (JSON payloads) under a run id. Workers lease one task at a time: the
+lease records the worker and an expiry, and a worker that dies simply lets its lease lapse, after
+which another worker picks the task up again. Failed tasks are retried with a growing delay until
+MAX_ATTEMPTS, then parked as 'failed'. Results are stored on the task row, so the queue database
+is also the shared result store the coordinator collects from.
+
+SQLite locking works across processes on one host and on shared filesystems that honour POSIX
+locks; every state change is a single short transaction, so many workers can share one file.
+"""
+import os
+import json
+import time
+import sqlite3
+import socket
+from contextlib import closing
+
+# --- Configuration ---
+QUEUE_DB = os.getenv("QUEUE_DB", '../../task_queue.db')
+LEASE_SECONDS = int(os.getenv("TASK_LEASE_SECONDS", "300")) # A task whose worker stops heartbeating is re-leased after this
+MAX_ATTEMPTS = 3 # Leases per task before it is marked failed
+RETRY_BACKOFF_SECONDS = 5 # Delay before a failed task is retried, doubled on every further attempt
+BUSY_TIMEOUT_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    task_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    weight INTEGER NOT NULL DEFAULT 1,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_ready ON tasks (run_id, status, available_at);
+"""
+
+
+def connect(db_path=QUEUE_DB):
+    """Opens the queue database in autocommit mode; transactions are begun explicitly."""
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def worker_id():
+    """Identifies a worker across hosts, e.g. 'eval-box-2:4312'."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(connection, run_id, kind, payloads, weight_of=None):
+    """Adds one pending task per payload and returns how many were added.
+
+    `weight_of(payload)` sizes each task (e.g. its number of cards) for `progress_totals`.
+    """
+    now = time.time()
+    rows = [(run_id, kind, json.dumps(p, ensure_ascii=False), weight_of(p) if weight_of else 1, now) for p in payloads]
+    connection.execute("BEGIN IMMEDIATE")
+    connection.executemany("INSERT INTO tasks (run_id, kind, payload, weight, updated_at) VALUES (?, ?, ?, ?, ?)", rows)
+    connection.execute("COMMIT")
+    return len(rows)
+
+
+def lease(connection, run_id, owner, lease_seconds=LEASE_SECONDS):
+    """Claims the next ready task of the run, or returns None if none is ready right now.
+
+    Ready means pending and past its retry delay, or leased by a worker whose lease has expired.
+    Returns a dict with task_id, kind, payload and attempt.
+    """
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        # Expired leases that already used up their attempts are parked rather than handed out again.
+        connection.execute("""
+            UPDATE tasks SET status = 'failed', error = COALESCE(error, 'lease expired'), updated_at = ?
+            WHERE run_id = ? AND status = 'leased' AND lease_expires < ? AND attempts >= ?
+        """, (now, run_id, now, MAX_ATTEMPTS))
+        row = connection.execute("""
+            SELECT task_id, kind, payload, attempts FROM tasks
+            WHERE run_id = ? AND ((status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?))
+            ORDER BY task_id LIMIT 1
+        """, (run_id, now, now)).fetchone()
+        if row is None:
+            connection.execute("COMMIT")
+            return None
+        task_id, kind, payload, attempts = row
+        connection.execute("""
+            UPDATE tasks SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ?
+            WHERE task_id = ?
+        """, (owner, now + lease_seconds, now, task_id))
+        connection.execute("COMMIT")
+    except sqlite3.Error:
+        connection.execute("ROLLBACK")
+        raise
+    return {"task_id": task_id, "kind": kind, "payload": json.loads(payload), "attempt": attempts + 1}
+
+
+def heartbeat(connection, task_id, owner, lease_seconds=LEASE_SECONDS):
+    """Extends a lease; returns False if the task was meanwhile re-leased to another worker."""
+    now = time.time()
+    cursor = connection.execute("""
+        UPDATE tasks SET lease_expires = ?, updated_at = ?
+        WHERE task_id = ? AND status = 'leased' AND lease_owner = ?
+    """, (now + lease_seconds, now, task_id, owner))
+    return cursor.rowcount == 1
+
+
+def complete(connection, task_id, owner, result):
+    """Stores a task's result. Returns False (and stores nothing) if the worker no longer holds the lease."""
+    cursor = connection.execute("""
+        UPDATE tasks SET status = 'done', result = ?, error = NULL, lease_expires = NULL, updated_at = ?
+        WHERE task_id = ? AND status = 'leased' AND lease_owner = ?
+    """, (json.dumps(result, ensure_ascii=False), time.time(), task_id, owner))
+    return cursor.rowcount == 1
+
+
+def fail(connection, task_id, owner, error):
+    """Releases a task after an error: it is retried later, or marked failed after MAX_ATTEMPTS."""
+    now = time.time()
+    connection.execute("BEGIN IMMEDIATE")
+    row = connection.execute("SELECT attempts FROM tasks WHERE task_id = ? AND status = 'leased' AND lease_owner = ?",
+                             (task_id, owner)).fetchone()
+    if row is None:
+        connection.execute("COMMIT")
+        return
+    attempts = row[0]
+    status = 'failed' if attempts >= MAX_ATTEMPTS else 'pending'
+    delay = RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1)
+    connection.execute("""
+        UPDATE tasks SET status = ?, error = ?, available_at = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ?
+        WHERE task_id = ?
+    """, (status, str(error)[:2000], now + delay, now, task_id))
+    connection.execute("COMMIT")
+
+
+def counts(connection, run_id):
+    """Number of tasks per status for a run, e.g. {'pending': 3, 'leased': 2, 'done': 10}."""
+    return dict(connection.execute("SELECT status, COUNT(*) FROM tasks WHERE run_id = ? GROUP BY status", (run_id,)))
+
+
+def progress_totals(connection, run_id):
+    """(done_weight, total_weight) for a run, e.g. cards judged so far out of cards enqueued."""
+    done, total = connection.execute(
+        "SELECT COALESCE(SUM(CASE WHEN status = 'done' THEN weight END), 0), COALESCE(SUM(weight), 0) "
+        "FROM tasks WHERE run_id = ?", (run_id,)).fetchone()
+    return done, total
+
+
+def is_finished(connection, run_id):
+    """True once no task of the run can still produce a result."""
+    status_counts = counts(connection, run_id)
+    return not status_counts.get('pending') and not status_counts.get('leased')
+
+
+def results(connection, run_id, kind=None):
+    """Yields (payload, result) for the run's completed tasks, in enqueue order."""
+    query = "SELECT payload, result FROM tasks WHERE run_id = ? AND status = 'done'"
+    params = [run_id]
+    if kind:
+        query += " AND kind = ?"
+        params.append(kind)
+    for payload, result in connection.execute(query + " ORDER BY task_id", params):
+        yield json.loads(payload), json.loads(result)
+
+
+def failures(connection, run_id):
+    """(task_id, attempts, error, payload) for every task that gave up."""
+    return [(task_id, attempts, error, json.loads(payload)) for task_id, attempts, error, payload in connection.execute(
+        "SELECT task_id, attempts, error, payload FROM tasks WHERE run_id = ? AND status = 'failed' ORDER BY task_id",
+        (run_id,))]
+
+
+def latest_run(db_path=QUEUE_DB):
+    """The most recently enqueued run id, or None for an empty queue."""
+    with closing(connect(db_path)) as connection:
+        row = connection.execute("SELECT run_id FROM tasks ORDER BY task_id DESC LIMIT 1").fetchone()
+    return row[0] if row else None
@@ -1,28 +1,41 @@
 import os
-import pdfplumber
+import sys
 from dotenv import load_dotenv
-from google import genai
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import cache, clients, metrics, pdf_text, chapter_manifest
+import validate_sql
 
 # Load environment variables from .env
 load_dotenv()
-GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-client = genai.Client()
+OUTPUT_DIR = os.getenv('OUTPUT_DIR', "../../output")
+# Set FORCE_REGENERATE=1 to ignore cached generations and call the model for every chapter again.
+FORCE_REGENERATE = os.getenv('FORCE_REGENERATE', '0') == '1'
+GENERATION_CACHE_VERSION = 1 # Bump to invalidate every cached generation
+BOOK_ICON = 'english_icon' # Every generated book gets this icon and colour
+BOOK_COLOR = 'green'
+# The Gemini client is created on first use (see common/clients.py); GEMINI_BASE_URL optionally overrides its endpoint.
 preferred_model = "gemini-1.5-pro-latest"
 # preferred_model = "gemini-2.0-flash"
 
 def extract_text_from_pdf(pdf_path):
-    with pdfplumber.open(pdf_path) as pdf:
-        return "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
-
-def extract_chapter_name_from_text(chapter_text):
-    # Assumes the chapter name is the first non-empty line
-    for line in chapter_text.splitlines():
-        if line.strip():
-            return line.strip()
-    return "Unknown Chapter"
-
-def generate_sql_from_text(
-    chapter_text, class_name, subject_name, book_title, book_icon, book_color, language, chapter_name, flashcards_per_topic
+    """Returns the chapter's text, name (from its title page) and numbered section headings."""
+    with metrics.span("pdf_extract", pdf=os.path.basename(pdf_path)):
+        return pdf_text.extract_pdf(pdf_path)
+
+def _read(path):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+def format_section_headings(headings):
+    return "\n".join(f"{'  ' * (h['level'] - 1)}- {h['number']} {h['title']}" for h in headings)
+
+def build_generation_prompt(
+    chapter_text, class_name, subject_name, book_title, book_icon, book_color, language, chapter_name, flashcards_per_topic,
+    section_headings=None, chapter_number=None
 ):
         # --- LLM PROMPT CONSTRUCTION ---
     sample_sql = '''
@@ -139,6 +152,7 @@ Generate a complete SQL script that:
 - Book Color: {book_color}
 - Language: {language} 
 - Chapter Name: {chapter_name}
+- Chapter Number (use as the chapter order_index): {chapter_number or "infer from the chapter text"}
 - Chapter Text: (see below)
 
 ## SAMPLE SQL STRUCTURE (STRICTLY FOLLOW THIS)
@@ -196,6 +210,10 @@ Generate a complete SQL script that:
   - topics: id, chapter_id, name, order_index
   - cards: id, topic_id, front, back, card_type, order_index
 
+---
+# Section Headings (detected from the PDF layout):
+{format_section_headings(section_headings) if section_headings else "None detected; infer topics from the chapter text."}
+
 ---
 # Chapter Text:
 {chapter_text}
@@ -203,19 +221,39 @@ Generate a complete SQL script that:
 ---
 Return only the final, full SQL. Do not stop mid-script. Do not skip any topic. Do not use markdown.
 """
-    response = client.models.generate_content(
-        model=preferred_model,
-        contents=prompt
-    )
-    return response.text
+    return prompt
+
+def generation_cache_key(prompt, model=preferred_model):
+    """The prompt embeds the chapter text, the template and every parameter (language, cards per topic...),
+    so hashing it with the model identifies a generation exactly."""
+    return cache.make_key(GENERATION_CACHE_VERSION, model, prompt)
+
+def generate_sql_from_text(*args, **kwargs):
+    """Generates a chapter's SQL; returns (sql, cache_key, from_cache)."""
+    with metrics.span("prompt_build"):
+        prompt = build_generation_prompt(*args, **kwargs)
+    key = generation_cache_key(prompt)
+    cached = None if FORCE_REGENERATE else cache.get('generation', key)
+    if cached is not None:
+        metrics.incr("generation_cache_hits")
+        return cached["sql"], key, True
+    with metrics.span("llm_call", model=preferred_model):
+        response = clients.genai().models.generate_content(
+            model=preferred_model,
+            contents=prompt
+        )
+    metrics.record_usage(preferred_model, response)
+    metrics.record_response("generation", preferred_model, prompt, response.text)
+    return response.text, key, False
 
 def main():
+    metrics.start_run("generation")
     class_name = input("Enter class (e.g., 7): ").strip()
     subject_name = input("Enter subject (e.g., english): ").strip().lower()
     book_title = input("Enter book title (e.g., Poorvi): ").strip()
     # book_icon and book_color are now set by default
-    book_icon = 'english_icon'
-    book_color = 'green'
+    book_icon = BOOK_ICON
+    book_color = BOOK_COLOR
     language = input("Enter language for flashcards (e.g., English): ").strip()
     flashcards_per_topic = input("Enter number of flashcards per topic (e.g., 20): ").strip()
     try:
@@ -225,22 +263,48 @@ def main():
         flashcards_per_topic = 20
     
     folder = os.path.join("../../books", f"class{class_name}_{subject_name}")
-    output_dir = "../../output"
+    output_dir = OUTPUT_DIR
     os.makedirs(output_dir, exist_ok=True)
     if not os.path.isdir(folder):
         print(f"Folder {folder} does not exist. Please check your input.")
         return
-    for filename in os.listdir(folder):
-        if filename.endswith(".pdf"):
-            pdf_path = os.path.join(folder, filename)
-            chapter_text = extract_text_from_pdf(pdf_path)
-            chapter_name = extract_chapter_name_from_text(chapter_text)
-            sql = generate_sql_from_text(
-                chapter_text, class_name, subject_name, book_title, book_icon, book_color, language, chapter_name, flashcards_per_topic
-            )
-            with open(os.path.join(output_dir, f"{filename.replace('.pdf', '')}.sql"), "w", encoding="utf-8") as f:
-                f.write(sql)
-            print(f"Generated SQL for {chapter_name}")
+    generated = unchanged = 0
+    # Chapter names and numbers come from the manifest shared with the evaluators (see common/chapter_manifest.py)
+    for filename, chapter_name, chapter_number in chapter_manifest.pdfs_in_chapter_order(folder):
+        pdf_path = os.path.join(folder, filename)
+        metrics.set_labels(chapter=chapter_name)
+        extracted = extract_text_from_pdf(pdf_path)
+        sql, cache_key, from_cache = generate_sql_from_text(
+            extracted["text"], class_name, subject_name, book_title, book_icon, book_color, language, chapter_name, flashcards_per_topic,
+            section_headings=extracted["headings"], chapter_number=chapter_number
+        )
+        # Check the script locally; Supabase's EXCEPTION handler would swallow its errors at load time.
+        with metrics.span("sql_validate"):
+            validation = validate_sql.validate(sql, flashcards_per_topic)
+        sql_path = os.path.join(output_dir, f"{filename.replace('.pdf', '')}.sql")
+        if validation["errors"]:
+            # Kept for inspection under a name supabase-run.py does not load.
+            sql_path += ".invalid"
+            metrics.incr("sql_invalid")
+        elif not from_cache:
+            # Only valid scripts are cached, so an invalid one is regenerated on the next run.
+            cache.put('generation', cache_key, {"sql": sql, "model": preferred_model, "chapter_name": chapter_name})
+        if from_cache and _read(sql_path) == validation["sql"]:
+            unchanged += 1
+            print(f"Unchanged: {chapter_name} ({os.path.basename(sql_path)} is up to date)")
+            continue
+        with open(sql_path, "w", encoding="utf-8") as f:
+            f.write(validation["sql"])
+        if validation["errors"]:
+            print(f"Generated SQL for {chapter_name} is invalid and was saved to {sql_path}: {'; '.join(validation['errors'])}")
+        else:
+            for repair in validation["repairs"]:
+                print(f"  Repaired: {repair}")
+            print(f"{'Restored cached' if from_cache else 'Generated'} SQL for {chapter_name}")
+            generated += not from_cache
+    metrics.set_labels()
+    print(f"{generated} chapter(s) generated, {unchanged} unchanged and skipped.")
+    metrics.print_summary()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
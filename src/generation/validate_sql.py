@@ -0,0 +1,310 @@
+"""Local validator for the generated `DO $$ ... $$` chapter scripts.
+
+Supabase's `EXCEPTION WHEN OTHERS` handler turns any error inside a generated script into a
+NOTICE, so a broken file "loads" without inserting anything. This checks each script before it is
+written or loaded: string escaping, BEGIN/END and IF/END IF balance, trailing commas, the tables
+and columns it touches, the number of values in each VALUES row, and the number of cards per topic. Mechanical mistakes the model keeps making (markdown
+fences, prose around the block, backslash-escaped quotes, a missing final semicolon) are repaired.
+
+    python validate_sql.py                        # every file in output/, in parallel
+    python validate_sql.py ../../output/kebo101.sql --cards-per-topic 20 --write
+"""
+import os
+import re
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common import sql_parser
+
+# --- Configuration ---
+OUTPUT_DIR = os.getenv('OUTPUT_DIR', "../../output")
+# The only tables and columns generated scripts may touch (see the generation prompt).
+ALLOWED_COLUMNS = {
+    'subjects': {'id', 'class_name', 'subject_name', 'icon', 'color', 'description', 'created_at'},
+    'book_title': {'id', 'subject_id', 'title'},
+    'chapters': {'id', 'book_id', 'name', 'order_index'},
+    'topics': {'id', 'chapter_id', 'name', 'order_index'},
+    'cards': {'id', 'topic_id', 'front', 'back', 'card_type', 'order_index'},
+}
+CARD_TYPES = {'basic', 'fill_in_the_blank'}
+FORBIDDEN_STATEMENTS = {'update', 'delete', 'drop', 'truncate', 'alter', 'grant', 'revoke', 'create'}
+BLOCK_START = re.compile(r'\bDO\s+\$\$', re.IGNORECASE)
+BLOCK_END = re.compile(r'\bEND\s*\$\$\s*;?', re.IGNORECASE)
+
+
+def repair(sql):
+    """Fixes mechanical formatting mistakes; returns (sql, list of repairs made)."""
+    repairs = []
+    if '```' in sql:
+        sql = re.sub(r'```[a-zA-Z]*\n?', '', sql)
+        repairs.append("removed markdown code fences")
+    start = BLOCK_START.search(sql)
+    if start and sql[:start.start()].strip():
+        sql = sql[start.start():]
+        repairs.append("removed text before DO $$")
+    ends = list(BLOCK_END.finditer(sql))
+    if ends:
+        end = ends[-1]
+        if sql[end.end():].strip():
+            sql = sql[:end.end()]
+            repairs.append("removed text after END $$")
+        if not end.group().rstrip().endswith(';'):
+            sql = sql[:end.end()].rstrip() + ";\n"
+            repairs.append("added the missing semicolon after END $$")
+    if "\\'" in sql:
+        sql = sql.replace("\\'", "''")
+        repairs.append("replaced backslash-escaped quotes with ''")
+    return sql.strip() + "\n", repairs
+
+
+def _check_blocks(tokens, errors):
+    """BEGIN/END, IF/END IF and LOOP/END LOOP must nest properly."""
+    stack = []
+    words = [(i, t[1].lower()) for i, t in enumerate(tokens) if t[0] == 'word']
+    for n, (i, word) in enumerate(words):
+        previous = words[n - 1][1] if n else None
+        following = words[n + 1][1] if n + 1 < len(words) else None
+        if word in ('begin', 'loop', 'case') and previous != 'end':
+            stack.append(word)
+        elif word == 'if' and previous != 'end':
+            stack.append('if')
+        elif word == 'end':
+            closes = following if following in ('if', 'loop', 'case') else None
+            expected = closes or ('case' if stack and stack[-1] == 'case' else 'begin')
+            if not stack or stack[-1] != expected:
+                errors.append(f"unexpected END {closes.upper() if closes else ''}".rstrip()
+                              + (f" while {stack[-1].upper()} is open" if stack else " with no open block"))
+                return
+            stack.pop()
+    if stack:
+        errors.append(f"unclosed {', '.join(s.upper() for s in stack)} (the script looks truncated)")
+
+
+def _check_tables(tokens, errors):
+    """Only INSERTs and lookups on the known tables and columns are allowed."""
+    for i, token in enumerate(tokens):
+        if token[0] != 'word':
+            continue
+        word = token[1].lower()
+        if word in FORBIDDEN_STATEMENTS and (i == 0 or tokens[i - 1] == ('symbol', ';') or
+                                             (tokens[i - 1][0] == 'word' and tokens[i - 1][1].lower() in ('then', 'begin', 'else'))):
+            errors.append(f"{word.upper()} statements are not allowed in generated scripts")
+        elif word == 'into' and i > 0 and tokens[i - 1][0] == 'word' and tokens[i - 1][1].lower() == 'insert':
+            table = tokens[i + 1][1].lower() if i + 1 < len(tokens) and tokens[i + 1][0] == 'word' else None
+            if table not in ALLOWED_COLUMNS:
+                errors.append(f"INSERT into unknown table '{table}'")
+                continue
+            if i + 2 < len(tokens) and tokens[i + 2] == ('symbol', '('):
+                columns = _column_list(tokens, i + 2)
+                for column in columns - ALLOWED_COLUMNS[table]:
+                    errors.append(f"unknown column '{column}' in INSERT into {table}")
+        elif word == 'from' and i + 1 < len(tokens) and tokens[i + 1][0] == 'word':
+            table = tokens[i + 1][1].lower()
+            if table not in ALLOWED_COLUMNS:
+                errors.append(f"lookup on unknown table '{table}'")
+                continue
+            j = i + 2
+            while j + 1 < len(tokens) and tokens[j] != ('symbol', ';') and not (
+                    tokens[j][0] == 'word' and tokens[j][1].lower() in ('then', 'into', 'returning')):
+                if tokens[j][0] == 'word' and tokens[j + 1] == ('symbol', '='):
+                    column = tokens[j][1].lower().split('.')[-1]
+                    if not column.startswith('_') and column not in ALLOWED_COLUMNS[table]:
+                        errors.append(f"unknown column '{column}' in lookup on {table}")
+                j += 1
+
+
+def _check_commas(tokens, errors):
+    """Postgres rejects a comma right before a closing parenthesis, e.g. after the last VALUES row."""
+    trailing = sum(1 for i in range(1, len(tokens)) if tokens[i] == ('symbol', ')') and tokens[i - 1] == ('symbol', ','))
+    if trailing:
+        errors.append(f"trailing comma before ')' ({trailing} place{'s' if trailing > 1 else ''})")
+
+
+def _group_size(tokens, start):
+    """(number of top-level items, index after the closing parenthesis) of the list opening at tokens[start]."""
+    items, depth = 1, 0
+    for i in range(start, len(tokens)):
+        if tokens[i] == ('symbol', '('):
+            depth += 1
+        elif tokens[i] == ('symbol', ')'):
+            depth -= 1
+            if depth == 0:
+                return items, i + 1
+        elif tokens[i] == ('symbol', ',') and depth == 1 and tokens[i + 1:i + 2] != [('symbol', ')')]:
+            items += 1
+    return items, len(tokens)
+
+
+def _check_values(tokens, errors):
+    """Each VALUES row must have one value per column: the INSERT's column list, or the
+    `as cards_data(...)` list when the rows are selected from a VALUES table."""
+    i = 0
+    while i < len(tokens):
+        if not (tokens[i][0] == 'word' and tokens[i][1].lower() == 'insert' and i + 2 < len(tokens)
+                and tokens[i + 1][0] == 'word' and tokens[i + 1][1].lower() == 'into'):
+            i += 1
+            continue
+        table, i = tokens[i + 2][1], i + 3
+        columns = None
+        if i < len(tokens) and tokens[i] == ('symbol', '('):
+            columns, i = _group_size(tokens, i)
+        while i < len(tokens) and tokens[i] != ('symbol', ';') and not (
+                tokens[i][0] == 'word' and tokens[i][1].lower() == 'values'):
+            i += 1
+        if i >= len(tokens) or tokens[i] == ('symbol', ';'):
+            continue
+        rows, i = [], i + 1
+        while i < len(tokens) and tokens[i] == ('symbol', '('):
+            size, i = _group_size(tokens, i)
+            rows.append(size)
+            if i < len(tokens) and tokens[i] == ('symbol', ','):
+                i += 1
+        if i < len(tokens) and tokens[i] == ('symbol', ')'):
+            j = i + 1
+            if j < len(tokens) and tokens[j][0] == 'word' and tokens[j][1].lower() == 'as':
+                j += 1
+            if j + 1 < len(tokens) and tokens[j][0] == 'word' and tokens[j + 1] == ('symbol', '('):
+                table, (columns, i) = tokens[j][1], _group_size(tokens, j + 1)
+        if columns is None:
+            continue
+        for number, size in enumerate(rows, start=1):
+            if size != columns:
+                errors.append(f"VALUES row {number} of {table} has {size} values for {columns} columns")
+
+
+def _column_list(tokens, start):
+    columns, i = set(), start + 1
+    while i < len(tokens) and tokens[i] != ('symbol', ')'):
+        if tokens[i][0] == 'word':
+            columns.add(tokens[i][1].lower())
+        i += 1
+    return columns
+
+
+def _check_cards(chapter, cards_per_topic, errors, warnings):
+    for topic in chapter["topics"]:
+        cards = topic["cards"]
+        if not cards:
+            errors.append(f"topic '{topic['name']}' has no cards")
+        elif cards_per_topic and len(cards) != cards_per_topic:
+            warnings.append(f"topic '{topic['name']}' has {len(cards)} cards, expected {cards_per_topic}")
+        for number, card in enumerate(cards, start=1):
+            if not (card.get("front") or "").strip() or not (card.get("back") or "").strip():
+                errors.append(f"card {number} of topic '{topic['name']}' has an empty front or back")
+            if card.get("card_type") is not None and card["card_type"] not in CARD_TYPES:
+                warnings.append(f"card {number} of topic '{topic['name']}' has card_type '{card['card_type']}'")
+    if not chapter["topics"]:
+        errors.append("no topics")
+
+
+def validate(sql, cards_per_topic=None, fix=True):
+    """Validates (and, with `fix`, first repairs) one script.
+
+    Returns {"sql", "errors", "warnings", "repairs", "topics", "cards"}; the script is usable
+    when `errors` is empty, and `sql` is the repaired text.
+    """
+    repairs = []
+    if fix:
+        sql, repairs = repair(sql)
+    result = {"sql": sql, "errors": [], "warnings": [], "repairs": repairs, "topics": 0, "cards": 0}
+    errors, warnings = result["errors"], result["warnings"]
+    if not BLOCK_START.search(sql):
+        errors.append("no DO $$ block")
+    if not BLOCK_END.search(sql):
+        errors.append("no closing END $$; (the script looks truncated)")
+    try:
+        tokens = list(sql_parser.tokenize(sql))
+    except sql_parser.SQLParseError as e:
+        errors.append(str(e))
+        return result
+    _check_blocks(tokens, errors)
+    if sum(1 for t in tokens if t == ('symbol', '(')) != sum(1 for t in tokens if t == ('symbol', ')')):
+        # Column lists and VALUES rows cannot be read reliably past this point.
+        errors.append("unbalanced parentheses")
+        return result
+    _check_commas(tokens, errors)
+    _check_tables(tokens, errors)
+    _check_values(tokens, errors)
+    try:
+        chapter = sql_parser.parse_sql(sql)
+    except sql_parser.SQLParseError as e:
+        errors.append(str(e))
+        return result
+    if not chapter.get("chapter_name"):
+        errors.append("no chapter name")
+    _check_cards(chapter, cards_per_topic, errors, warnings)
+    result["topics"] = len(chapter["topics"])
+    result["cards"] = sum(len(t["cards"]) for t in chapter["topics"])
+    return result
+
+
+def validate_file(path, cards_per_topic=None, write=False):
+    """Validates one file; with `write`, saves the repaired script back when it is valid."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = validate(f.read(), cards_per_topic)
+    except (OSError, UnicodeDecodeError) as e:
+        result = {"sql": None, "errors": [f"could not read: {e}"], "warnings": [], "repairs": [], "topics": 0, "cards": 0}
+    result["path"] = path
+    if write and result["repairs"] and not result["errors"]:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(result["sql"])
+        os.replace(tmp_path, path)
+    return result
+
+
+def _validate_file_args(job):
+    return validate_file(*job)
+
+
+def validate_files(paths, cards_per_topic=None, write=False, jobs=None):
+    """Validates files in parallel, one process per CPU by default; results are in `paths` order."""
+    job_args = [(path, cards_per_topic, write) for path in paths]
+    if len(paths) < 2 or jobs == 1:
+        return [_validate_file_args(job) for job in job_args]
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        return list(pool.map(_validate_file_args, job_args, chunksize=max(1, len(paths) // (4 * (jobs or os.cpu_count() or 1)))))
+
+
+def print_result(result):
+    status = 'INVALID' if result["errors"] else ('REPAIRED' if result["repairs"] else 'OK')
+    print(f"  {status:<9} {os.path.basename(result['path'])}: {result['topics']} topics, {result['cards']} cards")
+    for repair_made in result["repairs"]:
+        print(f"      + {repair_made}")
+    for error in result["errors"]:
+        print(f"      - {error}")
+    for warning in result["warnings"]:
+        print(f"      ! {warning}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate (and repair) generated chapter SQL scripts.")
+    parser.add_argument('files', nargs='*', help=f"Scripts to check (default: every .sql file in {OUTPUT_DIR}).")
+    parser.add_argument('--cards-per-topic', type=int, help="Warn about topics with a different number of cards.")
+    parser.add_argument('--write', action='store_true', help="Save repaired scripts back to their files.")
+    parser.add_argument('--jobs', type=int, help="Worker processes (default: one per CPU).")
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file.")
+    args = parser.parse_args()
+
+    paths = args.files
+    if not paths and os.path.isdir(OUTPUT_DIR):
+        paths = sorted(os.path.join(OUTPUT_DIR, f) for f in os.listdir(OUTPUT_DIR) if f.endswith('.sql'))
+    if not paths:
+        print(f"No .sql files found in {OUTPUT_DIR}.")
+        return 1
+    results = validate_files(paths, args.cards_per_topic, args.write, args.jobs)
+    for result in results:
+        print_result(result)
+    invalid = sum(1 for r in results if r["errors"])
+    print(f"{len(results) - invalid} valid ({sum(1 for r in results if r['repairs'] and not r['errors'])} repaired), {invalid} invalid.")
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump([{k: v for k, v in r.items() if k != 'sql'} for r in results], f, indent=4, ensure_ascii=False)
+    return 1 if invalid else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
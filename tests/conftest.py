@@ -0,0 +1,10 @@
+import os
+import sys
+
+# The scripts import each other as top-level modules and `common` as a package, as when run from their directory.
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+for path in (SRC_DIR, os.path.join(SRC_DIR, 'evaluation'), os.path.join(SRC_DIR, 'generation')):
+    sys.path.insert(0, path)
+# Keep test runs out of the project store.
+os.environ.setdefault("STORE_DB", "")
+os.environ.setdefault("RESULTS_DB", "")
@@ -0,0 +1,44 @@
+import json
+from types import SimpleNamespace
+
+import compact_schema
+import evaluate_accuracy
+
+
+def test_reasoning_models_get_no_cap():
+    assert compact_schema.max_tokens(10, 'grok-4') is None
+    assert compact_schema.max_tokens(10, 'gemini-1.5-flash') == compact_schema.MAX_TOKENS_BASE + 10 * compact_schema.MAX_TOKENS_PER_CARD
+
+
+def test_cut_off_reply_is_retried_without_a_cap():
+    calls = []
+
+    def call(max_tokens):
+        calls.append(max_tokens)
+        if max_tokens:
+            return '[[1, 4, 95], [2, 2, 7', "length"
+        return '[[1, 4, 95], [2, 2, 70, "Wrong organelle."]]', "stop"
+
+    text = compact_schema.with_budget(call, 2, 'gemini-1.5-flash')
+    assert calls == [compact_schema.max_tokens(2), None]
+    assert compact_schema.expand_accuracy(json.loads(text), ['a', 'b'])[1]["rationale"] == "Wrong organelle."
+
+
+def test_accuracy_judge_keeps_a_chunk_whose_first_reply_was_cut_off(monkeypatch):
+    replies = [('[[1, 4, 9', "length"), ('[[1, 4, 95], [2, 3, 80]]', "stop")]
+    sent = []
+
+    def create(**kwargs):
+        sent.append(kwargs.get("max_tokens"))
+        content, finish_reason = replies.pop(0)
+        return SimpleNamespace(usage=None, choices=[SimpleNamespace(
+            message=SimpleNamespace(content=content), finish_reason=finish_reason)])
+
+    client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    monkeypatch.setattr(evaluate_accuracy.clients, 'xai', lambda: client)
+    monkeypatch.setattr(compact_schema, 'COMPACT', True)
+    cards = [{"card_id": "a", "question": "Q1", "answer": "A1"}, {"card_id": "b", "question": "Q2", "answer": "A2"}]
+
+    evaluations = evaluate_accuracy.get_accuracy_evaluation("Chapter text.", cards, [], model='small-model')
+    assert sent == [compact_schema.max_tokens(2), None]
+    assert [(e["card_id"], e["accuracy_score"]) for e in evaluations] == [("a", 4), ("b", 3)]
@@ -0,0 +1,44 @@
+import json
+import os
+from contextlib import closing
+
+import pytest
+
+import results_store
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+CHAPTER_RUN = [{
+    "chapter_name": "The Cell",
+    "exhaustiveness": {"score": 4, "notes": "Misses the cell wall."},
+    "optimal_card_count_per_topic": [{"topic_name": "Organelles", "evaluation": {"score": 5, "notes": "Right size."}}],
+    "card_evaluations": [{
+        "card_id": "c1",
+        "topic_name": "Organelles",
+        "content": {"front": "What is the powerhouse of the cell?", "back": "The mitochondrion."},
+        "correctness": {"score": 5, "notes": ""},
+        "relevance": {"score": 2, "notes": "Too short."},
+    }],
+}]
+
+
+def _round_trip(source, tmp_path):
+    db_path = str(tmp_path / "results.db")
+    run_id = results_store.import_file(source, db_path=db_path)
+    exported = tmp_path / "exported.json"
+    with closing(results_store.connect(db_path)) as connection:
+        results_store.export_run(connection, run_id, str(exported))
+    return exported.read_text(encoding='utf-8')
+
+
+@pytest.mark.parametrize("name", ["accuracy_evaluations.json", "ARTSaccuracy_evaluations.json"])
+def test_export_reproduces_an_imported_accuracy_file(tmp_path, name):
+    source = os.path.join(ROOT_DIR, name)
+    with open(source, 'r', encoding='utf-8') as f:
+        original = f.read()
+    assert json.loads(_round_trip(source, tmp_path)) == json.loads(original)
+
+
+def test_export_reproduces_an_imported_chapter_file(tmp_path):
+    source = tmp_path / "chapter_evaluations.json"
+    source.write_text(json.dumps(CHAPTER_RUN, indent=4), encoding='utf-8')
+    assert json.loads(_round_trip(str(source), tmp_path)) == CHAPTER_RUN
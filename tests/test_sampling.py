@@ -0,0 +1,18 @@
+import sampling
+
+
+def test_unsampled_stratum_widens_the_interval():
+    sizes = {"a": 100, "b": 100}
+    sampled_a = {"a": [4, 3, 4, 2, 4, 3, 4, 4, 3, 4]}
+    alone = sampling.estimate(sampled_a, {"a": 100})
+    with_unseen = sampling.estimate(sampled_a, sizes)
+    assert with_unseen["half_width"] > alone["half_width"] / 2
+    both_sampled = sampling.estimate({**sampled_a, "b": [4, 3, 4, 2, 4, 3, 4, 4, 3, 4]}, sizes)
+    assert with_unseen["half_width"] > both_sampled["half_width"]
+
+
+def test_whole_population_gives_a_zero_width_interval():
+    scores = {"a": [4, 3, 2], "b": [1, 4]}
+    result = sampling.estimate(scores, {"a": 3, "b": 2})
+    assert result["half_width"] == 0
+    assert sampling.should_stop(result)
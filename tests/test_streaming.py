@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from common import streaming
+
+
+@pytest.mark.parametrize("read_size", [1, 2, 3, 7, 1 << 16])
+def test_iter_json_array_does_not_split_values_across_reads(tmp_path, read_size):
+    items = [123456, 7, True, False, None, -1.5e10, "a, b]", {"card": 12345, "ok": True}, [1, [2, 33]], {}]
+    path = tmp_path / "items.json"
+    path.write_text(json.dumps(items, indent=4), encoding='utf-8')
+    assert list(streaming.iter_json_array(path, read_size)) == items
+
+
+def test_iter_json_array_reads_what_json_array_writes(tmp_path):
+    path = str(tmp_path / "records.json")
+    records = [{"card_id": str(i), "accuracy_score": i % 4 + 1} for i in range(50)]
+    with streaming.json_array(path) as write:
+        for record in records:
+            write(record)
+    assert list(streaming.iter_json_array(path, 5)) == records
+    with streaming.json_array(path):
+        pass
+    assert list(streaming.iter_json_array(path, 1)) == []
+
+
+def test_iter_json_array_rejects_a_truncated_file(tmp_path):
+    path = tmp_path / "cut.json"
+    path.write_text('[{"a": 1}, {"b": 2', encoding='utf-8')
+    with pytest.raises(ValueError):
+        list(streaming.iter_json_array(path, 4))
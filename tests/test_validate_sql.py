@@ -0,0 +1,40 @@
+import validate_sql
+
+SCRIPT = """DO $$
+DECLARE
+  _chapter_id uuid;
+  _topic_id uuid;
+BEGIN
+  SELECT id INTO _chapter_id FROM chapters WHERE name = 'The Cell';
+  INSERT INTO topics (id, chapter_id, name, order_index)
+  VALUES (gen_random_uuid(), _chapter_id, 'Organelles', 1)
+  RETURNING id INTO _topic_id;
+
+  INSERT INTO cards (id, topic_id, front, back, card_type, order_index)
+  SELECT gen_random_uuid(), _topic_id, front, back, card_type, order_index from (
+  VALUES
+    ('What is the powerhouse of the cell?', 'The mitochondrion.', 'basic', 1),
+    ('Where are proteins made?', 'On ribosomes.', 'basic', 2)
+  ) as cards_data(front, back, card_type, order_index);
+EXCEPTION WHEN OTHERS THEN
+  RAISE NOTICE 'An error occurred: %', SQLERRM;
+END $$;
+"""
+
+
+def test_generated_script_is_valid():
+    result = validate_sql.validate(SCRIPT)
+    assert result["errors"] == []
+    assert (result["topics"], result["cards"]) == (1, 2)
+
+
+def test_trailing_comma_before_closing_paren_is_rejected():
+    sql = SCRIPT.replace("'basic', 2)\n", "'basic', 2),\n")
+    assert validate_sql.validate(sql)["errors"] == ["trailing comma before ')' (1 place)"]
+
+
+def test_values_row_with_wrong_number_of_values_is_rejected():
+    sql = SCRIPT.replace("'On ribosomes.', 'basic', 2)", "'On ribosomes.', 2)")
+    assert validate_sql.validate(sql)["errors"] == ["VALUES row 2 of cards_data has 3 values for 4 columns"]
+    sql = SCRIPT.replace("_chapter_id, 'Organelles', 1)", "_chapter_id, 'Organelles')")
+    assert validate_sql.validate(sql)["errors"] == ["VALUES row 1 of topics has 3 values for 4 columns"]